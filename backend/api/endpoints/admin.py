@@ -0,0 +1,43 @@
+from fastapi import APIRouter, Depends, HTTPException, Path, Query, Response
+from fastapi.responses import PlainTextResponse
+
+from backend.models import user as user_models
+from backend.services.auth import get_current_admin_user
+from backend.services.database import get_pool_stats
+from backend.services import profiling
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+@router.get("/db/pools")
+async def get_db_pools(current_user: user_models.User = Depends(get_current_admin_user)):
+    """
+    Saturation and checkout wait of each workload's connection pool
+    """
+    return get_pool_stats()
+
+@router.get("/profiles/{kind}/{profile_id}")
+async def get_profile(
+    kind: str = Path(..., pattern="^(requests|uploads)$"),
+    profile_id: str = Path(...),
+    format: str = Query("text", pattern="^(text|raw)$"),
+    sort: str = Query("cumulative", pattern="^(cumulative|tottime|calls)$"),
+    limit: int = Query(50, ge=1, le=1000),
+    current_user: user_models.User = Depends(get_current_admin_user)
+):
+    """
+    Stored profile of a request, by its X-Profile-Id, or the merged profiles
+    of an upload's tasks, by upload id.
+
+    `format=text` is a pstats report of the top `limit` functions by `sort`;
+    `format=raw` is a pstats file for snakeviz or `python -m pstats`.
+    """
+    paths = profiling.profile_files(kind, profile_id)
+    if not paths:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    if format == "raw":
+        return Response(
+            content=profiling.merge_profiles(paths),
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": f'attachment; filename="{kind}-{profile_id}.prof"'},
+        )
+    return PlainTextResponse(profiling.render_profile(paths, sort=sort, limit=limit))
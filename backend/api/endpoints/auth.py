@@ -1,34 +1,53 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from datetime import timedelta
 
 from backend.models import user as user_models
 from backend.schemas import user as user_schemas
-from backend.services.database import get_db
+from backend.services.database import get_async_db, get_db
 from backend.services.auth import (
+    Principal,
     authenticate_user,
     create_access_token,
     get_current_active_user,
+    get_current_admin_user,
     get_password_hash
 )
+from backend.services.password_hasher import HasherBusy, password_hasher
 from backend.crud import user as user_crud
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
-@router.post("/register", response_model=schemas.UserResponse)
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
+def _hasher_busy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many logins in progress, try again shortly",
+        headers={"Retry-After": "1"},
+    )
+
+@router.post("/register", response_model=user_schemas.UserResponse)
+def register(user: user_schemas.UserCreate, db: Session = Depends(get_db)):
     db_user = user_crud.get_user_by_username(db, username=user.username)
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
-    return user_crud.create_user(db=db, user=user)
+    try:
+        return user_crud.create_user(db=db, user=user)
+    except HasherBusy:
+        raise _hasher_busy()
 
 @router.post("/login")
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    user = authenticate_user(db, form_data.username, form_data.password)
+    # bcrypt runs in the password hasher's pool, off the event loop; a full
+    # queue sheds the login instead of letting it pile up
+    try:
+        user = await authenticate_user(db, form_data.username, form_data.password)
+    except HasherBusy:
+        raise _hasher_busy()
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -41,6 +60,13 @@ def login(
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
-@router.get("/me", response_model=schemas.UserResponse)
-def read_users_me(current_user: models.User = Depends(get_current_active_user)):
+@router.get("/hashing/stats")
+async def get_hashing_stats(current_user: Principal = Depends(get_current_admin_user)):
+    """
+    Queue and timing counters of the password hashing pool
+    """
+    return password_hasher.get_stats()
+
+@router.get("/me", response_model=user_schemas.UserResponse)
+def read_users_me(current_user: user_models.User = Depends(get_current_active_user)):
     return current_user
@@ -1,18 +1,35 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 from datetime import datetime
-from typing import Optional, List
+from typing import Any, Callable, Optional, List
 
 from backend.models import log_entry as log_entry_models, user as user_models
 from backend.schemas import log_entry as log_entry_schemas, search as search_schemas
-from backend.services.database import get_db
+from backend.services.database import get_analytics_db, get_read_db, run_in_session
 from backend.services.auth import get_current_active_user
-from backend.crud import log_entry as log_entry_crud
+from backend.services import archive
+from backend.services.result_cache import cached_result_async, result_cache
+from backend.config.settings import settings
+from backend.crud import log_entry as log_entry_crud, rollup as rollup_crud, template as template_crud
 
 router = APIRouter(prefix="/search", tags=["search"])
 
-@router.get("/logs", response_model=schemas.LogSearchResponse)
-def search_logs(
+# Routes here are coroutines on an AsyncSession, so a slow query parks its
+# request on the event loop instead of occupying a threadpool worker
+
+async def _read(db: AsyncSession, fn: Callable[..., Any], start_time: Optional[datetime], **kwargs: Any) -> Any:
+    """Run a sync analytics query on the async connection.
+
+    Ranges reaching the archive tier scan Parquet files, which is blocking
+    work, so those run in the threadpool with a sync analytics session.
+    """
+    if archive.reaches_archive(start_time):
+        return await run_in_session(fn, start_time=start_time, **kwargs)
+    return await db.run_sync(fn, start_time=start_time, **kwargs)
+
+@router.get("/logs", response_model=search_schemas.LogSearchResponse)
+async def search_logs(
     q: Optional[str] = None,
     log_level: Optional[str] = None,
     source: Optional[str] = None,
@@ -20,11 +37,31 @@ def search_logs(
     end_time: Optional[datetime] = None,
     page: int = 1,
     per_page: int = 20,
-    current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    pagination: str = Query("page", pattern="^(page|cursor)$"),
+    cursor: Optional[str] = None,
+    count: Optional[str] = Query(None, pattern="^(exact|estimate|capped)$"),
+    mode: str = Query("substring", pattern="^(substring|fulltext)$"),
+    current_user: user_models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
-    Search logs with various filters and pagination
+    Search logs with various filters and pagination.
+
+    `pagination=cursor` (implied by passing `cursor`) pages newest first by
+    `(timestamp, id)` and returns `next_cursor`/`prev_cursor`; its cost does
+    not depend on page depth and it skips the total count. It covers the
+    hot tier only; archived rows are reached with `pagination=page`.
+
+    `count` picks how `total` is computed: `exact` (cached briefly),
+    `estimate` (planner estimate) or `capped`; `total_relation` says which
+    kind of number was returned.
+
+    `mode=fulltext` matches `q` as a ranked full-text query (word stemming,
+    quoted phrases, `-exclusions`) on PostgreSQL; the default `substring`
+    mode matches `q` anywhere in the message.
+
+    When `start_time` reaches back past the hot window, archived rows are
+    searched too and listed after the hot ones.
     """
     skip = (page - 1) * per_page
     
@@ -39,102 +76,177 @@ def search_logs(
     if end_time:
         query_filters["end_time"] = end_time
     
-    # Execute search
-    if q:
-        # Full-text search
-        logs = log_entry_crud.search_logs(
-            db=db,
-            query=q,
-            skip=skip,
-            limit=per_page,
-            **query_filters
-        )
-        total = log_entry_crud.count_logs(
+    # Keyset pagination
+    if cursor or pagination == "cursor":
+        try:
+            result = await log_entry_crud.get_log_entries_keyset_async(
+                db=db,
+                cursor=cursor,
+                limit=per_page,
+                query=q,
+                mode=mode,
+                **query_filters
+            )
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {**result, "per_page": per_page}
+    
+    async def run_search():
+        # Execute search
+        if q:
+            # Full-text search
+            logs = await log_entry_crud.search_logs_async(
+                db=db,
+                query=q,
+                skip=skip,
+                limit=per_page,
+                mode=mode,
+                **query_filters
+            )
+        else:
+            # Filtered search
+            logs = await log_entry_crud.get_log_entries_async(
+                db=db,
+                skip=skip,
+                limit=per_page,
+                **query_filters
+            )
+        # Archived rows are paged after the hot ones, which needs the exact
+        # number of hot rows; an estimate would skip or repeat archived rows
+        totals = await log_entry_crud.count_logs_with_strategy_async(
             db=db,
+            strategy="exact" if archive.reaches_archive(start_time) else count,
             query=q,
+            mode=mode,
             **query_filters
         )
-    else:
-        # Filtered search
-        logs = log_entry_crud.get_log_entries(
-            db=db,
-            skip=skip,
-            limit=per_page,
-            **query_filters
-        )
-        total = log_entry_crud.count_logs(
-            db=db,
-            **{k: v for k, v in query_filters.items() if k not in ['skip', 'limit']}
-        )
+        total = totals["total"]
+        logs = [log_entry_schemas.LogEntryResponse.model_validate(log).model_dump() for log in logs]
+        
+        # Ranges reaching past the hot window continue into the archive tier,
+        # whose rows follow the hot ones
+        if archive.reaches_archive(start_time):
+            archived, archived_total = await run_in_threadpool(
+                archive.search_archive,
+                query=q,
+                skip=max(skip - total, 0),
+                limit=per_page - len(logs),
+                mode=mode,
+                **query_filters
+            )
+            logs.extend(log_entry_schemas.LogEntryResponse.model_validate(log).model_dump() for log in archived)
+            total += archived_total
+        
+        return {
+            "logs": logs,
+            "total": total,
+            "total_relation": totals["total_relation"],
+            "page": page,
+            "per_page": per_page,
+            "total_pages": (total + per_page - 1) // per_page
+        }
     
-    return {
-        "logs": logs,
-        "total": total,
-        "page": page,
-        "per_page": per_page,
-        "total_pages": (total + per_page - 1) // per_page
-    }
+    # Only the first pages are worth caching
+    if page > settings.RESULT_CACHE_SEARCH_PAGES:
+        return await run_search()
+    return await cached_result_async(
+        "search",
+        {"q": q, "mode": mode if q else None, "count": count, "page": page, "per_page": per_page, **query_filters},
+        run_search,
+        start_time=start_time,
+        end_time=end_time,
+    )
 
-@router.get("/analytics/time-series", response_model=List[schemas.TimeSeriesResponse])
-def get_time_series(
+@router.get("/analytics/time-series", response_model=List[search_schemas.TimeSeriesResponse])
+async def get_time_series(
     start_time: datetime,
     end_time: datetime,
     interval: str = "hour",
     log_level: Optional[str] = None,
     source: Optional[str] = None,
-    current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: user_models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_analytics_db)
 ):
     """
-    Get time series data for log events
+    Get time series data for log events, served from the rollup tables
     """
     if interval not in ["minute", "hour", "day"]:
         raise HTTPException(status_code=400, detail="Interval must be one of: minute, hour, day")
     
-    return log_entry_crud.get_time_series(
-        db=db,
+    return await cached_result_async(
+        "time-series",
+        {"start_time": start_time, "end_time": end_time, "interval": interval,
+         "log_level": log_level.upper() if log_level else None, "source": source},
+        lambda: db.run_sync(
+            rollup_crud.get_time_series,
+            start_time=start_time,
+            end_time=end_time,
+            interval=interval,
+            log_level=log_level,
+            source=source
+        ),
         start_time=start_time,
         end_time=end_time,
-        interval=interval,
-        log_level=log_level,
-        source=source
     )
 
-@router.get("/analytics/distribution", response_model=List[schemas.DistributionResponse])
-def get_distribution(
+@router.get("/analytics/distribution", response_model=List[search_schemas.DistributionResponse])
+async def get_distribution(
     field: str = "log_level",
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
-    current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: user_models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_analytics_db)
 ):
     """
-    Get distribution of log events by field
+    Get distribution of log events by field, served from the rollup tables
     """
     if field not in ["log_level", "source"]:
         raise HTTPException(status_code=400, detail="Field must be one of: log_level, source")
     
-    return log_entry_crud.get_distribution(
-        db=db,
-        field=field,
+    return await cached_result_async(
+        "distribution",
+        {"field": field, "start_time": start_time, "end_time": end_time},
+        lambda: _read(
+            db,
+            rollup_crud.get_distribution,
+            field=field,
+            start_time=start_time,
+            end_time=end_time
+        ),
         start_time=start_time,
-        end_time=end_time
+        end_time=end_time,
     )
 
-@router.get("/analytics/top-errors", response_model=List[schemas.ErrorResponse])
-def get_top_errors(
+@router.get("/analytics/top-errors", response_model=List[search_schemas.ErrorResponse])
+async def get_top_errors(
     limit: int = 10,
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
-    current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: user_models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_analytics_db)
 ):
     """
     Get most common error messages
     """
-    return log_entry_crud.get_top_errors(
-        db=db,
-        limit=limit,
+    return await cached_result_async(
+        "top-errors",
+        {"limit": limit, "start_time": start_time, "end_time": end_time},
+        lambda: _read(
+            db,
+            template_crud.get_top_errors,
+            limit=limit,
+            start_time=start_time,
+            end_time=end_time
+        ),
         start_time=start_time,
-        end_time=end_time
+        end_time=end_time,
     )
+
+@router.get("/cache/stats")
+async def get_cache_stats(
+    current_user: user_models.User = Depends(get_current_active_user)
+):
+    """
+    Hit/miss counters of the analytics and search result cache
+    """
+    return result_cache.get_stats()
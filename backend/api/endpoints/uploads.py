@@ -1,13 +1,15 @@
 import os
 import uuid
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from typing import List
 
 from backend.models import upload as upload_models, user as user_models
 from backend.schemas import upload as upload_schemas
-from backend.services.database import get_db
+from backend.services.database import get_async_db, get_db
 from backend.services.auth import get_current_active_user
+from backend.services.storage import save_upload_file
 from backend.crud import upload as upload_crud, log_entry as log_entry_crud
 from backend.tasks import process_upload
 
@@ -17,10 +19,11 @@ router = APIRouter(prefix="/uploads", tags=["uploads"])
 UPLOAD_DIR = "uploads"
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
-@router.post("/", response_model=schemas.UploadResponse)
+@router.post("/", response_model=upload_schemas.UploadResponse)
 async def upload_file(
+    request: Request,
     file: UploadFile = File(...),
-    current_user: models.User = Depends(get_current_active_user),
+    current_user: user_models.User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
 ):
     # Save the uploaded file
@@ -29,24 +32,27 @@ async def upload_file(
     file_path = os.path.join(UPLOAD_DIR, filename)
     
     try:
-        # Save file to disk
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Stream file to disk, sizing and hashing it on the way
+        size, checksum = await save_upload_file(file, file_path)
         
         # Create upload record
         db_upload = upload_crud.create_upload(
             db=db,
             user_id=current_user.id,
             filename=file.filename,
-            size=len(content)
+            size=size,
+            checksum=checksum
         )
         
-        # Start background task to process the file
-        process_upload.delay(db_upload.id, file_path)
+        # Start background task to process the file, profiling it along
+        # with a profiled upload request
+        profile = getattr(request.state, "profile_id", None) is not None
+        process_upload.delay(db_upload.id, file_path, profile=profile)
         
         return db_upload
         
+    except HTTPException:
+        raise
     except Exception as e:
         # Clean up file if something goes wrong
         if os.path.exists(file_path):
@@ -56,28 +62,28 @@ async def upload_file(
             detail=f"Error processing file: {str(e)}"
         )
 
-@router.get("/", response_model=List[schemas.UploadResponse])
-def list_uploads(
+@router.get("/", response_model=List[upload_schemas.UploadResponse])
+async def list_uploads(
     skip: int = 0,
     limit: int = 100,
-    current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: user_models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    return upload_crud.get_uploads(
+    return await upload_crud.get_uploads_async(
         db=db,
         skip=skip,
         limit=limit,
         user_id=current_user.id
     )
 
-@router.get("/{upload_id}", response_model=schemas.UploadWithLogs)
-def get_upload(
+@router.get("/{upload_id}", response_model=upload_schemas.UploadWithLogs)
+async def get_upload(
     upload_id: int,
-    current_user: models.User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    current_user: user_models.User = Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
 ):
     # Get the upload
-    db_upload = upload_crud.get_upload(db, upload_id=upload_id)
+    db_upload = await upload_crud.get_upload_async(db, upload_id=upload_id)
     if not db_upload:
         raise HTTPException(status_code=404, detail="Upload not found")
     
@@ -86,7 +92,7 @@ def get_upload(
         raise HTTPException(status_code=403, detail="Not authorized to access this upload")
     
     # Get associated logs
-    logs = log_entry_crud.get_log_entries(
+    logs = await log_entry_crud.get_log_entries_async(
         db=db,
         upload_id=upload_id,
         limit=100  # Limit number of logs returned
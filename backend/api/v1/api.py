@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from backend.api.endpoints import auth, uploads, search
+from backend.api.endpoints import admin, auth, uploads, search
 
 api_router = APIRouter()
 
@@ -8,3 +8,4 @@ api_router = APIRouter()
 api_router.include_router(auth.router, prefix="/auth", tags=["auth"])
 api_router.include_router(uploads.router, prefix="/uploads", tags=["uploads"])
 api_router.include_router(search.router, prefix="/search", tags=["search"])
+api_router.include_router(admin.router)
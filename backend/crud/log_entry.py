@@ -1,23 +1,45 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
-from typing import List, Optional, Dict, Any
+from sqlalchemy import func, and_, delete, insert, literal_column, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import Select
+from typing import Iterable, Iterator, List, Optional, Dict, Any, Tuple
 from datetime import datetime
-from ..models.log_entry import LogEntry
+from itertools import islice
+import base64
+import binascii
+import io
+import json
+from ..config.settings import settings
+from ..models.log_entry import FTS_CONFIG, LogEntry, message_tsvector
+from ..services.cache import TTLCache
+from ..services.log_batch import LogColumns
+from ..services.metrics import time_copy
+from .rollup import count_rows, remove_from_rollups
+from .template import discount_deleted_errors
+
+# Columns written by the bulk loaders, in COPY stream order
+COPY_COLUMNS = ('upload_id', 'timestamp', 'log_level', 'source', 'message', 'template_id', 'additional_fields')
+# Rows per executemany call; bounds the parameter lists held in memory
+INSERT_CHUNK_SIZE = 5000
+
+# Read functions build their statements once and run them on either a sync
+# Session or, through their `_async` twins, an AsyncSession
 
 def get_log_entry(db: Session, log_id: int) -> Optional[LogEntry]:
     return db.query(LogEntry).filter(LogEntry.id == log_id).first()
 
-def get_log_entries(
-    db: Session,
-    skip: int = 0,
-    limit: int = 100,
+async def get_log_entry_async(db: AsyncSession, log_id: int) -> Optional[LogEntry]:
+    return await db.scalar(select(LogEntry).filter(LogEntry.id == log_id).limit(1))
+
+def filter_log_entries(
+    query,
     log_level: Optional[str] = None,
     source: Optional[str] = None,
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
-) -> List[LogEntry]:
-    query = db.query(LogEntry)
-    
+    upload_id: Optional[int] = None,
+):
+    """Apply the common search filters to a LogEntry query or select"""
     if log_level:
         query = query.filter(LogEntry.log_level == log_level.upper())
     if source:
@@ -26,22 +48,299 @@ def get_log_entries(
         query = query.filter(LogEntry.timestamp >= start_time)
     if end_time:
         query = query.filter(LogEntry.timestamp <= end_time)
-    
-    return query.offset(skip).limit(limit).all()
+    if upload_id is not None:
+        query = query.filter(LogEntry.upload_id == upload_id)
+    return query
+
+def get_log_entries(
+    db: Session,
+    skip: int = 0,
+    limit: int = 100,
+    log_level: Optional[str] = None,
+    source: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    upload_id: Optional[int] = None,
+) -> List[LogEntry]:
+    stmt = filter_log_entries(select(LogEntry), log_level, source, start_time, end_time, upload_id)
+    return db.scalars(stmt.offset(skip).limit(limit)).all()
+
+async def get_log_entries_async(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    log_level: Optional[str] = None,
+    source: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    upload_id: Optional[int] = None,
+) -> List[LogEntry]:
+    stmt = filter_log_entries(select(LogEntry), log_level, source, start_time, end_time, upload_id)
+    return (await db.scalars(stmt.offset(skip).limit(limit))).all()
+
+SEARCH_MODES = ('substring', 'fulltext')
+
+def _uses_fulltext(db, mode: str) -> bool:
+    return mode == 'fulltext' and db.get_bind().dialect.name == 'postgresql'
+
+def message_matches(db, query: str, mode: str = 'substring'):
+    """Filter clause matching `query` against log messages.
+
+    `fulltext` uses the `to_tsvector` GIN index on PostgreSQL with web-search
+    query syntax. `substring` is a plain ILIKE, which PostgreSQL serves from
+    the trigram index; it is also the fallback for other databases.
+    """
+    if _uses_fulltext(db, mode):
+        return message_tsvector.op('@@')(func.websearch_to_tsquery(literal_column(f"'{FTS_CONFIG}'"), query))
+    return LogEntry.message.ilike(f"%{query}%")
 
 def search_logs(
     db: Session,
     query: str,
     skip: int = 0,
     limit: int = 100,
+    mode: str = 'substring',
+    **filters: Any,
 ) -> List[LogEntry]:
-    return (
-        db.query(LogEntry)
-        .filter(LogEntry.message.ilike(f"%{query}%"))
-        .offset(skip)
-        .limit(limit)
-        .all()
+    return db.scalars(_search_statement(db, query, skip, limit, mode, **filters)).all()
+
+async def search_logs_async(
+    db: AsyncSession,
+    query: str,
+    skip: int = 0,
+    limit: int = 100,
+    mode: str = 'substring',
+    **filters: Any,
+) -> List[LogEntry]:
+    return (await db.scalars(_search_statement(db, query, skip, limit, mode, **filters))).all()
+
+def _search_statement(db, query: str, skip: int = 0, limit: int = 100, mode: str = 'substring', **filters: Any) -> Select:
+    stmt = filter_log_entries(select(LogEntry), **filters).filter(message_matches(db, query, mode))
+    if _uses_fulltext(db, mode):
+        # Best matches first
+        rank = func.ts_rank(message_tsvector, func.websearch_to_tsquery(literal_column(f"'{FTS_CONFIG}'"), query))
+        stmt = stmt.order_by(rank.desc(), LogEntry.id.desc())
+    return stmt.offset(skip).limit(limit)
+
+def _matching(db, columns, query: Optional[str] = None, mode: str = 'substring', **filters: Any) -> Select:
+    """Select of `columns` over the log entries a search matches"""
+    stmt = filter_log_entries(select(columns), **filters)
+    if query:
+        stmt = stmt.filter(message_matches(db, query, mode))
+    return stmt
+
+def count_logs(db: Session, query: Optional[str] = None, mode: str = 'substring', **filters: Any) -> int:
+    return db.scalar(_matching(db, func.count(LogEntry.id), query, mode, **filters))
+
+async def count_logs_async(db: AsyncSession, query: Optional[str] = None, mode: str = 'substring', **filters: Any) -> int:
+    return await db.scalar(_matching(db, func.count(LogEntry.id), query, mode, **filters))
+
+COUNT_STRATEGIES = ('exact', 'estimate', 'capped')
+_count_cache = TTLCache(maxsize=settings.SEARCH_COUNT_CACHE_SIZE, ttl=settings.SEARCH_COUNT_CACHE_TTL)
+
+def normalize_filters(query: Optional[str] = None, mode: str = 'substring', **filters: Any) -> Tuple:
+    """Hashable, order-independent key for a search's filter set"""
+    normalized = {'query': query.strip() if query else None, 'mode': mode if query else None}
+    for name, value in filters.items():
+        if value is None or value == '':
+            continue
+        if name == 'log_level':
+            value = value.upper()
+        elif isinstance(value, datetime):
+            value = value.isoformat()
+        normalized[name] = value
+    return tuple(sorted((k, v) for k, v in normalized.items() if v is not None))
+
+def _explain(db, query: Optional[str] = None, mode: str = 'substring', **filters: Any) -> Tuple[str, Any]:
+    """EXPLAIN JSON statement and driver parameters for a search"""
+    compiled = _matching(db, LogEntry.id, query, mode, **filters).compile(dialect=db.get_bind().dialect)
+    params = compiled.params
+    if compiled.positional:
+        # asyncpg takes positional `$n` parameters
+        params = tuple(params[name] for name in compiled.positiontup)
+    return f"EXPLAIN (FORMAT JSON) {compiled}", params
+
+def _plan_rows(plan: Any) -> int:
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+def estimate_count(db: Session, query: Optional[str] = None, mode: str = 'substring', **filters: Any) -> Optional[int]:
+    """Row estimate from PostgreSQL's planner, or None on other databases"""
+    if db.get_bind().dialect.name != 'postgresql':
+        return None
+    return _plan_rows(db.connection().exec_driver_sql(*_explain(db, query, mode, **filters)).scalar())
+
+async def estimate_count_async(db: AsyncSession, query: Optional[str] = None, mode: str = 'substring', **filters: Any) -> Optional[int]:
+    if db.get_bind().dialect.name != 'postgresql':
+        return None
+    connection = await db.connection()
+    return _plan_rows((await connection.exec_driver_sql(*_explain(db, query, mode, **filters))).scalar())
+
+def _capped(db, cap: int, query: Optional[str] = None, mode: str = 'substring', **filters: Any) -> Select:
+    ids = _matching(db, LogEntry.id, query, mode, **filters).limit(cap + 1).subquery()
+    return select(func.count()).select_from(ids)
+
+def capped_count(db: Session, cap: int, query: Optional[str] = None, mode: str = 'substring', **filters: Any) -> int:
+    """Count matching rows, stopping once more than `cap` are found"""
+    return db.scalar(_capped(db, cap, query, mode, **filters))
+
+async def capped_count_async(db: AsyncSession, cap: int, query: Optional[str] = None, mode: str = 'substring', **filters: Any) -> int:
+    return await db.scalar(_capped(db, cap, query, mode, **filters))
+
+def _capped_total(total: int, cap: int) -> Dict[str, Any]:
+    if total > cap:
+        return {"total": cap, "total_relation": "gte"}
+    return {"total": total, "total_relation": "eq"}
+
+def count_logs_with_strategy(
+    db: Session,
+    strategy: Optional[str] = None,
+    query: Optional[str] = None,
+    cap: Optional[int] = None,
+    mode: str = 'substring',
+    **filters: Any,
+) -> Dict[str, Any]:
+    """Total for a search under the given count strategy.
+
+    Returns `total` and `total_relation`: "eq" for exact counts, "approx" for
+    planner estimates and "gte" when a capped count hit its cap. Exact counts
+    are cached per normalized filter set for `SEARCH_COUNT_CACHE_TTL` seconds.
+    Estimates fall back to a capped count on databases without EXPLAIN JSON.
+    """
+    strategy = strategy or settings.SEARCH_COUNT_STRATEGY
+    if strategy not in COUNT_STRATEGIES:
+        raise ValueError(f"Unknown count strategy: {strategy}")
+    cap = cap or settings.SEARCH_COUNT_CAP
+
+    if strategy == 'estimate':
+        estimate = estimate_count(db, query=query, mode=mode, **filters)
+        if estimate is not None:
+            return {"total": estimate, "total_relation": "approx"}
+        strategy = 'capped'
+
+    if strategy == 'capped':
+        return _capped_total(capped_count(db, cap, query=query, mode=mode, **filters), cap)
+
+    total = _count_cache.get_or_set(
+        normalize_filters(query, mode, **filters),
+        lambda: count_logs(db, query=query, mode=mode, **filters),
     )
+    return {"total": total, "total_relation": "eq"}
+
+async def count_logs_with_strategy_async(
+    db: AsyncSession,
+    strategy: Optional[str] = None,
+    query: Optional[str] = None,
+    cap: Optional[int] = None,
+    mode: str = 'substring',
+    **filters: Any,
+) -> Dict[str, Any]:
+    strategy = strategy or settings.SEARCH_COUNT_STRATEGY
+    if strategy not in COUNT_STRATEGIES:
+        raise ValueError(f"Unknown count strategy: {strategy}")
+    cap = cap or settings.SEARCH_COUNT_CAP
+
+    if strategy == 'estimate':
+        estimate = await estimate_count_async(db, query=query, mode=mode, **filters)
+        if estimate is not None:
+            return {"total": estimate, "total_relation": "approx"}
+        strategy = 'capped'
+
+    if strategy == 'capped':
+        return _capped_total(await capped_count_async(db, cap, query=query, mode=mode, **filters), cap)
+
+    key = normalize_filters(query, mode, **filters)
+    total = _count_cache.get(key)
+    if total is None:
+        total = await count_logs_async(db, query=query, mode=mode, **filters)
+        _count_cache.set(key, total)
+    return {"total": total, "total_relation": "eq"}
+
+def encode_cursor(entry: LogEntry, direction: str) -> str:
+    """Opaque keyset cursor pointing just past `entry` in `direction`"""
+    payload = json.dumps([entry.timestamp.isoformat(), entry.id, direction], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int, str]:
+    """Decode a cursor from `encode_cursor`; raises ValueError if malformed"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        timestamp, log_id, direction = json.loads(base64.urlsafe_b64decode(padded))
+        if direction not in ('next', 'prev'):
+            raise ValueError(direction)
+        return datetime.fromisoformat(timestamp), int(log_id), direction
+    except (ValueError, TypeError, binascii.Error):
+        raise ValueError("Invalid cursor")
+
+def get_log_entries_keyset(
+    db: Session,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    query: Optional[str] = None,
+    mode: str = 'substring',
+    **filters: Any,
+) -> Dict[str, Any]:
+    """Page through log entries newest first, keyed on `(timestamp, id)`.
+
+    Unlike offset paging, each page is a bounded range scan on
+    `idx_timestamp_id` starting at the cursor, so its cost does not grow with
+    depth. Returns the page plus opaque `next_cursor`/`prev_cursor` values
+    (None at either end).
+    """
+    stmt, direction = _keyset_statement(db, cursor, limit, query, mode, **filters)
+    return _keyset_page(db.scalars(stmt).all(), cursor, limit, direction)
+
+async def get_log_entries_keyset_async(
+    db: AsyncSession,
+    cursor: Optional[str] = None,
+    limit: int = 100,
+    query: Optional[str] = None,
+    mode: str = 'substring',
+    **filters: Any,
+) -> Dict[str, Any]:
+    stmt, direction = _keyset_statement(db, cursor, limit, query, mode, **filters)
+    return _keyset_page((await db.scalars(stmt)).all(), cursor, limit, direction)
+
+def _keyset_statement(
+    db,
+    cursor: Optional[str],
+    limit: int,
+    query: Optional[str] = None,
+    mode: str = 'substring',
+    **filters: Any,
+) -> Tuple[Select, str]:
+    """Statement fetching one keyset page plus a lookahead row, and its direction"""
+    stmt = _matching(db, LogEntry, query, mode, **filters)
+    key = tuple_(LogEntry.timestamp, LogEntry.id)
+
+    if cursor:
+        timestamp, log_id, direction = decode_cursor(cursor)
+    else:
+        direction = 'next'
+
+    if direction == 'prev':
+        # Walk backwards towards newer entries; the page restores newest-first order
+        stmt = stmt.filter(key > tuple_(timestamp, log_id)).order_by(LogEntry.timestamp.asc(), LogEntry.id.asc())
+    else:
+        if cursor:
+            stmt = stmt.filter(key < tuple_(timestamp, log_id))
+        stmt = stmt.order_by(LogEntry.timestamp.desc(), LogEntry.id.desc())
+    return stmt.limit(limit + 1), direction
+
+def _keyset_page(rows: List[LogEntry], cursor: Optional[str], limit: int, direction: str) -> Dict[str, Any]:
+    if direction == 'prev':
+        has_more = len(rows) > limit
+        logs = rows[:limit][::-1]
+        next_cursor = encode_cursor(logs[-1], 'next') if logs else None
+        prev_cursor = encode_cursor(logs[0], 'prev') if logs and has_more else None
+    else:
+        has_more = len(rows) > limit
+        logs = rows[:limit]
+        next_cursor = encode_cursor(logs[-1], 'next') if logs and has_more else None
+        prev_cursor = encode_cursor(logs[0], 'prev') if logs and cursor else None
+
+    return {"logs": logs, "next_cursor": next_cursor, "prev_cursor": prev_cursor}
 
 def create_log_entry(db: Session, log_data: Dict[str, Any]) -> LogEntry:
     db_log = LogEntry(**log_data)
@@ -50,24 +349,188 @@ def create_log_entry(db: Session, log_data: Dict[str, Any]) -> LogEntry:
     db.refresh(db_log)
     return db_log
 
-def bulk_create_log_entries(db: Session, logs: List[Dict[str, Any]]) -> None:
-    db.bulk_insert_mappings(LogEntry, logs)
-    db.commit()
+def _copy_escape(value: Any) -> str:
+    """Encode a value for PostgreSQL's COPY text format"""
+    if value is None:
+        return '\\N'
+    if isinstance(value, datetime):
+        value = value.isoformat()
+    elif isinstance(value, dict):
+        value = json.dumps(value, separators=(',', ':'))
+    else:
+        value = str(value)
+    return (
+        value.replace('\\', '\\\\')
+        .replace('\t', '\\t')
+        .replace('\n', '\\n')
+        .replace('\r', '\\r')
+    )
+
+class CopyStream:
+    """File-like object that encodes log entries into COPY rows on demand.
+
+    `copy_expert` pulls from `read()`, so rows are encoded lazily and only a
+    read-sized buffer is ever held in memory.
+    """
+    def __init__(self, logs: Iterable[Dict[str, Any]]):
+        self._rows = self._encode(logs)
+        self._buffer = ''
+        self.rows = 0
+
+    def _encode(self, logs: Iterable[Dict[str, Any]]) -> Iterator[str]:
+        for log in logs:
+            self.rows += 1
+            yield '\t'.join(_copy_escape(log.get(column)) for column in COPY_COLUMNS) + '\n'
+
+    def read(self, size: int = -1) -> str:
+        while size < 0 or len(self._buffer) < size:
+            row = next(self._rows, None)
+            if row is None:
+                break
+            self._buffer += row
+        if size < 0:
+            size = len(self._buffer)
+        chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+def copy_log_entries(db: Session, logs: Iterable[Dict[str, Any]]) -> int:
+    """Stream log entries into PostgreSQL with COPY ... FROM STDIN"""
+    stream = CopyStream(logs)
+    cursor = db.connection().connection.cursor()
+    try:
+        with time_copy(db.get_bind()):
+            cursor.copy_expert(
+                f"COPY {LogEntry.__tablename__} ({', '.join(COPY_COLUMNS)}) FROM STDIN",
+                stream,
+            )
+    finally:
+        cursor.close()
+    return stream.rows
+
+def insert_log_entries(db: Session, logs: Iterable[Dict[str, Any]]) -> int:
+    """Insert log entries in chunks, each one executemany of a single INSERT statement"""
+    rows = 0
+    iterator = iter(logs)
+    while True:
+        chunk = [{column: log.get(column) for column in COPY_COLUMNS} for log in islice(iterator, INSERT_CHUNK_SIZE)]
+        if not chunk:
+            return rows
+        db.execute(insert(LogEntry), chunk)
+        rows += len(chunk)
+
+def bulk_create_log_entries(db: Session, logs: Iterable[Dict[str, Any]], commit: bool = True) -> int:
+    """Bulk load log entries, using COPY on PostgreSQL and executemany INSERT elsewhere"""
+    if db.get_bind().dialect.name == 'postgresql':
+        rows = copy_log_entries(db, logs)
+    else:
+        rows = insert_log_entries(db, logs)
+    if commit:
+        db.commit()
+    return rows
+
+def _copy_column(values: List[Optional[str]]) -> List[str]:
+    """COPY-encode a column of strings; None becomes NULL.
+
+    Values without newlines are escaped as one newline-joined string, so the
+    replacements run once per column rather than once per value.
+    """
+    joined = '\n'.join('' if value is None else value for value in values)
+    escaped = joined.replace('\\', '\\\\').replace('\t', '\\t').replace('\r', '\\r').split('\n')
+    if len(escaped) != len(values):
+        return [_copy_escape(value) for value in values]
+    if None in values:
+        return ['\\N' if value is None else text for value, text in zip(values, escaped)]
+    return escaped
+
+def encode_copy_columns(batch: LogColumns) -> str:
+    """COPY text of a column batch, encoded column by column instead of per row dict"""
+    size = len(batch)
+    columns = {
+        'upload_id': [str(batch.upload_id)] * size,
+        'timestamp': batch.iso_timestamps(),
+        'log_level': batch.log_levels,
+        'source': batch.sources,
+        'message': batch.messages,
+        'template_id': batch.template_ids or [None] * size,
+        'additional_fields': batch.additional_fields_json(),
+    }
+    encoded = [_copy_column(columns[column]) for column in COPY_COLUMNS]
+    return ''.join(line + '\n' for line in map('\t'.join, zip(*encoded)))
+
+def copy_log_columns(db: Session, batch: LogColumns) -> int:
+    """Stream a column batch into PostgreSQL with COPY ... FROM STDIN"""
+    data = io.StringIO(encode_copy_columns(batch))
+    cursor = db.connection().connection.cursor()
+    try:
+        with time_copy(db.get_bind()):
+            cursor.copy_expert(f"COPY {LogEntry.__tablename__} ({', '.join(COPY_COLUMNS)}) FROM STDIN", data)
+    finally:
+        cursor.close()
+    return len(batch)
+
+def bulk_create_log_columns(db: Session, batch: LogColumns, commit: bool = True) -> int:
+    """Bulk load a column batch: COPY on PostgreSQL, executemany INSERT elsewhere"""
+    if not len(batch):
+        return 0
+    if db.get_bind().dialect.name == 'postgresql':
+        rows = copy_log_columns(db, batch)
+    else:
+        rows = insert_log_entries(db, batch.to_dicts())
+    if commit:
+        db.commit()
+    return rows
+
+def delete_log_entries(db: Session, condition, batch_size: int = 10000) -> int:
+    """Delete matching log entries in bounded batches, committing each one.
+
+    Every batch is its own short transaction, so locks are held only for the
+    time one batch takes rather than for the whole purge. Each batch's rows
+    are taken out of the rollups and its errors out of the day sketches in
+    the same transaction.
+    """
+    total = 0
+    while True:
+        ids = select(LogEntry.id).where(condition).limit(batch_size).scalar_subquery()
+        rows = db.execute(
+            delete(LogEntry)
+            .where(LogEntry.id.in_(ids))
+            .returning(
+                LogEntry.upload_id, LogEntry.timestamp, LogEntry.log_level, LogEntry.source, LogEntry.template_id,
+            ),
+            execution_options={"synchronize_session": False},
+        ).all()
+        remove_from_rollups(db, count_rows(row[:4] for row in rows))
+        discount_deleted_errors(db, ((row.timestamp, row.log_level, row.template_id) for row in rows))
+        db.commit()
+        total += len(rows)
+        if len(rows) < batch_size:
+            return total
 
 def get_log_statistics(
     db: Session,
     start_time: Optional[datetime] = None,
     end_time: Optional[datetime] = None,
 ) -> Dict[str, Any]:
-    query = db.query(
+    results = db.execute(_statistics_statement(start_time, end_time)).all()
+    return {level: count for level, count in results}
+
+async def get_log_statistics_async(
+    db: AsyncSession,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> Dict[str, Any]:
+    results = (await db.execute(_statistics_statement(start_time, end_time))).all()
+    return {level: count for level, count in results}
+
+def _statistics_statement(start_time: Optional[datetime] = None, end_time: Optional[datetime] = None) -> Select:
+    stmt = select(
         LogEntry.log_level,
         func.count(LogEntry.id).label("count")
     )
     
     if start_time:
-        query = query.filter(LogEntry.timestamp >= start_time)
+        stmt = stmt.filter(LogEntry.timestamp >= start_time)
     if end_time:
-        query = query.filter(LogEntry.timestamp <= end_time)
+        stmt = stmt.filter(LogEntry.timestamp <= end_time)
     
-    results = query.group_by(LogEntry.log_level).all()
-    return {level: count for level, count in results}
+    return stmt.group_by(LogEntry.log_level)
@@ -0,0 +1,262 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, text
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from collections import Counter
+from datetime import datetime, timezone
+from ..models.log_entry import LogEntry
+from ..models.rollup import LogRollup, UploadRollup
+from ..models.upload import Upload
+from ..services import archive
+
+# Coarsest first
+GRANULARITIES = ('day', 'hour', 'minute')
+UPSERT_CHUNK_SIZE = 500
+
+def _as_utc(value: Any) -> datetime:
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def truncate(value: datetime, granularity: str) -> datetime:
+    """Start of the UTC bucket containing `value`"""
+    value = _as_utc(value)
+    if granularity == 'day':
+        return value.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == 'hour':
+        return value.replace(minute=0, second=0, microsecond=0)
+    return value.replace(second=0, microsecond=0)
+
+def count_rows(rows: Iterable[Tuple[int, datetime, str, str]]) -> Counter:
+    """Per (upload_id, minute, level, source) counts of (upload_id, timestamp, level, source) rows"""
+    counts: Counter = Counter()
+    for upload_id, timestamp, level, source in rows:
+        counts[(upload_id, truncate(timestamp, 'minute'), level, source)] += 1
+    return counts
+
+def count_table_rows(db: Session, table: str) -> Counter:
+    """Per (upload_id, minute, level, source) counts of one log_entries partition"""
+    rows = db.execute(text(
+        f"SELECT upload_id, date_trunc('minute', timestamp), log_level, source, count(*) "
+        f"FROM {table} GROUP BY 1, 2, 3, 4"
+    ))
+    return Counter({
+        (upload_id, _as_utc(bucket), level, source): count
+        for upload_id, bucket, level, source, count in rows
+    })
+
+def _minute_counts(db: Session, upload_id: int) -> List[Tuple[datetime, str, str, int]]:
+    """Per-minute (bucket, level, source, count) of one upload's rows"""
+    if db.get_bind().dialect.name == 'postgresql':
+        minute = func.date_trunc('minute', LogEntry.timestamp)
+    else:
+        minute = func.strftime('%Y-%m-%d %H:%M:00', LogEntry.timestamp)
+    rows = (
+        db.query(minute.label('bucket'), LogEntry.log_level, LogEntry.source, func.count(LogEntry.id))
+        .filter(LogEntry.upload_id == upload_id)
+        .group_by(minute, LogEntry.log_level, LogEntry.source)
+        .all()
+    )
+    return [(_as_utc(bucket), level, source, count) for bucket, level, source, count in rows]
+
+def apply_minute_counts(db: Session, minute_counts: Iterable[Tuple[datetime, str, str, int]], sign: int = 1) -> int:
+    """Add (or with sign=-1, subtract) per-minute counts to every rollup level.
+
+    The hour and day buckets are derived from the minute ones. Does not
+    commit. Returns the number of rollup rows touched.
+    """
+    counts: Counter = Counter()
+    for bucket, level, source, count in minute_counts:
+        for granularity in GRANULARITIES:
+            counts[(granularity, truncate(bucket, granularity), level, source)] += sign * count
+    if not counts:
+        return 0
+
+    dialect_insert = postgresql_insert if db.get_bind().dialect.name == 'postgresql' else sqlite_insert
+    # Upserting in key order keeps concurrent rollups and removals from
+    # deadlocking on shared hour and day buckets
+    rows = [
+        {'granularity': g, 'bucket': b, 'log_level': level, 'source': source, 'count': count}
+        for (g, b, level, source), count in sorted(counts.items())
+    ]
+    for start in range(0, len(rows), UPSERT_CHUNK_SIZE):
+        stmt = dialect_insert(LogRollup).values(rows[start:start + UPSERT_CHUNK_SIZE])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=['granularity', 'bucket', 'log_level', 'source'],
+            set_={'count': LogRollup.count + stmt.excluded.count},
+        ))
+    if sign < 0:
+        db.query(LogRollup).filter(LogRollup.count <= 0).delete(synchronize_session=False)
+    return len(rows)
+
+def rollup_upload(db: Session, upload_id: int) -> bool:
+    """Fold a finished upload into the rollups exactly once.
+
+    Only aggregates are read back: one GROUP BY on the upload's rows. The
+    counts added are also kept as the upload's contribution.
+    """
+    db_upload = db.query(Upload).filter(Upload.id == upload_id).with_for_update().first()
+    if not db_upload or db_upload.rolled_up_at is not None:
+        db.rollback()
+        return False
+    minute_counts = _minute_counts(db, upload_id)
+    apply_minute_counts(db, minute_counts)
+    db.bulk_insert_mappings(UploadRollup, [
+        {'upload_id': upload_id, 'bucket': bucket, 'log_level': level, 'source': source, 'count': count}
+        for bucket, level, source, count in minute_counts
+    ])
+    db_upload.rolled_up_at = func.now()
+    db.commit()
+    return True
+
+def backfill_rollups(db: Session, limit: Optional[int] = None) -> List[int]:
+    """Roll up completed uploads that never were, e.g. ingested before rollups existed.
+
+    Each upload commits on its own. Returns the ids rolled up.
+    """
+    query = (
+        db.query(Upload.id)
+        .filter(Upload.status == 'completed', Upload.rolled_up_at.is_(None))
+        .order_by(Upload.id)
+    )
+    if limit:
+        query = query.limit(limit)
+    upload_ids = [upload_id for (upload_id,) in query.all()]
+    db.rollback()
+    return [upload_id for upload_id in upload_ids if rollup_upload(db, upload_id)]
+
+def unroll_upload(db: Session, upload_id: int) -> bool:
+    """Remove an upload's contribution from the rollups. Does not commit.
+
+    Subtracts what `rollup_upload` added rather than recounting the rows,
+    which retention or archiving may have moved away since.
+    """
+    db_upload = db.query(Upload).filter(Upload.id == upload_id).with_for_update().first()
+    if not db_upload or db_upload.rolled_up_at is None:
+        return False
+    contribution = db.query(UploadRollup).filter(UploadRollup.upload_id == upload_id)
+    apply_minute_counts(db, [
+        (_as_utc(row.bucket), row.log_level, row.source, row.count) for row in contribution
+    ], sign=-1)
+    contribution.delete(synchronize_session=False)
+    db_upload.rolled_up_at = None
+    return True
+
+def remove_from_rollups(db: Session, removed: Counter) -> int:
+    """Take deleted log entries out of the rollups. Does not commit.
+
+    `removed` counts the rows per (upload_id, minute, level, source). Only
+    what an upload's stored contribution still holds is subtracted, so rows
+    of uploads not rolled up yet, or already unrolled, change nothing.
+    Returns the number of rows taken out.
+    """
+    if not removed:
+        return 0
+    upload_ids = sorted({key[0] for key in removed})
+    # Waits for a rollup_upload of these uploads that may have counted the rows
+    db.query(Upload.id).filter(Upload.id.in_(upload_ids)).with_for_update(read=True).all()
+    buckets = [key[1] for key in removed]
+    stored = (
+        db.query(UploadRollup)
+        .filter(
+            UploadRollup.upload_id.in_(upload_ids),
+            UploadRollup.bucket >= min(buckets),
+            UploadRollup.bucket <= max(buckets),
+        )
+        .all()
+    )
+    taken = []
+    for row in stored:
+        bucket = _as_utc(row.bucket)
+        count = min(removed.get((row.upload_id, bucket, row.log_level, row.source), 0), row.count)
+        if not count:
+            continue
+        taken.append((bucket, row.log_level, row.source, count))
+        row.count -= count
+        if row.count <= 0:
+            db.delete(row)
+    apply_minute_counts(db, taken, sign=-1)
+    return sum(count for _, _, _, count in taken)
+
+def choose_granularity(start_time: Optional[datetime], end_time: Optional[datetime]) -> Optional[str]:
+    """Coarsest rollup level whose buckets line up with both range bounds.
+
+    Returns None when a bound falls inside a minute, meaning only the raw
+    table can answer the query exactly.
+    """
+    for granularity in GRANULARITIES:
+        if all(
+            bound is None or truncate(bound, granularity) == _as_utc(bound)
+            for bound in (start_time, end_time)
+        ):
+            return granularity
+    return None
+
+def _filter_range(query, start_time: Optional[datetime], end_time: Optional[datetime]):
+    if start_time:
+        query = query.filter(LogRollup.bucket >= _as_utc(start_time))
+    if end_time:
+        query = query.filter(LogRollup.bucket < _as_utc(end_time))
+    return query
+
+def get_time_series(
+    db: Session,
+    start_time: datetime,
+    end_time: datetime,
+    interval: str = 'hour',
+    log_level: Optional[str] = None,
+    source: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Event counts per `interval` bucket, read from that rollup level.
+
+    Buckets overlapping `[start_time, end_time]` are returned whole.
+    """
+    query = db.query(LogRollup.bucket, func.sum(LogRollup.count).label('count')).filter(
+        LogRollup.granularity == interval,
+        LogRollup.bucket >= truncate(start_time, interval),
+        LogRollup.bucket <= _as_utc(end_time),
+    )
+    if log_level:
+        query = query.filter(LogRollup.log_level == log_level.upper())
+    if source:
+        query = query.filter(LogRollup.source == source)
+    results = query.group_by(LogRollup.bucket).order_by(LogRollup.bucket).all()
+    return [{"x": _as_utc(row.bucket).isoformat(), "y": int(row.count)} for row in results]
+
+def get_distribution(
+    db: Session,
+    field: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """Event counts grouped by `log_level` or `source` over `[start_time, end_time)`.
+
+    Reads the coarsest rollup level aligned with the range, falling back to
+    the raw table, and the archive tier behind it, when the bounds are not
+    minute-aligned. Rollups keep counting rows after they are archived.
+    """
+    granularity = choose_granularity(start_time, end_time)
+    if granularity is None:
+        group_field = getattr(LogEntry, field)
+        query = db.query(group_field.label('name'), func.count(LogEntry.id).label('value'))
+        if start_time:
+            query = query.filter(LogEntry.timestamp >= start_time)
+        if end_time:
+            query = query.filter(LogEntry.timestamp < end_time)
+        results = query.group_by(group_field).all()
+        if archive.reaches_archive(start_time):
+            counts = Counter({row.name: row.value for row in results})
+            counts.update(archive.count_archive(
+                field, start_time=start_time, end_time=end_time, end_inclusive=False
+            ))
+            return [{"name": name, "value": int(value)} for name, value in counts.items()]
+    else:
+        group_field = getattr(LogRollup, field)
+        query = db.query(group_field.label('name'), func.sum(LogRollup.count).label('value')).filter(
+            LogRollup.granularity == granularity
+        )
+        results = _filter_range(query, start_time, end_time).group_by(group_field).all()
+    return [{"name": row.name, "value": int(row.value)} for row in results]
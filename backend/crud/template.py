@@ -0,0 +1,241 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+from collections import Counter
+from datetime import datetime, timezone
+import threading
+from ..config.settings import settings
+from ..models.log_entry import LogEntry
+from ..models.template import ErrorSketch, MessageTemplate
+from ..services import archive
+from ..services.log_batch import LEVEL_CODES, LogColumns
+from ..services.sketch import SpaceSaving
+from .rollup import choose_granularity, truncate, _as_utc
+
+# Template ids known to be stored, so batches skip re-inserting them
+_known_templates: Set[str] = set()
+_lock = threading.Lock()
+
+def _dialect_insert(db: Session):
+    return postgresql_insert if db.get_bind().dialect.name == 'postgresql' else sqlite_insert
+
+def save_templates(db: Session, templates: Dict[str, str]) -> int:
+    """Insert templates not stored yet. Does not commit."""
+    with _lock:
+        new = {tid: text for tid, text in templates.items() if tid not in _known_templates}
+    if not new:
+        return 0
+    # Inserting in id order keeps parallel chunks sharing new templates from
+    # deadlocking on each other's rows
+    stmt = _dialect_insert(db)(MessageTemplate).values(
+        [{'id': tid, 'template': new[tid]} for tid in sorted(new)]
+    )
+    db.execute(stmt.on_conflict_do_nothing(index_elements=['id']))
+    # Ids are only trusted once the surrounding transaction commits; a
+    # rollback at worst costs one redundant insert later
+    with _lock:
+        _known_templates.update(new)
+    return len(new)
+
+def sketch_shard(upload_id: int, start: int) -> int:
+    """Sketch shard the batches of the chunk at byte `start` count into.
+
+    Consecutive chunks of an upload, which ingest in parallel, get
+    different shards.
+    """
+    return (upload_id + start // settings.INGEST_CHUNK_BYTES) % settings.ERROR_SKETCH_SHARDS
+
+def _lock_sketches(db: Session, buckets: Iterable[datetime], shard: int) -> Dict[datetime, ErrorSketch]:
+    """Fetch one shard's sketch rows for `buckets` for update, creating missing ones"""
+    buckets = sorted(set(buckets))
+    stmt = _dialect_insert(db)(ErrorSketch).values(
+        [{'bucket': bucket, 'shard': shard, 'sketch': {}} for bucket in buckets]
+    )
+    db.execute(stmt.on_conflict_do_nothing(index_elements=['bucket', 'shard']))
+    # Locking in (bucket, shard) order keeps concurrent writers from deadlocking
+    rows = (
+        db.query(ErrorSketch)
+        .filter(ErrorSketch.bucket.in_(buckets), ErrorSketch.shard == shard)
+        .order_by(ErrorSketch.bucket)
+        .with_for_update()
+        .all()
+    )
+    return {_as_utc(row.bucket): row for row in rows}
+
+def update_error_sketches(db: Session, counts: Dict[Tuple[datetime, str], int], shard: int = 0) -> int:
+    """Add per-(day, template id) error counts to one shard of the day sketches.
+
+    Does not commit. Returns the number of day sketches touched.
+    """
+    if not counts:
+        return 0
+    rows = _lock_sketches(db, (bucket for bucket, _ in counts), shard)
+    sketches = {
+        bucket: SpaceSaving.from_dict(row.sketch, settings.ERROR_SKETCH_CAPACITY)
+        for bucket, row in rows.items()
+    }
+    # Heaviest first, so a batch's own small items are the ones evicted
+    for (bucket, tid), count in sorted(counts.items(), key=lambda kv: kv[1], reverse=True):
+        sketches[bucket].offer(tid, count)
+    for bucket, sketch in sketches.items():
+        # Assign a new object so the JSON column is flagged as changed
+        rows[bucket].sketch = sketch.to_dict()
+    return len(sketches)
+
+def discount_error_sketches(db: Session, counts: Dict[Tuple[datetime, str], int]) -> int:
+    """Take per-(day, template id) error counts out of the day sketches.
+
+    An upload's errors are spread over the shards its chunks used, so each
+    count is taken from the day's shards in turn until it is used up.
+    Does not commit. Returns the number of shard sketches touched.
+    """
+    if not counts:
+        return 0
+    rows = (
+        db.query(ErrorSketch)
+        .filter(ErrorSketch.bucket.in_(sorted({bucket for bucket, _ in counts})))
+        .order_by(ErrorSketch.bucket, ErrorSketch.shard)
+        .with_for_update()
+        .all()
+    )
+    shards: Dict[datetime, List[Tuple[ErrorSketch, SpaceSaving]]] = {}
+    for row in rows:
+        shards.setdefault(_as_utc(row.bucket), []).append(
+            (row, SpaceSaving.from_dict(row.sketch, settings.ERROR_SKETCH_CAPACITY))
+        )
+    touched = set()
+    for (bucket, tid), count in counts.items():
+        for row, sketch in shards.get(bucket, []):
+            if count <= 0:
+                break
+            counter = sketch.counters.get(tid)
+            if counter is None:
+                continue
+            taken = min(count, counter[0])
+            sketch.discount(tid, taken)
+            count -= taken
+            touched.add(row.id)
+    for day in shards.values():
+        for row, sketch in day:
+            if row.id in touched:
+                row.sketch = sketch.to_dict()
+    return len(touched)
+
+def record_batch(db: Session, batch: LogColumns, shard: int = 0) -> None:
+    """Store new templates and count a batch's errors into a shard of the day sketches.
+
+    Runs inside the batch's insert transaction, so retried batches are never
+    counted twice. Writers in different shards do not wait on each other's
+    sketch locks. Does not commit.
+    """
+    if not batch.template_ids:
+        return
+    save_templates(db, dict(zip(batch.template_ids, batch.templates)))
+    errors = (batch.level_codes == LEVEL_CODES['ERROR']).nonzero()[0]
+    days = batch.timestamps[errors].astype('datetime64[D]').tolist()
+    day_counts = Counter(zip(days, (batch.template_ids[i] for i in errors)))
+    update_error_sketches(db, {
+        (datetime(day.year, day.month, day.day, tzinfo=timezone.utc), tid): count
+        for (day, tid), count in day_counts.items()
+    }, shard)
+
+def discount_deleted_errors(db: Session, rows: Iterable[Tuple[datetime, str, Optional[str]]]) -> int:
+    """Take deleted (timestamp, level, template id) rows' errors out of the day sketches. Does not commit."""
+    counts: Counter = Counter(
+        (truncate(timestamp, 'day'), tid) for timestamp, level, tid in rows
+        if level == 'ERROR' and tid is not None
+    )
+    return discount_error_sketches(db, counts)
+
+def prune_error_sketches(db: Session, before: datetime) -> int:
+    """Delete day sketches that end at or before `before`. Does not commit."""
+    cutoff = truncate(before, 'day')
+    return db.query(ErrorSketch).filter(ErrorSketch.bucket < cutoff).delete(synchronize_session=False)
+
+def get_top_errors_from_sketches(
+    db: Session,
+    limit: int = 10,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """Top error templates over `[start_time, end_time)` from the day sketches.
+
+    Reads a few small rows per day, one per shard, instead of the error rows
+    themselves; counts are upper bounds, off by at most the reported `error`.
+    """
+    query = db.query(ErrorSketch.sketch)
+    if start_time:
+        query = query.filter(ErrorSketch.bucket >= _as_utc(start_time))
+    if end_time:
+        query = query.filter(ErrorSketch.bucket < _as_utc(end_time))
+    merged = SpaceSaving(settings.ERROR_SKETCH_CAPACITY)
+    for (data,) in query:
+        merged = merged.merge(SpaceSaving.from_dict(data, settings.ERROR_SKETCH_CAPACITY))
+    top = merged.top(limit)
+    names = dict(
+        db.query(MessageTemplate.id, MessageTemplate.template)
+        .filter(MessageTemplate.id.in_([tid for tid, _, _ in top]))
+        .all()
+    ) if top else {}
+    return [
+        {"name": names.get(tid, tid), "value": count, "error": error}
+        for tid, count, error in top
+    ]
+
+def get_top_errors_from_rows(
+    db: Session,
+    limit: int = 10,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """Exact top error templates, aggregated from the rows in the range.
+
+    Rows ingested before templating have no template id and are grouped by
+    their raw message. Ranges reaching past the hot window add archived rows.
+    """
+    group = func.coalesce(LogEntry.template_id, LogEntry.message)
+    count = func.count(LogEntry.id)
+    query = (
+        db.query(func.min(func.coalesce(MessageTemplate.template, LogEntry.message)).label('name'), count.label('value'))
+        .outerjoin(MessageTemplate, MessageTemplate.id == LogEntry.template_id)
+        .filter(LogEntry.log_level == 'ERROR')
+    )
+    if start_time:
+        query = query.filter(LogEntry.timestamp >= start_time)
+    if end_time:
+        query = query.filter(LogEntry.timestamp <= end_time)
+    query = query.group_by(group).order_by(count.desc())
+    if not archive.reaches_archive(start_time):
+        results = query.limit(limit).all()
+        return [{"name": row.name, "value": row.value, "error": 0} for row in results]
+
+    # Merging top-N lists is not exact, so both tiers are counted in full
+    counts = Counter({row.name: row.value for row in query.all()})
+    archived = archive.count_archive(
+        'template_id', fallback='message', log_level='ERROR', start_time=start_time, end_time=end_time
+    )
+    names = dict(
+        db.query(MessageTemplate.id, MessageTemplate.template)
+        .filter(MessageTemplate.id.in_(list(archived)))
+        .all()
+    ) if archived else {}
+    for key, value in archived.items():
+        counts[names.get(key, key)] += value
+    return [{"name": name, "value": value, "error": 0} for name, value in counts.most_common(limit)]
+
+def get_top_errors(
+    db: Session,
+    limit: int = 10,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> List[Dict[str, Any]]:
+    """Most frequent error templates, from the sketches when the range allows.
+
+    Sketches cover whole UTC days, so ranges with bounds inside a day are
+    answered exactly from the rows instead.
+    """
+    if choose_granularity(start_time, end_time) == 'day':
+        return get_top_errors_from_sketches(db, limit, start_time, end_time)
+    return get_top_errors_from_rows(db, limit, start_time, end_time)
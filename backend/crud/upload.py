@@ -1,11 +1,23 @@
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from sqlalchemy.sql import Select
 from typing import List, Optional
 from datetime import datetime
-from ..models.upload import Upload
+from ..models.log_entry import LogEntry
+from ..models.upload import IngestCheckpoint, Upload
+from .log_entry import delete_log_entries
+from .rollup import unroll_upload
+from .template import discount_deleted_errors
+from ..services import archive
+from ..services.result_cache import result_cache
 
 def get_upload(db: Session, upload_id: int) -> Optional[Upload]:
     return db.query(Upload).filter(Upload.id == upload_id).first()
 
+async def get_upload_async(db: AsyncSession, upload_id: int) -> Optional[Upload]:
+    return await db.scalar(select(Upload).filter(Upload.id == upload_id).limit(1))
+
 def get_uploads(
     db: Session,
     skip: int = 0,
@@ -13,27 +25,41 @@ def get_uploads(
     user_id: Optional[int] = None,
     status: Optional[str] = None
 ) -> List[Upload]:
-    query = db.query(Upload)
+    return db.scalars(_uploads_statement(skip, limit, user_id, status)).all()
+
+async def get_uploads_async(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    user_id: Optional[int] = None,
+    status: Optional[str] = None
+) -> List[Upload]:
+    return (await db.scalars(_uploads_statement(skip, limit, user_id, status))).all()
+
+def _uploads_statement(skip: int, limit: int, user_id: Optional[int], status: Optional[str]) -> Select:
+    stmt = select(Upload)
     
     if user_id is not None:
-        query = query.filter(Upload.user_id == user_id)
+        stmt = stmt.filter(Upload.user_id == user_id)
     if status:
-        query = query.filter(Upload.status == status)
+        stmt = stmt.filter(Upload.status == status)
     
-    return query.offset(skip).limit(limit).all()
+    return stmt.offset(skip).limit(limit)
 
 def create_upload(
     db: Session,
     user_id: int,
     filename: str,
     size: int,
-    status: str = "pending"
+    status: str = "pending",
+    checksum: Optional[str] = None
 ) -> Upload:
     db_upload = Upload(
         user_id=user_id,
         filename=filename,
         size=size,
-        status=status
+        status=status,
+        checksum=checksum
     )
     db.add(db_upload)
     db.commit()
@@ -65,6 +91,49 @@ def delete_upload(db: Session, upload_id: int) -> bool:
     if not db_upload:
         return False
     
+    # Take the upload's counts out of the rollups, then remove child rows in
+    # bounded batches instead of one huge delete; each batch discounts its
+    # errors from the day sketches
+    unroll_upload(db, upload_id)
+    delete_log_entries(db, LogEntry.upload_id == upload_id)
+    # Archived rows go too, or archive searches and counts would keep them
+    archive.purge_archived_upload(
+        upload_id,
+        before_change=lambda removed: discount_deleted_errors(db, zip(
+            removed.column('timestamp').to_pylist(),
+            removed.column('log_level').to_pylist(),
+            removed.column('template_id').to_pylist(),
+        )),
+    )
+    db.query(IngestCheckpoint).filter(IngestCheckpoint.upload_id == upload_id).delete(synchronize_session=False)
     db.delete(db_upload)
     db.commit()
+    # The upload's time span is unknown here, so drop every cached result
+    result_cache.clear()
     return True
+
+def get_checkpoint(db: Session, upload_id: int, range_start: int = 0) -> Optional[IngestCheckpoint]:
+    return (
+        db.query(IngestCheckpoint)
+        .filter(IngestCheckpoint.upload_id == upload_id, IngestCheckpoint.range_start == range_start)
+        .first()
+    )
+
+def save_checkpoint(
+    db: Session,
+    upload_id: int,
+    range_start: int,
+    offset: int,
+    rows_committed: int
+) -> IngestCheckpoint:
+    """Record ingestion progress without committing.
+
+    The caller commits together with the batch the checkpoint describes.
+    """
+    db_checkpoint = get_checkpoint(db, upload_id, range_start)
+    if not db_checkpoint:
+        db_checkpoint = IngestCheckpoint(upload_id=upload_id, range_start=range_start)
+    db_checkpoint.offset = offset
+    db_checkpoint.rows_committed = rows_committed
+    db.add(db_checkpoint)
+    return db_checkpoint
@@ -2,7 +2,7 @@ from sqlalchemy.orm import Session
 from typing import Optional
 from ..models.user import User
 from ..schemas.user import UserCreate, UserUpdate
-from ..services.auth import get_password_hash
+from ..services.auth import get_password_hash, principal_cache
 
 def get_user(db: Session, user_id: int) -> Optional[User]:
     return db.query(User).filter(User.id == user_id).first()
@@ -41,6 +41,8 @@ def update_user(db: Session, user_id: int, user_update: UserUpdate) -> Optional[
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    # Tokens cached for this user would keep authenticating the old record
+    principal_cache.invalidate_user(user_id)
     return db_user
 
 def delete_user(db: Session, user_id: int) -> bool:
@@ -50,4 +52,5 @@ def delete_user(db: Session, user_id: int) -> bool:
     
     db.delete(db_user)
     db.commit()
+    principal_cache.invalidate_user(user_id)
     return True
@@ -1,14 +1,21 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 import os
 
-from backend.config import settings
-from backend.services.database import engine, Base
+from backend.config.settings import settings
+from backend.services.auth import principal_cache
+from backend.services.database import dispose_engines, engine, get_pool_stats
+from backend.services.metrics import RequestMetricsMiddleware, render_metrics, stats_collector
+from backend.services.password_hasher import password_hasher
+from backend.services.profiling import ProfilingMiddleware
+from backend.services.result_cache import result_cache
+from backend.services.storage import RequestSizeLimitMiddleware
+from backend.services.partitions import create_tables
 from backend.api.v1.api import api_router
 
-# Create database tables
-Base.metadata.create_all(bind=engine)
+# Create database tables (log_entries is partitioned by time on PostgreSQL)
+create_tables(engine)
 
 # Create FastAPI app
 app = FastAPI(
@@ -26,6 +33,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Oversized uploads are refused before Starlette spools them to disk
+app.add_middleware(RequestSizeLimitMiddleware)
+
+# On-demand profiles of selected requests
+app.add_middleware(ProfilingMiddleware)
+
+# Per-route latency, outermost so it covers every other middleware
+if settings.METRICS_ENABLED:
+    app.add_middleware(RequestMetricsMiddleware)
+
+# Counters services already keep, exported on /metrics
+stats_collector.register("db_pool", get_pool_stats, label="workload")
+stats_collector.register("password_hasher", password_hasher.get_stats)
+stats_collector.register("result_cache", result_cache.get_stats)
+stats_collector.register("auth_cache", principal_cache.get_stats)
+
 # Include API routes
 app.include_router(api_router, prefix="/api/v1")
 
@@ -35,6 +58,16 @@ os.makedirs("uploads", exist_ok=True)
 # Mount static files
 app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
 
+@app.on_event("shutdown")
+async def close_connection_pools():
+    await dispose_engines()
+
+@app.get("/metrics", include_in_schema=False)
+def metrics():
+    """Prometheus scrape endpoint"""
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
 @app.get("/")
 async def root():
     return {"message": "Welcome to the Log Analyzer API"}
@@ -1,7 +1,10 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Index
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, JSON, Index, DDL, event, literal_column
 from sqlalchemy.sql import func
 from .base import Base
 
+# Text search configuration for the message full-text index
+FTS_CONFIG = 'english'
+
 class LogEntry(Base):
     __tablename__ = "log_entries"
 
@@ -11,6 +14,7 @@ class LogEntry(Base):
     log_level = Column(String, index=True, nullable=False)
     source = Column(String, index=True, nullable=False)
     message = Column(String, nullable=False)
+    template_id = Column(String(16), nullable=True)  # MessageTemplate id
     additional_fields = Column(JSON, nullable=True)
 
     # Add indexes for better query performance
@@ -18,4 +22,23 @@ class LogEntry(Base):
         Index('idx_log_level', 'log_level'),
         Index('idx_source', 'source'),
         Index('idx_timestamp', 'timestamp'),
+        # Keyset pagination orders and seeks on (timestamp, id)
+        Index('idx_timestamp_id', 'timestamp', 'id'),
+        Index('idx_upload_id', 'upload_id'),
+        Index('idx_template_id', 'template_id'),
     )
+
+# Expression the full-text GIN index is built on; queries must use this exact
+# expression (with the config as a literal) for the planner to pick the index
+message_tsvector = func.to_tsvector(literal_column(f"'{FTS_CONFIG}'"), LogEntry.message)
+
+# Text search indexes are PostgreSQL-only, so they are created with DDL that
+# other databases skip instead of being declared in __table_args__
+POSTGRES_TEXT_INDEXES = (
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    # Trigram index serves substring LIKE/ILIKE queries
+    "CREATE INDEX IF NOT EXISTS idx_message_trgm ON log_entries USING gin (message gin_trgm_ops)",
+    f"CREATE INDEX IF NOT EXISTS idx_message_fts ON log_entries USING gin (to_tsvector('{FTS_CONFIG}', message))",
+)
+for statement in POSTGRES_TEXT_INDEXES:
+    event.listen(LogEntry.__table__, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
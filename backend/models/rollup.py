@@ -0,0 +1,33 @@
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, ForeignKey, Index, UniqueConstraint
+from .base import Base
+
+class LogRollup(Base):
+    __tablename__ = "log_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    granularity = Column(String, nullable=False)  # "minute", "hour" or "day"
+    bucket = Column(DateTime(timezone=True), nullable=False)  # bucket start, UTC
+    log_level = Column(String, nullable=False)
+    source = Column(String, nullable=False)
+    count = Column(BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('granularity', 'bucket', 'log_level', 'source', name='uq_log_rollup'),
+        Index('idx_rollup_granularity_bucket', 'granularity', 'bucket'),
+    )
+
+# An upload's share of the minute rollups, as added by rollup_upload, so
+# exactly that can be taken out again however many of its rows remain
+class UploadRollup(Base):
+    __tablename__ = "upload_rollups"
+
+    id = Column(Integer, primary_key=True, index=True)
+    upload_id = Column(Integer, ForeignKey("uploads.id", ondelete="CASCADE"), nullable=False)
+    bucket = Column(DateTime(timezone=True), nullable=False)  # minute start, UTC
+    log_level = Column(String, nullable=False)
+    source = Column(String, nullable=False)
+    count = Column(BigInteger, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint('upload_id', 'bucket', 'log_level', 'source', name='uq_upload_rollup'),
+    )
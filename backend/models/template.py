@@ -0,0 +1,25 @@
+from sqlalchemy import Column, Integer, String, DateTime, JSON, UniqueConstraint
+from sqlalchemy.sql import func
+from .base import Base
+
+class MessageTemplate(Base):
+    __tablename__ = "message_templates"
+
+    id = Column(String(16), primary_key=True)  # hash of the template text
+    template = Column(String, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class ErrorSketch(Base):
+    __tablename__ = "error_sketches"
+
+    id = Column(Integer, primary_key=True, index=True)
+    bucket = Column(DateTime(timezone=True), nullable=False)  # UTC day start
+    # Partial sketch of the day; readers merge every shard, writers running
+    # in parallel count into different ones
+    shard = Column(Integer, nullable=False, default=0)
+    sketch = Column(JSON, nullable=False)  # SpaceSaving.to_dict() over template ids
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('bucket', 'shard', name='uq_error_sketch_bucket_shard'),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey
+from sqlalchemy import BigInteger, Column, Integer, String, DateTime, ForeignKey, UniqueConstraint
 from sqlalchemy.sql import func
 from .base import Base
 
@@ -8,7 +8,25 @@ class Upload(Base):
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     filename = Column(String, nullable=False)
-    size = Column(Integer, nullable=False)
+    size = Column(BigInteger, nullable=False)
+    checksum = Column(String(64), nullable=True)  # SHA-256 of the stored file
     status = Column(String, default="processing")
     upload_timestamp = Column(DateTime(timezone=True), server_default=func.now())
     completed_at = Column(DateTime(timezone=True), nullable=True)
+    rolled_up_at = Column(DateTime(timezone=True), nullable=True)  # when counts reached log_rollups
+
+# Progress through one byte range of an upload. Written in the same
+# transaction as each inserted batch so a retry resumes exactly there.
+class IngestCheckpoint(Base):
+    __tablename__ = "ingest_checkpoints"
+
+    id = Column(Integer, primary_key=True, index=True)
+    upload_id = Column(Integer, ForeignKey("uploads.id", ondelete="CASCADE"), nullable=False)
+    range_start = Column(BigInteger, nullable=False, default=0)
+    offset = Column(BigInteger, nullable=False)
+    rows_committed = Column(BigInteger, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        UniqueConstraint('upload_id', 'range_start', name='uq_ingest_checkpoint_range'),
+    )
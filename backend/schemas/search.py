@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+from typing import List, Literal, Optional
+
+from .log_entry import LogEntryResponse
+
+class LogSearchResponse(BaseModel):
+    logs: List[LogEntryResponse]
+    per_page: int
+    # Offset pagination
+    total: Optional[int] = None
+    # How `total` was counted (see the `count` parameter): "eq" exact,
+    # "approx" a planner estimate, "gte" a lower bound at the count cap
+    total_relation: Optional[Literal["eq", "approx", "gte"]] = None
+    page: Optional[int] = None
+    total_pages: Optional[int] = None
+    # Cursor pagination: opaque cursors of the adjacent pages, None at either end
+    next_cursor: Optional[str] = None
+    prev_cursor: Optional[str] = None
+
+class TimeSeriesResponse(BaseModel):
+    x: str  # bucket start, ISO 8601
+    y: int
+
+class DistributionResponse(BaseModel):
+    name: str
+    value: int
+
+class ErrorResponse(BaseModel):
+    name: str
+    value: int
+    error: int = 0  # most the count may overstate the true one by
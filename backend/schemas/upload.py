@@ -0,0 +1,26 @@
+from pydantic import BaseModel
+from datetime import datetime
+from typing import List, Optional
+
+from .log_entry import LogEntryResponse
+
+class UploadBase(BaseModel):
+    filename: str
+
+class UploadInDB(UploadBase):
+    id: int
+    user_id: int
+    size: int
+    checksum: Optional[str] = None
+    status: str
+    upload_timestamp: Optional[datetime] = None
+    completed_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+
+class UploadResponse(UploadInDB):
+    pass
+
+class UploadWithLogs(UploadResponse):
+    logs: List[LogEntryResponse] = []
@@ -0,0 +1,516 @@
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import Counter, OrderedDict
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from sqlalchemy import and_, delete, func, select, text
+from sqlalchemy.orm import Session
+
+from ..config.settings import settings
+from ..models.log_entry import LogEntry
+from .partitions import (
+    PARTITION_PREFIX, forget_partition, partition_name, partition_start, partition_step, partitioning_enabled,
+)
+from .result_cache import result_cache
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_COLUMNS = ('id', 'upload_id', 'timestamp', 'log_level', 'source', 'message', 'template_id', 'additional_fields')
+
+def _arrow():
+    # pyarrow is only needed once the archive tier is enabled
+    import pyarrow
+    import pyarrow.compute
+    import pyarrow.parquet
+    return pyarrow, pyarrow.compute, pyarrow.parquet
+
+def archive_schema(pa):
+    return pa.schema([
+        ('id', pa.int64()),
+        ('upload_id', pa.int32()),
+        ('timestamp', pa.timestamp('us', tz='UTC')),
+        ('log_level', pa.string()),
+        ('source', pa.string()),
+        ('message', pa.string()),
+        ('template_id', pa.string()),
+        ('additional_fields', pa.string()),  # JSON text
+    ])
+
+def _utc(value: datetime) -> datetime:
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def _period_start(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+def archive_files(
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> List[Tuple[date, str]]:
+    """(period start, path) of archive files overlapping `[start_time, end_time]`, oldest first"""
+    if not os.path.isdir(settings.ARCHIVE_DIR):
+        return []
+    step = partition_step()
+    files = []
+    for name in sorted(os.listdir(settings.ARCHIVE_DIR)):
+        if not name.startswith(PARTITION_PREFIX) or not name.endswith('.parquet'):
+            continue
+        try:
+            start = datetime.strptime(name[len(PARTITION_PREFIX):][:8], '%Y%m%d').date()
+        except ValueError:
+            continue
+        period_start = _period_start(start)
+        if start_time and period_start + step <= _utc(start_time):
+            continue
+        if end_time and period_start > _utc(end_time):
+            continue
+        files.append((start, os.path.join(settings.ARCHIVE_DIR, name)))
+    return files
+
+def archive_watermark() -> Optional[datetime]:
+    """End of the newest archived period; older rows live in the archive tier"""
+    files = archive_files()
+    if not files:
+        return None
+    return _period_start(files[-1][0]) + partition_step()
+
+def reaches_archive(start_time: Optional[datetime]) -> bool:
+    """Whether a query from `start_time` on has to read the archive tier too.
+
+    Open-ended queries stay on the hot tier; only an explicit range reaching
+    back past the watermark scans archive files.
+    """
+    if not settings.ARCHIVE_ENABLED or start_time is None:
+        return False
+    watermark = archive_watermark()
+    return watermark is not None and _utc(start_time) < watermark
+
+def _rows_to_table(pa, rows: Sequence[Any]):
+    data = {column: [getattr(row, column) for row in rows] for column in ARCHIVE_COLUMNS}
+    data['timestamp'] = [_utc(value) for value in data['timestamp']]
+    data['additional_fields'] = [
+        None if value is None else json.dumps(value, separators=(',', ':'))
+        for value in data['additional_fields']
+    ]
+    return pa.Table.from_pydict(data, schema=archive_schema(pa))
+
+def _begin_export(db: Session, start: date) -> Optional[str]:
+    """Start the transaction a period is exported and removed in.
+
+    On PostgreSQL it runs at REPEATABLE READ, so the export and the deletes
+    after it see the same rows, and the period's partition is locked against
+    writes before that snapshot is taken, so dropping it loses nothing the
+    export missed. SQLite transactions are serializable as they are.
+    Returns the locked partition's name, if any.
+    """
+    engine = db.get_bind()
+    if engine.dialect.name != 'postgresql':
+        return None
+    name = partition_name(start)
+    with engine.connect() as conn:
+        exists = partitioning_enabled(engine) and conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar()
+    db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+    if not exists:
+        return None
+    # Waits for in-flight inserts to commit; reads may go on
+    db.execute(text(f"LOCK TABLE {name} IN SHARE MODE"))
+    return name
+
+def _remove_archived_rows(db: Session, start: date, in_period, partition: Optional[str]) -> bool:
+    """Remove the exported rows: the locked partition whole, the rest by the export's snapshot.
+
+    Returns whether the partition was dropped. Does not commit.
+    """
+    if partition is not None:
+        db.execute(text(f"DROP TABLE {partition}"))
+        forget_partition(start)
+    # Rows in the default partition, or all of them without partitioning.
+    # Rows committed after the export began are not in its snapshot, so the
+    # delete leaves them for the next run.
+    db.execute(delete(LogEntry).where(in_period))
+    return partition is not None
+
+def archive_period(db: Session, start: date) -> Dict[str, Any]:
+    """Move the log entries of one partition-sized period to a Parquet file.
+
+    Rows are written sorted by timestamp in row groups of
+    `ARCHIVE_ROW_GROUP_ROWS`, so each row group's min/max timestamp
+    statistics cover a narrow slice of time and readers can skip it. The file
+    is renamed into place inside the transaction that removes the rows, which
+    removes exactly the rows exported.
+    """
+    pa, _, pq = _arrow()
+    lo = _period_start(start)
+    in_period = and_(LogEntry.timestamp >= lo, LogEntry.timestamp < lo + partition_step())
+    os.makedirs(settings.ARCHIVE_DIR, exist_ok=True)
+    path = os.path.join(settings.ARCHIVE_DIR, f"{partition_name(start)}_{uuid.uuid4().hex[:8]}.parquet")
+    tmp_path = path + '.tmp'
+    stmt = (
+        select(*[getattr(LogEntry, column) for column in ARCHIVE_COLUMNS])
+        .where(in_period)
+        .order_by(LogEntry.timestamp, LogEntry.id)
+        .execution_options(yield_per=settings.ARCHIVE_ROW_GROUP_ROWS)
+    )
+    report = {"period": start.isoformat(), "rows": 0, "file": None, "partition_dropped": False}
+    try:
+        partition = _begin_export(db, start)
+        with pq.ParquetWriter(tmp_path, archive_schema(pa), compression=settings.ARCHIVE_COMPRESSION) as writer:
+            for rows in db.execute(stmt).partitions():
+                writer.write_table(_rows_to_table(pa, rows), row_group_size=settings.ARCHIVE_ROW_GROUP_ROWS)
+                report["rows"] += len(rows)
+        if not report["rows"]:
+            os.remove(tmp_path)
+            db.rollback()
+            return report
+        report["partition_dropped"] = _remove_archived_rows(db, start, in_period, partition)
+        os.replace(tmp_path, path)
+        db.commit()
+    except Exception:
+        db.rollback()
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    report["file"] = path
+    return report
+
+def archive_cold_data(db: Session, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Archive every period that ended more than `ARCHIVE_AFTER_DAYS` ago"""
+    started = time.perf_counter()
+    now = now or datetime.now(timezone.utc)
+    cutoff = now - timedelta(days=settings.ARCHIVE_AFTER_DAYS)
+    report: Dict[str, Any] = {"rows_archived": 0, "periods": []}
+
+    oldest = db.query(func.min(LogEntry.timestamp)).scalar()
+    # Each period is archived in a transaction of its own
+    db.rollback()
+    if oldest is not None:
+        step = partition_step()
+        current = partition_start(_utc(oldest).date())
+        while _period_start(current) + step <= cutoff:
+            result = archive_period(db, current)
+            if result["rows"]:
+                report["periods"].append(result)
+                report["rows_archived"] += result["rows"]
+            current += step
+
+    if report["rows_archived"]:
+        result_cache.invalidate_range(None, cutoff)
+    report["duration_seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(
+        "Archived %d rows from %d periods in %.3fs",
+        report["rows_archived"], len(report["periods"]), report["duration_seconds"],
+    )
+    return report
+
+def _minute_counts(pa, pc, table) -> Counter:
+    """Per (upload_id, minute, level, source) row counts of an archive table"""
+    columns = ['upload_id', 'timestamp', 'log_level', 'source']
+    table = table.select(columns)
+    table = table.set_column(1, 'timestamp', pc.floor_temporal(table.column('timestamp'), unit='minute'))
+    counts: Counter = Counter()
+    for row in table.group_by(columns).aggregate([('upload_id', 'count')]).to_pylist():
+        counts[(row['upload_id'], row['timestamp'], row['log_level'], row['source'])] += row['upload_id_count']
+    return counts
+
+def _expired_mask(pa, pc, table, default_before, source_before, level_before):
+    """Rows past their TTL: a source rule wins over a level rule, which wins over the default"""
+    cutoffs: Dict[Tuple[str, str], Optional[datetime]] = {}
+    row_cutoffs = []
+    for source, level in zip(table.column('source').to_pylist(), table.column('log_level').to_pylist()):
+        key = (source, level)
+        if key not in cutoffs:
+            cutoffs[key] = source_before.get(source) or level_before.get(level) or default_before
+        row_cutoffs.append(cutoffs[key])
+    cutoff = pa.array(row_cutoffs, pa.timestamp('us', tz='UTC'))
+    return pc.fill_null(pc.less(table.column('timestamp'), cutoff), False)
+
+def _write_filtered(pa, pc, pq, path: str, tmp_path: str, drop, on_dropped) -> Tuple[int, int]:
+    """Copy an archive file to `tmp_path` without the rows masked by `drop(table)`, one row group at a time.
+
+    `on_dropped` gets each batch of dropped rows. Returns the (dropped, kept) row counts.
+    """
+    dropped = kept = 0
+    with pq.ParquetWriter(tmp_path, archive_schema(pa), compression=settings.ARCHIVE_COMPRESSION) as writer:
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=settings.ARCHIVE_ROW_GROUP_ROWS):
+            table = pa.Table.from_batches([batch])
+            mask = drop(table)
+            removed = table.filter(mask)
+            if removed.num_rows:
+                on_dropped(removed)
+                dropped += removed.num_rows
+            table = table.filter(pc.invert(mask))
+            if table.num_rows:
+                writer.write_table(table, row_group_size=settings.ARCHIVE_ROW_GROUP_ROWS)
+                kept += table.num_rows
+    return dropped, kept
+
+def _replace_filtered(path: str, tmp_path: str, kept: int) -> bool:
+    """Move a filtered copy over its file, or delete both when it kept nothing. Returns whether the file survives."""
+    if kept:
+        os.replace(tmp_path, path)
+        return True
+    os.remove(tmp_path)
+    os.remove(path)
+    return False
+
+def expire_archive(
+    default_before: Optional[datetime],
+    source_before: Dict[str, datetime],
+    level_before: Dict[str, datetime],
+    before_change: Optional[Callable[[Counter], None]] = None,
+) -> Dict[str, Any]:
+    """Apply the retention rules to the archive tier.
+
+    The cutoffs mirror `retention_rules`: rows of a source with a rule
+    expire at its cutoff, then rows of a level with a rule, then everything
+    else at `default_before`, or never when that is None. Files whose
+    period ends before every cutoff are deleted whole; files partly expired
+    are rewritten without the expired rows, one row group at a time.
+    `before_change` gets the expired rows' per (upload_id, minute, level,
+    source) counts before each file is replaced or deleted.
+    """
+    report: Dict[str, Any] = {"files_removed": [], "files_rewritten": [], "rows": 0}
+    cutoffs = [*source_before.values(), *level_before.values()]
+    if default_before is not None:
+        cutoffs.append(default_before)
+    files = archive_files(end_time=max(cutoffs)) if cutoffs else []
+    if not files:
+        return report
+    pa, pc, pq = _arrow()
+    step = partition_step()
+    for start, path in files:
+        lo = _period_start(start)
+        if default_before is not None and lo + step <= min(cutoffs):
+            # Older than every cutoff: nothing in the file survives
+            counts = _minute_counts(pa, pc, pq.read_table(path, columns=['upload_id', 'timestamp', 'log_level', 'source']))
+            if before_change is not None:
+                before_change(counts)
+            os.remove(path)
+            report["files_removed"].append(path)
+            report["rows"] += sum(counts.values())
+            continue
+
+        tmp_path = path + '.tmp'
+        counts = Counter()
+        try:
+            dropped, kept = _write_filtered(
+                pa, pc, pq, path, tmp_path,
+                lambda table: _expired_mask(pa, pc, table, default_before, source_before, level_before),
+                lambda table: counts.update(_minute_counts(pa, pc, table)),
+            )
+            if not dropped:
+                continue
+            if before_change is not None:
+                before_change(counts)
+            report["files_rewritten" if _replace_filtered(path, tmp_path, kept) else "files_removed"].append(path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        report["rows"] += sum(counts.values())
+    return report
+
+def purge_archived_upload(upload_id: int, before_change: Optional[Callable[[Any], None]] = None) -> Dict[str, Any]:
+    """Remove one upload's rows from the archive tier.
+
+    Files whose row group upload_id statistics rule the upload out are not
+    read; the others are rewritten without its rows. `before_change` gets
+    the removed rows as an Arrow table before each file is replaced or
+    deleted.
+    """
+    report: Dict[str, Any] = {"files_removed": [], "files_rewritten": [], "rows": 0}
+    files = archive_files()
+    if not files:
+        return report
+    pa, pc, pq = _arrow()
+    for _, path in files:
+        metadata = pq.ParquetFile(path).metadata
+        index = metadata.schema.to_arrow_schema().get_field_index('upload_id')
+        candidate = False
+        for group in range(metadata.num_row_groups):
+            stats = metadata.row_group(group).column(index).statistics
+            if stats is None or not stats.has_min_max or stats.min <= upload_id <= stats.max:
+                candidate = True
+                break
+        if not candidate:
+            continue
+
+        tmp_path = path + '.tmp'
+        removed: List[Any] = []
+        try:
+            dropped, kept = _write_filtered(
+                pa, pc, pq, path, tmp_path,
+                lambda table: pc.fill_null(pc.equal(table.column('upload_id'), upload_id), False),
+                removed.append,
+            )
+            if not dropped:
+                continue
+            if before_change is not None:
+                before_change(pa.concat_tables(removed))
+            report["files_rewritten" if _replace_filtered(path, tmp_path, kept) else "files_removed"].append(path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        report["rows"] += dropped
+    return report
+
+def _filter_mask(pa, pc, table, start_time, end_time, end_inclusive, query, mode, log_level, source, upload_id):
+    conditions = []
+    if start_time:
+        conditions.append(pc.greater_equal(table['timestamp'], pa.scalar(start_time, table['timestamp'].type)))
+    if end_time:
+        compare = pc.less_equal if end_inclusive else pc.less
+        conditions.append(compare(table['timestamp'], pa.scalar(end_time, table['timestamp'].type)))
+    if log_level:
+        conditions.append(pc.equal(table['log_level'], log_level.upper()))
+    if source:
+        conditions.append(pc.equal(table['source'], source))
+    if upload_id is not None:
+        conditions.append(pc.equal(table['upload_id'], upload_id))
+    if query:
+        # Without stemming, full-text mode requires every term as a substring
+        terms = query.split() if mode == 'fulltext' else [query]
+        conditions.extend(pc.match_substring(table['message'], term, ignore_case=True) for term in terms)
+    if not conditions:
+        return None
+    mask = conditions[0]
+    for condition in conditions[1:]:
+        mask = pc.and_kleene(mask, condition)
+    return mask
+
+def _archive_scanner(
+    columns: Sequence[str],
+    query: Optional[str],
+    mode: str,
+    log_level: Optional[str],
+    source: Optional[str],
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    upload_id: Optional[int],
+    end_inclusive: bool,
+) -> Tuple[List[str], Callable[[str], Iterator[Any]]]:
+    """The archive files a search has to read, and a function scanning one of them.
+
+    Row groups whose timestamp statistics fall outside the range are
+    skipped without being read; the rest are filtered with Arrow compute
+    kernels over whole columns, yielding one filtered table per row group.
+    """
+    pa, pc, pq = _arrow()
+    start = _utc(start_time) if start_time else None
+    end = _utc(end_time) if end_time else None
+    filter_columns = {'timestamp', 'log_level', 'source', 'upload_id', 'message'}
+    read_columns = [column for column in ARCHIVE_COLUMNS if column in filter_columns or column in columns]
+
+    def scan(path: str) -> Iterator[Any]:
+        parquet_file = pq.ParquetFile(path)
+        ts_index = parquet_file.schema_arrow.get_field_index('timestamp')
+        for group in range(parquet_file.num_row_groups):
+            stats = parquet_file.metadata.row_group(group).column(ts_index).statistics
+            if stats is not None and stats.has_min_max and (
+                (start and _utc(stats.max) < start) or (end and _utc(stats.min) > end)
+            ):
+                continue
+            table = parquet_file.read_row_group(group, columns=read_columns)
+            mask = _filter_mask(pa, pc, table, start, end, end_inclusive, query, mode, log_level, source, upload_id)
+            if mask is not None:
+                table = table.filter(mask)
+            if table.num_rows:
+                yield table.select(list(columns))
+
+    return [path for _, path in archive_files(start, end)], scan
+
+def scan_archive(
+    columns: Sequence[str] = ARCHIVE_COLUMNS,
+    query: Optional[str] = None,
+    mode: str = 'substring',
+    log_level: Optional[str] = None,
+    source: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    upload_id: Optional[int] = None,
+    end_inclusive: bool = True,
+) -> Iterator[Any]:
+    """Archived rows matching the search filters, one filtered Arrow table per row group"""
+    files, scan = _archive_scanner(
+        columns, query, mode, log_level, source, start_time, end_time, upload_id, end_inclusive,
+    )
+    for path in files:
+        yield from scan(path)
+
+# Matching row counts per (file, version, filters); a rewritten file has a
+# new version, so its stale counts are never read again and age out
+_file_counts: "OrderedDict[Tuple[Any, ...], int]" = OrderedDict()
+_file_counts_lock = threading.Lock()
+
+def _cached_file_count(key: Tuple[Any, ...]) -> Optional[int]:
+    with _file_counts_lock:
+        count = _file_counts.get(key)
+        if count is not None:
+            _file_counts.move_to_end(key)
+        return count
+
+def _cache_file_count(key: Tuple[Any, ...], count: int) -> None:
+    with _file_counts_lock:
+        _file_counts[key] = count
+        _file_counts.move_to_end(key)
+        while len(_file_counts) > settings.ARCHIVE_COUNT_CACHE_SIZE:
+            _file_counts.popitem(last=False)
+
+def search_archive(
+    query: Optional[str] = None,
+    skip: int = 0,
+    limit: int = 100,
+    mode: str = 'substring',
+    log_level: Optional[str] = None,
+    source: Optional[str] = None,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    upload_id: Optional[int] = None,
+    end_inclusive: bool = True,
+) -> Tuple[List[Dict[str, Any]], int]:
+    """One page of matching archived rows, oldest first, and the total match count.
+
+    Each file's match count is cached per filter set, so files before or
+    after the page are only read the first time a search touches them.
+    """
+    files, scan = _archive_scanner(
+        ARCHIVE_COLUMNS, query, mode, log_level, source, start_time, end_time, upload_id, end_inclusive,
+    )
+    filters = (query, mode if query else None, log_level, source, start_time, end_time, upload_id, end_inclusive)
+    rows: List[Dict[str, Any]] = []
+    total = 0
+    for path in files:
+        stat = os.stat(path)
+        key = (path, stat.st_mtime_ns, stat.st_size, filters)
+        count = _cached_file_count(key)
+        if count is not None and (len(rows) >= limit or total + count <= skip):
+            total += count
+            continue
+        count = 0
+        for table in scan(path):
+            if len(rows) < limit and total + table.num_rows > skip:
+                offset = max(skip - total, 0)
+                rows.extend(table.slice(offset, limit - len(rows)).to_pylist())
+            total += table.num_rows
+            count += table.num_rows
+        _cache_file_count(key, count)
+    for row in rows:
+        if row['additional_fields'] is not None:
+            row['additional_fields'] = json.loads(row['additional_fields'])
+    return rows, total
+
+def count_archive(field: str, fallback: Optional[str] = None, **filters: Any) -> Counter:
+    """Archived row counts per value of `field`, using `fallback` where it is null"""
+    _, pc, _ = _arrow()
+    counts: Counter = Counter()
+    columns = [field] + ([fallback] if fallback else [])
+    for table in scan_archive(columns=columns, **filters):
+        keys = pc.coalesce(table[field], table[fallback]) if fallback else table[field]
+        for item in pc.value_counts(keys).to_pylist():
+            counts[item['values']] += item['counts']
+    return counts
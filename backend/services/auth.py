@@ -1,24 +1,48 @@
+import hashlib
+import threading
+import time
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Any, Dict, Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from backend.config import settings
+from backend.config.settings import settings
 from backend.models.user import User
-from backend.schemas.user import User as UserSchema
-from backend.services.database import get_db
+from backend.services.cache import TTLCache
+from backend.services.database import get_async_db
+from backend.services.password_hasher import password_hasher
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
+# Hashing runs in the password hasher's process pool; these block only the
+# calling thread, and raise HasherBusy when its queue is full
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return password_hasher.verify_and_update(plain_password, hashed_password)[0]
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return password_hasher.hash(password)
+
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Optional[User]:
+    """The user `username` if `password` is theirs, else None.
+
+    A hash made with outdated parameters (e.g. fewer bcrypt rounds than
+    `BCRYPT_ROUNDS`) is replaced by a fresh one on a successful login.
+    """
+    user = await db.scalar(select(User).filter(User.username == username).limit(1))
+    if user is None:
+        return None
+    valid, new_hash = await password_hasher.verify_and_update_async(password, user.password_hash)
+    if not valid:
+        return None
+    if new_hash:
+        user.password_hash = new_hash
+        await db.commit()
+    return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     to_encode = data.copy()
@@ -30,7 +54,91 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> User:
+@dataclass(frozen=True)
+class Principal:
+    """Snapshot of the authenticated user, safe to share between requests"""
+    id: int
+    username: str
+    email: str
+    role: str
+    is_active: bool
+    created_at: Optional[datetime] = None
+    updated_at: Optional[datetime] = None
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            role=user.role,
+            is_active=user.is_active,
+            created_at=user.created_at,
+            updated_at=user.updated_at,
+        )
+
+class PrincipalCache:
+    """Verified tokens mapped to the principal they authenticate.
+
+    Keyed by a hash of the token, so raw tokens are not kept in memory, and
+    no entry outlives its token's `exp`. Invalidating a user bumps their
+    generation, which turns every cached token of theirs into a miss. The
+    cache is per process, so changes made in another process show up here
+    after at most `AUTH_CACHE_TTL` seconds.
+    """
+    def __init__(self, maxsize: int, ttl: float):
+        self.ttl = ttl
+        self.tokens = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._generations: Dict[int, int] = {}
+        # Bumped by every invalidation, so a lookup that raced one is not cached
+        self.epoch = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token: str) -> str:
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token: str) -> Optional[Principal]:
+        entry = self.tokens.get(self.key(token))
+        if entry is None:
+            return None
+        principal, generation = entry
+        if self._generations.get(principal.id, 0) != generation:
+            return None
+        return principal
+
+    def set(self, token: str, principal: Principal, expires_at: Optional[float] = None,
+            epoch: Optional[int] = None) -> None:
+        """Cache `principal` for `token`, unless a user was invalidated since `epoch`"""
+        if epoch is not None and epoch != self.epoch:
+            return
+        ttl = self.ttl
+        if expires_at is not None:
+            ttl = min(ttl, expires_at - time.time())
+            if ttl <= 0:
+                return
+        self.tokens.set(self.key(token), (principal, self._generations.get(principal.id, 0)), ttl)
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self.epoch += 1
+
+    def clear(self) -> None:
+        self.tokens.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {"entries": len(self.tokens), "hits": self.tokens.hits, "misses": self.tokens.misses}
+
+principal_cache = PrincipalCache(maxsize=settings.AUTH_CACHE_SIZE, ttl=settings.AUTH_CACHE_TTL)
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_async_db)) -> Principal:
+    # Tokens seen recently skip both signature verification and the user query
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+
+    epoch = principal_cache.epoch
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -44,12 +152,21 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
         
-    user = db.query(User).filter(User.username == username).first()
+    # A token's first request looks its user up; it must not block the event
+    # loop on a sync query
+    user = await db.scalar(select(User).filter(User.username == username).limit(1))
     if user is None:
         raise credentials_exception
-    return user
+    principal = Principal.from_user(user)
+    principal_cache.set(token, principal, payload.get("exp"), epoch)
+    return principal
 
-async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+async def get_current_active_user(current_user: Principal = Depends(get_current_user)) -> Principal:
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
     return current_user
+
+async def get_current_admin_user(current_user: Principal = Depends(get_current_active_user)) -> Principal:
+    if current_user.role != "admin":
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
+    return current_user
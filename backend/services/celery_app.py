@@ -1,5 +1,7 @@
 from celery import Celery
-from ..config import settings
+from celery.signals import worker_process_shutdown, worker_ready
+from ..config.settings import settings
+from .metrics import mark_process_dead, start_metrics_server
 
 # Initialize Celery
 celery = Celery(
@@ -21,5 +23,36 @@ celery.conf.update(
     task_soft_time_limit=25 * 60,  # 25 minutes
 )
 
+# Periodic tasks run by `celery beat`
+celery.conf.beat_schedule = {
+    'maintain-log-partitions': {
+        'task': 'backend.tasks.maintain_log_partitions',
+        'schedule': 60 * 60,  # hourly
+    },
+    'enforce-retention': {
+        'task': 'backend.tasks.enforce_retention',
+        'schedule': 60 * 60,  # hourly
+    },
+    'backfill-upload-rollups': {
+        'task': 'backend.tasks.backfill_upload_rollups',
+        'schedule': 10 * 60,  # every 10 minutes
+    },
+    'archive-cold-logs': {
+        'task': 'backend.tasks.archive_cold_logs',
+        'schedule': 60 * 60,  # hourly
+    },
+}
+
+@worker_ready.connect
+def serve_worker_metrics(**kwargs):
+    # Pool processes record ingestion metrics; with PROMETHEUS_MULTIPROC_DIR
+    # set, the worker's main process serves them all
+    if settings.METRICS_WORKER_PORT:
+        start_metrics_server(settings.METRICS_WORKER_PORT)
+
+@worker_process_shutdown.connect
+def release_worker_metrics(pid=None, **kwargs):
+    mark_process_dead(pid)
+
 def init_celery():
     return celery
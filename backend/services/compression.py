@@ -0,0 +1,62 @@
+import bz2
+import gzip
+import io
+from typing import BinaryIO, Optional
+
+# Extensions accepted for compressed uploads; the codec itself is detected
+# from the file's magic bytes
+COMPRESSED_EXTENSIONS = ('.gz', '.bz2', '.zst')
+
+MAGIC_NUMBERS = (
+    (b'\x1f\x8b', 'gzip'),
+    (b'BZh', 'bz2'),
+    (b'\x28\xb5\x2f\xfd', 'zstd'),
+)
+
+def detect_compression(file_path: str) -> Optional[str]:
+    """Return the codec a file is compressed with, or None for plain files"""
+    with open(file_path, 'rb') as f:
+        head = f.read(4)
+    for magic, codec in MAGIC_NUMBERS:
+        if head.startswith(magic):
+            return codec
+    return None
+
+def open_log_file(file_path: str) -> BinaryIO:
+    """Open a log file for binary reading, decompressing it as a stream.
+
+    Compressed files are never inflated in full; offsets into the returned
+    object refer to the decompressed bytes.
+    """
+    codec = detect_compression(file_path)
+    if codec == 'gzip':
+        return gzip.open(file_path, 'rb')
+    if codec == 'bz2':
+        return bz2.open(file_path, 'rb')
+    if codec == 'zstd':
+        try:
+            import zstandard
+        except ImportError:
+            raise ValueError("zstandard is required to read .zst uploads")
+        raw = open(file_path, 'rb')
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(raw, closefd=True))
+    return open(file_path, 'rb')
+
+def seek_forward(f: BinaryIO, offset: int, chunk_bytes: int = 1024 * 1024) -> None:
+    """Position a freshly opened stream at `offset`.
+
+    Streams that cannot seek are advanced by reading and discarding.
+    """
+    if not offset:
+        return
+    try:
+        f.seek(offset)
+        return
+    except (io.UnsupportedOperation, OSError):
+        pass
+    remaining = offset
+    while remaining > 0:
+        chunk = f.read(min(chunk_bytes, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
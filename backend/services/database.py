@@ -1,13 +1,168 @@
-from sqlalchemy import create_engine
+import threading
+import time
+from typing import Any, AsyncIterator, Callable, Dict, Optional
+
+from sqlalchemy import create_engine, exc
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
-from ..config import settings
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+from starlette.concurrency import run_in_threadpool
+from ..config.settings import settings
+from .metrics import instrument_engine
+
+# Async drivers for the sync URL schemes
+ASYNC_DRIVERS = {'postgresql': 'asyncpg', 'sqlite': 'aiosqlite'}
+
+def async_database_url(url: str) -> str:
+    """`url` with its driver swapped for the backend's async driver"""
+    parsed = make_url(url)
+    backend = parsed.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver for {backend} databases")
+    return parsed.set(drivername=f"{backend}+{ASYNC_DRIVERS[backend]}").render_as_string(hide_password=False)
+
+class PoolMetrics:
+    """Checkout wait and saturation counters of one connection pool"""
+    def __init__(self, workload: str):
+        self.workload = workload
+        self.pool: Optional[QueuePool] = None
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.peak_checked_out = 0
+        self._lock = threading.Lock()
+
+    def record(self, wait: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+                self.wait_seconds += wait
+                self.peak_checked_out = max(self.peak_checked_out, self.pool.checkedout())
+            self.max_wait_seconds = max(self.max_wait_seconds, wait)
+
+    def get_stats(self) -> Dict[str, Any]:
+        pool = self.pool
+        capacity = pool.size() + max(pool._max_overflow, 0)
+        checked_out = pool.checkedout()
+        with self._lock:
+            return {
+                "pool_size": pool.size(),
+                "capacity": capacity,
+                "checked_out": checked_out,
+                "saturation": round(checked_out / capacity, 4) if capacity else 0.0,
+                "peak_checked_out": self.peak_checked_out,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "mean_wait_seconds": round(self.wait_seconds / self.checkouts, 6) if self.checkouts else 0.0,
+                "max_wait_seconds": round(self.max_wait_seconds, 6),
+            }
+
+class _TimedPool:
+    """Pool mixin timing how long each checkout waits for a connection"""
+    metrics: Optional[PoolMetrics] = None
+
+    def connect(self):
+        started = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            if self.metrics is not None:
+                self.metrics.record(time.perf_counter() - started, timed_out=True)
+            raise
+        if self.metrics is not None:
+            self.metrics.record(time.perf_counter() - started)
+        return connection
+
+    def recreate(self):
+        # Invalidation replaces the pool object; the counters carry over
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        if self.metrics is not None:
+            self.metrics.pool = pool
+        return pool
+
+class TimedQueuePool(_TimedPool, QueuePool):
+    pass
+
+class TimedAsyncQueuePool(_TimedPool, AsyncAdaptedQueuePool):
+    pass
+
+# Pool counters per workload engine
+pool_metrics: Dict[str, PoolMetrics] = {}
+
+def _pool_options(url: str, pool_size: int, poolclass) -> Dict[str, Any]:
+    if make_url(url).database in (None, '', ':memory:'):
+        # In-memory SQLite lives in its single connection
+        return {}
+    return {
+        'poolclass': poolclass,
+        'pool_size': pool_size,
+        'max_overflow': settings.DB_MAX_OVERFLOW,
+        'pool_timeout': settings.DB_POOL_TIMEOUT,
+        'pool_recycle': settings.DB_POOL_RECYCLE,
+        'pool_pre_ping': settings.DB_POOL_PRE_PING,
+    }
+
+def _track(workload: str, sync_engine: Engine) -> None:
+    if settings.METRICS_ENABLED:
+        instrument_engine(workload, sync_engine)
+    pool = sync_engine.pool
+    if isinstance(pool, _TimedPool):
+        metrics = pool_metrics[workload] = PoolMetrics(workload)
+        metrics.pool = pool
+        pool.metrics = metrics
 
-# Create database engine
-engine = create_engine(settings.DATABASE_URL)
+def create_workload_engine(workload: str, url: str, pool_size: int) -> Engine:
+    """Sync engine with its own tuned, instrumented pool"""
+    engine = create_engine(url, **_pool_options(url, pool_size, TimedQueuePool))
+    _track(workload, engine)
+    return engine
 
-# Session factory
+def create_async_workload_engine(workload: str, url: str, pool_size: int) -> AsyncEngine:
+    """Async engine with its own tuned, instrumented pool"""
+    engine = create_async_engine(url, **_pool_options(url, pool_size, TimedAsyncQueuePool))
+    _track(workload, engine.sync_engine)
+    return engine
+
+def get_pool_stats() -> Dict[str, Dict[str, Any]]:
+    return {workload: metrics.get_stats() for workload, metrics in pool_metrics.items()}
+
+# Separate pools per workload, so long ingest transactions or heavy
+# analytics cannot take every connection interactive requests need. Pools
+# connect lazily: a process only opens connections for the workloads it
+# runs. Search and analytics read from READ_REPLICA_URL when one is set;
+# everything else stays on the primary, which sees its own writes at once.
+# A replica lags behind: a result recomputed from it right after an
+# invalidation can miss the rows that caused it, so cached results live at
+# most RESULT_CACHE_REPLICA_TTL seconds while a replica is in use.
+ASYNC_PRIMARY_URL = settings.ASYNC_DATABASE_URL or async_database_url(settings.DATABASE_URL)
+READ_URL = settings.READ_REPLICA_URL or settings.DATABASE_URL
+ASYNC_READ_URL = async_database_url(settings.READ_REPLICA_URL) if settings.READ_REPLICA_URL else ASYNC_PRIMARY_URL
+
+# Create database engine: the primary, for writes and maintenance
+engine = create_workload_engine('primary', settings.DATABASE_URL, settings.DB_POOL_SIZE)
+# Celery ingestion, whose transactions run for a whole batch
+ingest_engine = create_workload_engine('ingest', settings.DATABASE_URL, settings.INGEST_POOL_SIZE)
+# Async primary for request paths that must see the latest writes (auth, uploads)
+async_engine = create_async_workload_engine('primary_async', ASYNC_PRIMARY_URL, settings.DB_POOL_SIZE)
+# Interactive search reads
+read_engine = create_async_workload_engine('read', ASYNC_READ_URL, settings.READ_POOL_SIZE)
+# Analytics, and the sync sessions for analytics that scan the archive
+analytics_engine = create_async_workload_engine('analytics', ASYNC_READ_URL, settings.ANALYTICS_POOL_SIZE)
+analytics_sync_engine = create_workload_engine('analytics_sync', READ_URL, settings.ANALYTICS_POOL_SIZE)
+
+# Session factories
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+IngestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=ingest_engine)
+AnalyticsSyncSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=analytics_sync_engine)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+ReadSessionLocal = async_sessionmaker(read_engine, autoflush=False, expire_on_commit=False)
+AnalyticsSessionLocal = async_sessionmaker(analytics_engine, autoflush=False, expire_on_commit=False)
 
 # Base class for models
 Base = declarative_base()
@@ -19,3 +174,36 @@ def get_db() -> Session:
         yield db
     finally:
         db.close()
+
+async def get_async_db() -> AsyncIterator[AsyncSession]:
+    """Dependency that provides an async session on the primary"""
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def get_read_db() -> AsyncIterator[AsyncSession]:
+    """Dependency that provides an async session for interactive reads"""
+    async with ReadSessionLocal() as db:
+        yield db
+
+async def get_analytics_db() -> AsyncIterator[AsyncSession]:
+    """Dependency that provides an async session for analytics queries"""
+    async with AnalyticsSessionLocal() as db:
+        yield db
+
+async def run_in_session(fn: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """Await `fn(db, *args, **kwargs)` run in the threadpool with its own sync analytics session.
+
+    For reads that do blocking work besides querying, such as archive scans,
+    which would stall every request on the event loop.
+    """
+    def call():
+        with AnalyticsSyncSessionLocal() as db:
+            return fn(db, *args, **kwargs)
+    return await run_in_threadpool(call)
+
+async def dispose_engines() -> None:
+    """Close every pooled connection, as the process shuts down"""
+    for async_workload_engine in (async_engine, read_engine, analytics_engine):
+        await async_workload_engine.dispose()
+    for workload_engine in (engine, ingest_engine, analytics_sync_engine):
+        workload_engine.dispose()
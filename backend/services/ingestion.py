@@ -0,0 +1,164 @@
+import os
+from itertools import chain, islice
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from ..config.settings import settings
+from ..crud.log_entry import bulk_create_log_columns
+from ..crud.template import record_batch, sketch_shard
+from ..crud.upload import get_checkpoint, save_checkpoint
+from .compression import detect_compression, open_log_file, seek_forward
+from .log_parser import LogParserFactory
+from .partitions import ensure_batch_partitions, partitioning_enabled
+from .result_cache import result_cache
+from .log_batch import LogColumns
+from .metrics import INGEST_STAGE_SECONDS, record_inserted, record_parsed
+from .templating import templatize_all
+
+SNIFF_LINES = 10
+
+class LineReader:
+    """Iterates stripped lines from a byte range of a binary file.
+
+    `position` is the offset just past the last line yielded, which is where
+    a resumed read should start. With `end` set, only lines that begin before
+    that offset are yielded, so adjacent `[start, end)` ranges cover every
+    line exactly once.
+    """
+    def __init__(self, f, start: int = 0, end: Optional[int] = None):
+        self.f = f
+        self.position = start
+        self.end = end
+        seek_forward(f, start)
+
+    def __iter__(self) -> Iterator[str]:
+        for raw in self.f:
+            if self.end is not None and self.position >= self.end:
+                return
+            self.position += len(raw)
+            yield raw.decode('utf-8', errors='replace').strip()
+
+def iter_lines(f, start: int = 0, end: Optional[int] = None) -> Iterator[str]:
+    """Lazily yield stripped lines from a byte range of a binary file"""
+    return iter(LineReader(f, start, end))
+
+def sniff_format(lines: Iterator[str], sample_size: int = SNIFF_LINES) -> Tuple[Optional[str], Iterator[str]]:
+    """Detect the log format from the head of a line stream.
+
+    Returns the detected format and an iterator that still yields every line,
+    including the ones consumed for detection.
+    """
+    sample = list(islice(lines, sample_size))
+    return LogParserFactory.detect_format(sample), chain(sample, lines)
+
+def detect_file_format(file_path: str) -> Optional[str]:
+    """Detect the log format of a file from its first lines"""
+    with open_log_file(file_path) as f:
+        log_format, _ = sniff_format(iter_lines(f))
+    return log_format
+
+def split_file(file_path: str, chunk_bytes: int) -> List[Tuple[int, Optional[int]]]:
+    """Split a file into `[start, end)` byte ranges aligned on line starts.
+
+    Compressed files cannot be entered mid-stream, so they always come back
+    as a single open-ended range.
+    """
+    if detect_compression(file_path):
+        return [(0, None)]
+    size = os.path.getsize(file_path)
+    boundaries = [0]
+    with open(file_path, 'rb') as f:
+        target = chunk_bytes
+        while target < size:
+            # Step back one byte so a boundary landing exactly on a line
+            # start is kept rather than skipped
+            f.seek(target - 1)
+            f.readline()
+            boundary = f.tell()
+            if boundary >= size:
+                break
+            boundaries.append(boundary)
+            target = boundary + chunk_bytes
+    boundaries.append(size)
+    return list(zip(boundaries, boundaries[1:]))
+
+def parse_batches(parser, lines: Iterable[str], upload_id: int, batch_size: int) -> Iterator[LogColumns]:
+    """Parse a line stream block by block into column batches.
+
+    Lines the parser rejects are dropped, so batches can hold fewer than
+    `batch_size` rows, and may be empty.
+    """
+    blocks = batched(lines, batch_size)
+    while True:
+        with INGEST_STAGE_SECONDS.labels('read').time():
+            block = next(blocks, None)
+        if block is None:
+            return
+        with INGEST_STAGE_SECONDS.labels('parse').time():
+            batch = parser.parse_batch(block)
+        record_parsed(parser.FORMAT, len(block), len(batch))
+        batch.upload_id = upload_id
+        with INGEST_STAGE_SECONDS.labels('templatize').time():
+            batch.template_ids, batch.templates = templatize_all(batch.messages)
+        yield batch
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    """Group an iterable into lists of at most `size` items"""
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+def ingest_file(
+    db: Session,
+    upload_id: int,
+    file_path: str,
+    batch_size: Optional[int] = None,
+    log_format: Optional[str] = None,
+    start: int = 0,
+    end: Optional[int] = None,
+) -> int:
+    """Stream a log file, or a byte range of it, into `log_entries`.
+
+    Lines are parsed `batch_size` at a time into column batches that reach
+    the bulk loader without per-row dicts. Only one batch is held in memory
+    at a time, so peak memory does not depend on the size of the file. Each
+    batch commits together with a checkpoint of the byte offset it ends at;
+    a retry resumes from that checkpoint, so no row is inserted twice. Returns the total
+    number of rows committed for the range, including earlier attempts.
+    """
+    batch_size = batch_size or settings.INGEST_BATCH_SIZE
+    log_format = log_format or detect_file_format(file_path)
+    if not log_format:
+        raise ValueError("Could not detect log format")
+    parser = LogParserFactory.get_parser(log_format)
+
+    checkpoint = get_checkpoint(db, upload_id, start)
+    offset = checkpoint.offset if checkpoint else start
+    total = checkpoint.rows_committed if checkpoint else 0
+    with open_log_file(file_path) as f:
+        reader = LineReader(f, offset, end)
+        partitioned = partitioning_enabled(db.get_bind())
+        shard = sketch_shard(upload_id, start)
+        for batch in parse_batches(parser, reader, upload_id, batch_size):
+            rows = 0
+            if len(batch):
+                first, last = batch.time_range()
+                with INGEST_STAGE_SECONDS.labels('insert').time():
+                    if partitioned:
+                        ensure_batch_partitions(db.get_bind(), batch.days())
+                    rows = bulk_create_log_columns(db, batch, commit=False)
+                    record_batch(db, batch, shard)
+                total += rows
+            with INGEST_STAGE_SECONDS.labels('commit').time():
+                # The reader sits at the end of the block that produced the batch
+                save_checkpoint(db, upload_id, start, reader.position, total)
+                db.commit()
+            record_inserted(log_format, rows)
+            if len(batch):
+                # Cached results covering these rows are now stale
+                result_cache.invalidate_range(first, last)
+    return total
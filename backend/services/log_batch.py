@@ -0,0 +1,193 @@
+import json
+from datetime import date, datetime, timezone
+from json.encoder import encode_basestring_ascii
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Categorical level codes shared by every batch; levels outside this list
+# get codes after it, per batch
+LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')
+LEVEL_CODES = {level: code for code, level in enumerate(LEVELS)}
+
+def to_datetime64(value: datetime) -> np.datetime64:
+    """UTC `datetime64[us]` of a datetime; naive values are taken as UTC"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return np.datetime64(value, 'us')
+
+def to_datetime(value: np.datetime64) -> datetime:
+    """Aware UTC datetime of a `datetime64[us]`"""
+    return value.astype('datetime64[us]').item().replace(tzinfo=timezone.utc)
+
+def intern_strings(values: Iterable[Optional[str]]) -> List[Optional[str]]:
+    """Column with equal strings collapsed onto one shared object.
+
+    Regex groups are fresh objects even when their text repeats (IPs, user
+    agents, logger names), so a batch would otherwise hold one copy per row.
+    """
+    seen: Dict[str, str] = {}
+    return [value if value is None else seen.setdefault(value, value) for value in values]
+
+def _json_column(values: Sequence[Any]) -> List[str]:
+    """JSON text of each value in a column"""
+    if isinstance(values, np.ndarray) and values.dtype.kind in 'iu':
+        return values.astype(str).tolist()
+    return [
+        'null' if value is None
+        else encode_basestring_ascii(value) if isinstance(value, str)
+        else json.dumps(value)
+        for value in values
+    ]
+
+def _python_column(values: Sequence[Any]) -> List[Any]:
+    return values.tolist() if isinstance(values, np.ndarray) else list(values)
+
+class LogColumns:
+    """A block of parsed log entries held column by column.
+
+    `timestamps` is a UTC `datetime64[us]` array and `level_codes` indexes
+    into `levels`. Parsers with a fixed set of additional fields fill
+    `fields` with one column per field, and a row whose fields are all None
+    has no additional fields; others keep per-row dicts in `extra`. `upload_id`, `template_ids` and `templates` are filled in by
+    ingestion.
+    """
+    __slots__ = (
+        'timestamps', 'level_codes', 'levels', 'sources', 'messages', 'fields', 'extra',
+        'upload_id', 'template_ids', 'templates',
+    )
+
+    def __init__(
+        self,
+        timestamps: np.ndarray,
+        level_codes: np.ndarray,
+        sources: List[str],
+        messages: List[str],
+        fields: Optional[Dict[str, Sequence[Any]]] = None,
+        extra: Optional[List[Optional[Dict[str, Any]]]] = None,
+        levels: Tuple[str, ...] = LEVELS,
+    ):
+        self.timestamps = timestamps
+        self.level_codes = level_codes
+        self.levels = levels
+        self.sources = sources
+        self.messages = messages
+        self.fields = fields
+        self.extra = extra
+        self.upload_id: Optional[int] = None
+        self.template_ids: Optional[List[str]] = None
+        self.templates: Optional[List[str]] = None
+
+    def __len__(self) -> int:
+        return len(self.messages)
+
+    @classmethod
+    def empty(cls) -> "LogColumns":
+        return cls(np.empty(0, dtype='datetime64[us]'), np.empty(0, dtype=np.int16), [], [], extra=[])
+
+    @classmethod
+    def from_rows(cls, rows: Iterable[Optional[Dict[str, Any]]]) -> "LogColumns":
+        """Columns of per-line parse results; None results are skipped"""
+        rows = [row for row in rows if row]
+        levels = list(LEVELS)
+        codes = dict(LEVEL_CODES)
+        level_codes = np.empty(len(rows), dtype=np.int16)
+        for i, row in enumerate(rows):
+            code = codes.get(row['log_level'])
+            if code is None:
+                code = codes[row['log_level']] = len(levels)
+                levels.append(row['log_level'])
+            level_codes[i] = code
+        return cls(
+            np.array([to_datetime64(row['timestamp']) for row in rows], dtype='datetime64[us]'),
+            level_codes,
+            intern_strings(row['source'] for row in rows),
+            [row['message'] for row in rows],
+            extra=[row.get('additional_fields') for row in rows],
+            levels=tuple(levels),
+        )
+
+    def select(self, mask: np.ndarray) -> "LogColumns":
+        """Rows where `mask` is true"""
+        indices = np.flatnonzero(mask)
+        fields = None
+        if self.fields is not None:
+            fields = {
+                name: column[indices] if isinstance(column, np.ndarray) else [column[i] for i in indices]
+                for name, column in self.fields.items()
+            }
+        return LogColumns(
+            self.timestamps[indices],
+            self.level_codes[indices],
+            [self.sources[i] for i in indices],
+            [self.messages[i] for i in indices],
+            fields=fields,
+            extra=None if self.extra is None else [self.extra[i] for i in indices],
+            levels=self.levels,
+        )
+
+    @property
+    def log_levels(self) -> List[str]:
+        return np.array(self.levels, dtype=object)[self.level_codes].tolist()
+
+    def time_range(self) -> Tuple[datetime, datetime]:
+        """Earliest and latest timestamp in the batch"""
+        return to_datetime(self.timestamps.min()), to_datetime(self.timestamps.max())
+
+    def days(self) -> List[date]:
+        """Distinct UTC days the batch's rows fall on"""
+        return np.unique(self.timestamps.astype('datetime64[D]')).tolist()
+
+    def iso_timestamps(self) -> List[str]:
+        return np.datetime_as_string(self.timestamps, unit='us', timezone='UTC').tolist()
+
+    def datetimes(self) -> List[datetime]:
+        return [value.replace(tzinfo=timezone.utc) for value in self.timestamps.tolist()]
+
+    def _empty_rows(self) -> Optional[List[bool]]:
+        """Which rows have every field None, or None when no row can"""
+        columns = list(self.fields.values())
+        if any(isinstance(column, np.ndarray) for column in columns):
+            return None
+        empty = [all(value is None for value in values) for values in zip(*columns)]
+        return empty if any(empty) else None
+
+    def additional_fields(self) -> List[Optional[Dict[str, Any]]]:
+        if self.fields is None:
+            return list(self.extra)
+        names = list(self.fields)
+        rows = [
+            dict(zip(names, values))
+            for values in zip(*(_python_column(self.fields[name]) for name in names))
+        ]
+        empty = self._empty_rows()
+        return rows if empty is None else [None if skip else row for row, skip in zip(rows, empty)]
+
+    def additional_fields_json(self) -> List[Optional[str]]:
+        """Compact JSON of each row's additional fields, built column by column"""
+        if self.fields is None:
+            return [None if value is None else json.dumps(value, separators=(',', ':')) for value in self.extra]
+        names = list(self.fields)
+        template = '{' + ','.join(f'{encode_basestring_ascii(name)}:%s' for name in names) + '}'
+        rows = [template % values for values in zip(*(_json_column(self.fields[name]) for name in names))]
+        empty = self._empty_rows()
+        return rows if empty is None else [None if skip else row for row, skip in zip(rows, empty)]
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Per-row dicts in the shape `insert_log_entries` takes"""
+        template_ids = self.template_ids or [None] * len(self)
+        return [
+            {
+                'upload_id': self.upload_id,
+                'timestamp': timestamp,
+                'log_level': level,
+                'source': source,
+                'message': message,
+                'template_id': template_id,
+                'additional_fields': fields,
+            }
+            for timestamp, level, source, message, template_id, fields in zip(
+                self.datetimes(), self.log_levels, self.sources, self.messages,
+                template_ids, self.additional_fields(),
+            )
+        ]
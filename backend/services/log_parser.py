@@ -1,28 +1,207 @@
+import json
 import re
-from datetime import datetime
-from typing import Dict, List, Optional, Any
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Any, Sequence, Tuple, Type
 
-class ApacheLogParser:
+import numpy as np
+
+from .log_batch import LEVEL_CODES, LogColumns, intern_strings, to_datetime64
+
+MONTHS = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12,
+}
+_TIMEZONES: Dict[str, timezone] = {}
+
+def parse_clf_timestamp(value: str) -> datetime:
+    """Parse a `%d/%b/%Y:%H:%M:%S %z` timestamp without strptime.
+
+    Handles the fixed-width layout Apache writes (`10/Oct/2000:13:55:36 -0700`)
+    directly and defers anything else to strptime, so results and errors match
+    `datetime.strptime` exactly.
+    """
+    if (
+        len(value) == 26
+        and value[2] == '/' and value[6] == '/' and value[11] == ':'
+        and value[14] == ':' and value[17] == ':' and value[20] == ' '
+        and value[21] in '+-' and value[24] in '012345'
+        and value[3:6] in MONTHS
+        and (value[0:2] + value[7:11] + value[12:14] + value[15:17] + value[18:20] + value[22:26]).isdecimal()
+    ):
+        offset = value[21:]
+        tz = _TIMEZONES.get(offset)
+        if tz is None:
+            minutes = int(offset[1:3]) * 60 + int(offset[3:5])
+            tz = timezone(timedelta(minutes=-minutes if offset[0] == '-' else minutes))
+            _TIMEZONES[offset] = tz
+        return datetime(
+            int(value[7:11]), MONTHS[value[3:6]], int(value[0:2]),
+            int(value[12:14]), int(value[15:17]), int(value[18:20]),
+            tzinfo=tz,
+        )
+    return datetime.strptime(value, '%d/%b/%Y:%H:%M:%S %z')
+
+# Three-letter month names packed into ints, sorted, for vectorized lookup
+_MONTH_KEYS = sorted((ord(name[0]) << 16 | ord(name[1]) << 8 | ord(name[2]), number) for name, number in MONTHS.items())
+_MONTH_KEY_ARRAY = np.array([key for key, _ in _MONTH_KEYS], dtype=np.int64)
+_MONTH_NUMBER_ARRAY = np.array([number for _, number in _MONTH_KEYS], dtype=np.int64)
+_CLF_DIGITS = [0, 1, 7, 8, 9, 10, 12, 13, 15, 16, 18, 19, 22, 23, 24, 25]
+
+def parse_clf_timestamps(values: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Vectorized `parse_clf_timestamp` over a column of timestamps.
+
+    Returns UTC `datetime64[us]` values and a mask of the ones that parsed.
+    Fixed-width values are decoded with array arithmetic on their bytes;
+    anything else goes through `parse_clf_timestamp` one by one, so the
+    accepted values are the same.
+    """
+    count = len(values)
+    timestamps = np.empty(count, dtype='datetime64[us]')
+    valid = np.zeros(count, dtype=bool)
+    try:
+        # One spare byte shows whether a value is longer than 26 characters
+        raw = np.array(values, dtype='S27').view(np.uint8).reshape(count, 27).astype(np.int64)
+    except UnicodeEncodeError:
+        raw = None
+    if raw is not None and count:
+        digits = raw - ord('0')
+        valid = (
+            (raw[:, 25] != 0) & (raw[:, 26] == 0)
+            & (raw[:, 2] == ord('/')) & (raw[:, 6] == ord('/')) & (raw[:, 11] == ord(':'))
+            & (raw[:, 14] == ord(':')) & (raw[:, 17] == ord(':')) & (raw[:, 20] == ord(' '))
+            & ((raw[:, 21] == ord('+')) | (raw[:, 21] == ord('-')))
+            & ((digits[:, _CLF_DIGITS] >= 0) & (digits[:, _CLF_DIGITS] <= 9)).all(axis=1)
+            & (digits[:, 24] <= 5)
+        )
+        month_keys = raw[:, 3] << 16 | raw[:, 4] << 8 | raw[:, 5]
+        position = np.minimum(np.searchsorted(_MONTH_KEY_ARRAY, month_keys), len(_MONTH_KEY_ARRAY) - 1)
+        valid &= _MONTH_KEY_ARRAY[position] == month_keys
+        month = _MONTH_NUMBER_ARRAY[position]
+        day = digits[:, 0] * 10 + digits[:, 1]
+        year = digits[:, 7] * 1000 + digits[:, 8] * 100 + digits[:, 9] * 10 + digits[:, 10]
+        hour = digits[:, 12] * 10 + digits[:, 13]
+        minute = digits[:, 15] * 10 + digits[:, 16]
+        second = digits[:, 18] * 10 + digits[:, 19]
+        offset = (digits[:, 22] * 10 + digits[:, 23]) * 60 + digits[:, 24] * 10 + digits[:, 25]
+        offset = np.where(raw[:, 21] == ord('-'), -offset, offset)
+        # timezone() rejects offsets of a day or more, as the scalar parser does
+        valid &= (year >= 1) & (day >= 1) & (hour < 24) & (minute < 60) & (second < 60) & (np.abs(offset) < 24 * 60)
+
+        months = (year - 1970).astype('datetime64[Y]') + (month - 1).astype('timedelta64[M]')
+        days = months.astype('datetime64[D]') + (day - 1).astype('timedelta64[D]')
+        # Days past the end of the month roll into the next one
+        valid &= days.astype('datetime64[M]') == months
+        seconds = hour * 3600 + minute * 60 + second - offset * 60
+        timestamps = days.astype('datetime64[us]') + seconds.astype('timedelta64[s]')
+
+    for i in np.flatnonzero(~valid):
+        try:
+            timestamps[i] = to_datetime64(parse_clf_timestamp(values[i]))
+            valid[i] = True
+        except ValueError:
+            pass
+    return timestamps, valid
+
+def parse_iso_timestamps(values: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Parse `YYYY-MM-DD HH:MM:SS` values into `datetime64[us]`, with a mask of valid ones.
+
+    The whole column is converted by NumPy; if any value is out of range
+    the column is redone value by value with `datetime.fromisoformat`.
+    """
+    try:
+        return np.array(values, dtype='datetime64[s]').astype('datetime64[us]'), np.ones(len(values), dtype=bool)
+    except ValueError:
+        pass
+    timestamps = np.empty(len(values), dtype='datetime64[us]')
+    valid = np.zeros(len(values), dtype=bool)
+    for i, value in enumerate(values):
+        try:
+            timestamps[i] = to_datetime64(datetime.fromisoformat(value))
+            valid[i] = True
+        except ValueError:
+            pass
+    return timestamps, valid
+
+PARSERS: Dict[str, Type['LogParser']] = {}
+
+def register_parser(parser_cls: Type['LogParser']) -> Type['LogParser']:
+    """Class decorator adding a parser to the format registry.
+
+    Registration order doubles as detection priority when two formats score
+    equally on a sample.
+    """
+    PARSERS[parser_cls.FORMAT] = parser_cls
+    return parser_cls
+
+class LogParser:
+    """Base class for registered log parsers"""
+    FORMAT: str = ''
+
+    @classmethod
+    def matches_signature(cls, line: str) -> bool:
+        """Cheap prefix/shape check run before the full parse during detection"""
+        return True
+
+    @classmethod
+    def parse_line(cls, line: str) -> Optional[Dict[str, Any]]:
+        """Parse a single log line"""
+        raise NotImplementedError
+
+    @classmethod
+    def parse_batch(cls, lines: Sequence[str]) -> LogColumns:
+        """Parse a block of lines into columns, skipping lines that do not parse"""
+        return LogColumns.from_rows(cls.parse_line(line) for line in lines)
+
+@register_parser
+class ApacheLogParser(LogParser):
     """Parser for Apache log format"""
+    FORMAT = 'apache'
     PATTERN = r'(\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}) - - \[(.*?)\] \"(.*?)\" (\d{3}) (\d+) \"(.*?)\" \"(.*?)\"'
+    REGEX = re.compile(PATTERN)
+    # Matches every line of a newline-joined block in one findall() call
+    BATCH_REGEX = re.compile('^' + PATTERN, re.MULTILINE)
+    SOURCE = 'apache'
+    # Regex groups in order, and the groups kept as additional_fields
+    GROUPS = ('ip', 'timestamp', 'request', 'status', 'size', 'referer', 'user_agent')
+    FIELDS = ('ip', 'status', 'size', 'referer', 'user_agent')
+    # Fields where a bare "-" means no value
+    DASH_IS_NULL: Tuple[str, ...] = ()
+
+    # Consecutive access-log lines usually share a timestamp, so the last
+    # parsed (string, datetime) pair is reused
+    _last_timestamp: Tuple[Optional[str], Optional[datetime]] = (None, None)
+
+    @classmethod
+    def parse_timestamp(cls, timestamp_str: str) -> datetime:
+        """Parse a log timestamp, reusing the previous result for repeats"""
+        last_str, last_timestamp = cls._last_timestamp
+        if timestamp_str == last_str:
+            return last_timestamp
+        timestamp = parse_clf_timestamp(timestamp_str)
+        cls._last_timestamp = (timestamp_str, timestamp)
+        return timestamp
+
+    @classmethod
+    def matches_signature(cls, line: str) -> bool:
+        return line[:1].isdigit() and ' - - [' in line
     
     @classmethod
     def parse_line(cls, line: str) -> Optional[Dict[str, Any]]:
         """Parse a single log line"""
-        match = re.match(cls.PATTERN, line)
+        match = cls.REGEX.match(line)
         if match:
             ip, timestamp_str, request, status, size, referer, user_agent = match.groups()
             try:
-                timestamp = datetime.strptime(timestamp_str, '%d/%b/%Y:%H:%M:%S %z')
-                log_level = 'INFO' if int(status) < 400 else 'ERROR'
+                timestamp = cls.parse_timestamp(timestamp_str)
+                status = int(status)
                 return {
                     'timestamp': timestamp,
-                    'log_level': log_level,
+                    'log_level': 'INFO' if status < 400 else 'ERROR',
                     'source': 'apache',
                     'message': request,
                     'additional_fields': {
                         'ip': ip,
-                        'status': int(status),
+                        'status': status,
                         'size': int(size),
                         'referer': referer,
                         'user_agent': user_agent
@@ -32,19 +211,288 @@ class ApacheLogParser:
                 return None
         return None
 
+    @classmethod
+    def parse_batch(cls, lines: Sequence[str]) -> LogColumns:
+        """Parse a block of lines into column arrays.
+
+        One regex pass covers the whole block and its groups are transposed
+        straight into columns: timestamps are decoded by
+        `parse_clf_timestamps`, status and size become int64 arrays and the
+        level is derived from the status array. Yields the same entries as
+        `parse_line` on each line.
+        """
+        matches = cls.BATCH_REGEX.findall('\n'.join(lines))
+        if not matches:
+            return LogColumns.empty()
+        groups = dict(zip(cls.GROUPS, zip(*matches)))
+        try:
+            status = np.array(groups['status'], dtype=np.int64)
+            size = np.array(groups['size'], dtype=np.int64)
+        except OverflowError:
+            return super().parse_batch(lines)
+        timestamps, valid = parse_clf_timestamps(groups['timestamp'])
+        level_codes = np.where(status < 400, LEVEL_CODES['INFO'], LEVEL_CODES['ERROR']).astype(np.int16)
+        columns = {name: intern_strings(values) for name, values in groups.items()}
+        columns.update(status=status, size=size)
+        for name in cls.DASH_IS_NULL:
+            columns[name] = [None if value == '-' else value for value in columns[name]]
+        batch = LogColumns(
+            timestamps,
+            level_codes,
+            [cls.SOURCE] * len(matches),
+            columns['request'],
+            fields={name: columns[name] for name in cls.FIELDS},
+        )
+        return batch if valid.all() else batch.select(valid)
+
+@register_parser
+class NginxLogParser(ApacheLogParser):
+    """Parser for nginx's default `combined` log format"""
+    FORMAT = 'nginx'
+    PATTERN = r'(\S+) - (\S+) \[([^\]]+)\] "(.*?)" (\d{3}) (\d+) "(.*?)" "(.*?)"'
+    REGEX = re.compile(PATTERN)
+    # The negated class must not run on into the next line of the block
+    BATCH_REGEX = re.compile('^' + PATTERN.replace(r'[^\]]', r'[^\]\n]'), re.MULTILINE)
+    SOURCE = 'nginx'
+    GROUPS = ('ip', 'remote_user', 'timestamp', 'request', 'status', 'size', 'referer', 'user_agent')
+    FIELDS = ('ip', 'remote_user', 'status', 'size', 'referer', 'user_agent')
+    DASH_IS_NULL = ('remote_user',)
+    _last_timestamp: Tuple[Optional[str], Optional[datetime]] = (None, None)
+
+    @classmethod
+    def matches_signature(cls, line: str) -> bool:
+        return ' - ' in line and '] "' in line
+
+    @classmethod
+    def parse_line(cls, line: str) -> Optional[Dict[str, Any]]:
+        """Parse a single log line"""
+        match = cls.REGEX.match(line)
+        if match:
+            ip, remote_user, timestamp_str, request, status, size, referer, user_agent = match.groups()
+            try:
+                timestamp = cls.parse_timestamp(timestamp_str)
+                status = int(status)
+                return {
+                    'timestamp': timestamp,
+                    'log_level': 'INFO' if status < 400 else 'ERROR',
+                    'source': 'nginx',
+                    'message': request,
+                    'additional_fields': {
+                        'ip': ip,
+                        'remote_user': None if remote_user == '-' else remote_user,
+                        'status': status,
+                        'size': int(size),
+                        'referer': referer,
+                        'user_agent': user_agent
+                    }
+                }
+            except (ValueError, TypeError):
+                return None
+        return None
+
+@register_parser
+class PythonLogParser(LogParser):
+    """Parser for Python `logging` output (`%(asctime)s - [%(name)s - ]%(levelname)s - %(message)s`)"""
+    FORMAT = 'python'
+    PATTERN = (
+        r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}),(\d{3}) - '
+        r'(?:(\S+) - )?(DEBUG|INFO|WARNING|WARN|ERROR|CRITICAL|FATAL) - (.*)'
+    )
+    REGEX = re.compile(PATTERN)
+    BATCH_REGEX = re.compile('^' + PATTERN + '$', re.MULTILINE)
+    LEVELS = {'WARN': 'WARNING', 'FATAL': 'CRITICAL'}
+
+    @classmethod
+    def matches_signature(cls, line: str) -> bool:
+        return len(line) > 26 and line[4] == '-' and line[10] == ' ' and line[19] == ',' and line[23:26] == ' - '
+
+    @classmethod
+    def parse_line(cls, line: str) -> Optional[Dict[str, Any]]:
+        """Parse a single log line"""
+        match = cls.REGEX.fullmatch(line)
+        if match:
+            timestamp_str, millis, logger, level, message = match.groups()
+            try:
+                timestamp = datetime.fromisoformat(timestamp_str).replace(microsecond=int(millis) * 1000)
+            except ValueError:
+                return None
+            return {
+                'timestamp': timestamp,
+                'log_level': cls.LEVELS.get(level, level),
+                'source': 'python',
+                'message': message,
+                'additional_fields': {'logger': logger} if logger else None
+            }
+        return None
+
+    @classmethod
+    def parse_batch(cls, lines: Sequence[str]) -> LogColumns:
+        """Parse a block of lines into column arrays.
+
+        Yields the same entries as `parse_line` on each line; rows without a
+        logger name have no additional fields.
+        """
+        matches = cls.BATCH_REGEX.findall('\n'.join(lines))
+        if not matches:
+            return LogColumns.empty()
+        timestamp_strs, millis, loggers, levels, messages = zip(*matches)
+        timestamps, valid = parse_iso_timestamps(timestamp_strs)
+        timestamps += np.array(millis, dtype=np.int64).astype('timedelta64[ms]')
+        names, inverse = np.unique(np.array(levels), return_inverse=True)
+        level_codes = np.array([LEVEL_CODES[cls.LEVELS.get(name, name)] for name in names.tolist()], dtype=np.int16)
+        batch = LogColumns(
+            timestamps,
+            level_codes[inverse.reshape(-1)],
+            ['python'] * len(matches),
+            list(messages),
+            # findall reports a missing logger as ''
+            fields={'logger': intern_strings(logger or None for logger in loggers)},
+        )
+        return batch if valid.all() else batch.select(valid)
+
+@register_parser
+class JsonLogParser(LogParser):
+    """Parser for JSON-lines logs with one object per line"""
+    FORMAT = 'json'
+    TIMESTAMP_KEYS = ('timestamp', '@timestamp', 'time', 'ts')
+    LEVEL_KEYS = ('log_level', 'level', 'levelname', 'severity')
+    MESSAGE_KEYS = ('message', 'msg')
+
+    @classmethod
+    def matches_signature(cls, line: str) -> bool:
+        return line[:1] == '{' and line[-1:] == '}'
+
+    @staticmethod
+    def _pop_first(record: Dict[str, Any], keys: Tuple[str, ...]) -> Any:
+        for key in keys:
+            if key in record:
+                return record.pop(key)
+        return None
+
+    @staticmethod
+    def _parse_timestamp(value: Any) -> datetime:
+        if isinstance(value, (int, float)) and not isinstance(value, bool):
+            # Treat large values as epoch milliseconds
+            if value > 1e11:
+                value /= 1000
+            return datetime.fromtimestamp(value, timezone.utc)
+        if isinstance(value, str):
+            if value.endswith('Z'):
+                value = value[:-1] + '+00:00'
+            return datetime.fromisoformat(value)
+        raise ValueError(f"Unsupported timestamp: {value!r}")
+
+    @classmethod
+    def parse_line(cls, line: str) -> Optional[Dict[str, Any]]:
+        """Parse a single log line"""
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(record, dict):
+            return None
+        try:
+            timestamp = cls._parse_timestamp(cls._pop_first(record, cls.TIMESTAMP_KEYS))
+        except (ValueError, TypeError, OverflowError, OSError):
+            return None
+        level = cls._pop_first(record, cls.LEVEL_KEYS)
+        message = cls._pop_first(record, cls.MESSAGE_KEYS)
+        source = record.pop('source', None)
+        return {
+            'timestamp': timestamp,
+            'log_level': str(level).upper() if level else 'INFO',
+            'source': str(source) if source else 'json',
+            'message': '' if message is None else str(message),
+            'additional_fields': record or None
+        }
+
+@register_parser
+class SyslogParser(LogParser):
+    """Parser for BSD syslog (RFC 3164) lines, with or without a `<PRI>` prefix"""
+    FORMAT = 'syslog'
+    PATTERN = r'(?:<(\d{1,3})>)?([A-Z][a-z]{2} [ \d]\d \d{2}:\d{2}:\d{2}) (\S+) ([^:\[\s]+)(?:\[(\d+)\])?: ?(.*)'
+    REGEX = re.compile(PATTERN)
+    # Syslog severity (PRI % 8) to log level
+    SEVERITIES = ('CRITICAL', 'CRITICAL', 'CRITICAL', 'ERROR', 'WARNING', 'INFO', 'INFO', 'DEBUG')
+
+    @classmethod
+    def matches_signature(cls, line: str) -> bool:
+        if line[:1] == '<':
+            line = line[line.find('>') + 1:]
+        return line[:3] in MONTHS and line[3:4] == ' ' and line[9:10] == ':'
+
+    @staticmethod
+    def _parse_timestamp(value: str) -> datetime:
+        # RFC 3164 timestamps carry no year; assume the most recent one
+        now = datetime.now()
+        timestamp = datetime(now.year, MONTHS[value[:3]], int(value[4:6]),
+                             int(value[7:9]), int(value[10:12]), int(value[13:15]))
+        if timestamp > now + timedelta(days=1):
+            timestamp = timestamp.replace(year=now.year - 1)
+        return timestamp
+
+    @classmethod
+    def parse_line(cls, line: str) -> Optional[Dict[str, Any]]:
+        """Parse a single log line"""
+        match = cls.REGEX.fullmatch(line)
+        if match:
+            priority, timestamp_str, host, app, pid, message = match.groups()
+            try:
+                timestamp = cls._parse_timestamp(timestamp_str)
+            except (ValueError, KeyError):
+                return None
+            fields: Dict[str, Any] = {'host': host, 'app': app}
+            if pid:
+                fields['pid'] = int(pid)
+            if priority:
+                fields['facility'] = int(priority) // 8
+            return {
+                'timestamp': timestamp,
+                'log_level': cls.SEVERITIES[int(priority) % 8] if priority else 'INFO',
+                'source': 'syslog',
+                'message': message,
+                'additional_fields': fields
+            }
+        return None
+
 class LogParserFactory:
     """Factory to create appropriate log parser"""
     @staticmethod
-    def detect_format(lines: List[str]) -> Optional[str]:
+    def score_formats(lines: List[str]) -> Dict[str, int]:
+        """Count the sample lines each registered format can parse.
+
+        The cheap signature check gates the full parse, so most formats
+        reject foreign lines without running their regex.
+        """
+        scores = {}
+        for name, parser_cls in PARSERS.items():
+            score = 0
+            for line in lines:
+                if parser_cls.matches_signature(line) and parser_cls.parse_line(line):
+                    score += 1
+            if score:
+                scores[name] = score
+        return scores
+
+    @classmethod
+    def detect_format(cls, lines: List[str]) -> Optional[str]:
         """Detect log format from sample lines"""
-        for line in lines[:10]:  # Check first 10 lines
-            if re.match(ApacheLogParser.PATTERN, line):
-                return 'apache'
-        return None
+        sample = [line.strip() for line in lines[:10] if line.strip()]  # Check first 10 lines
+        scores = cls.score_formats(sample)
+        if not scores:
+            return None
+        # max() keeps the first of equal scores, i.e. registration order
+        return max(scores, key=scores.get)
+
+    @staticmethod
+    def formats() -> List[str]:
+        """Names of all registered formats"""
+        return list(PARSERS)
 
     @classmethod
     def get_parser(cls, format: str):
         """Get parser for the specified format"""
-        if format == 'apache':
-            return ApacheLogParser()
-        raise ValueError(f"Unsupported log format: {format}")
+        parser_cls = PARSERS.get(format)
+        if parser_cls is None:
+            raise ValueError(f"Unsupported log format: {format}")
+        return parser_cls()
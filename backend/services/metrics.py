@@ -0,0 +1,196 @@
+import logging
+import os
+import time
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess, start_http_server
+from prometheus_client.core import GaugeMetricFamily
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Requests, by route template rather than raw path to bound label values
+REQUEST_SECONDS = Histogram(
+    'http_request_duration_seconds', 'HTTP request latency, until the last body byte is sent',
+    ['method', 'route', 'status'],
+)
+
+# Ingestion. Lines and rows per second are rate() of the counters
+INGEST_LINES = Counter('ingest_lines_parsed_total', 'Log lines read and parsed', ['format'])
+INGEST_ROWS = Counter('ingest_rows_inserted_total', 'Log entries committed', ['format'])
+PARSE_FAILURES = Counter('ingest_parse_failures_total', 'Log lines the parser rejected', ['format'])
+INGEST_BATCH_ROWS = Histogram(
+    'ingest_batch_rows', 'Rows per ingested batch', ['format'],
+    buckets=(0, 100, 500, 1000, 2500, 5000, 10000, 25000, 50000),
+)
+# Stages: read, parse, templatize, insert, commit, status
+INGEST_STAGE_SECONDS = Histogram(
+    'ingest_stage_duration_seconds', 'Time spent per batch in each ingestion stage', ['stage'],
+)
+
+SQL_SECONDS = Histogram(
+    'sql_query_duration_seconds', 'SQL statement execution time', ['workload', 'operation'],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+SQL_OPERATIONS = frozenset(('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'COPY'))
+# Workload of each instrumented engine, for statements timed outside its events
+_workloads: Dict[Engine, str] = {}
+
+def _operation(statement: str) -> str:
+    keyword = statement.lstrip()[:6].upper()
+    return keyword if keyword in SQL_OPERATIONS else 'OTHER'
+
+def instrument_engine(workload: str, engine: Engine) -> None:
+    """Time every statement `engine` executes, labelled with its workload"""
+    _workloads[engine] = workload
+
+    @event.listens_for(engine, 'before_cursor_execute')
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    @event.listens_for(engine, 'after_cursor_execute')
+    def stop_timer(conn, cursor, statement, parameters, context, executemany):
+        SQL_SECONDS.labels(workload, _operation(statement)).observe(time.perf_counter() - context._query_started)
+
+def time_copy(engine: Engine):
+    """Timer for a COPY run on the raw DBAPI cursor, which the engine events never see"""
+    return SQL_SECONDS.labels(_workloads.get(engine, 'other'), 'COPY').time()
+
+def record_parsed(log_format: str, lines: int, rows: int) -> None:
+    INGEST_LINES.labels(log_format).inc(lines)
+    if lines > rows:
+        PARSE_FAILURES.labels(log_format).inc(lines - rows)
+
+def record_inserted(log_format: str, rows: int) -> None:
+    INGEST_ROWS.labels(log_format).inc(rows)
+    INGEST_BATCH_ROWS.labels(log_format).observe(rows)
+
+class RequestMetricsMiddleware:
+    """ASGI middleware observing each HTTP request's latency per route.
+
+    Plain ASGI rather than `BaseHTTPMiddleware`, which would add a task and
+    a copy of every response body to each request.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # The router records the matched route in the scope
+            route = scope.get('route')
+            REQUEST_SECONDS.labels(
+                scope['method'], getattr(route, 'path', 'unmatched'), str(status)
+            ).observe(time.perf_counter() - started)
+
+class StatsCollector:
+    """Exports the `get_stats()` dicts services keep as gauges, read at scrape time.
+
+    A source registered with `label` returns one stats dict per label value,
+    e.g. per pool workload.
+    """
+    def __init__(self):
+        self.sources: Dict[str, Tuple[Callable[[], Dict[str, Any]], Optional[str]]] = {}
+
+    def describe(self) -> list:
+        # Nothing to check at registration, which would otherwise run collect()
+        return []
+
+    def register(self, prefix: str, get_stats: Callable[[], Dict[str, Any]], label: Optional[str] = None) -> None:
+        self.sources[prefix] = (get_stats, label)
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        for prefix, (get_stats, label) in list(self.sources.items()):
+            try:
+                stats = get_stats()
+            except Exception:
+                logger.exception("Could not collect %s stats", prefix)
+                continue
+            groups = stats.items() if label else [(None, stats)]
+            families: Dict[str, GaugeMetricFamily] = {}
+            for value, group in groups:
+                for key, number in group.items():
+                    if isinstance(number, bool) or not isinstance(number, (int, float)):
+                        continue
+                    family = families.get(key)
+                    if family is None:
+                        family = families[key] = GaugeMetricFamily(
+                            f'{prefix}_{key}', f"{prefix} {key}".replace('_', ' '),
+                            labels=[label] if label else [],
+                        )
+                    family.add_metric([value] if label else [], number)
+            yield from families.values()
+
+class CeleryQueueCollector:
+    """Tasks waiting in each `METRICS_CELERY_QUEUES` queue of a Redis broker"""
+    def __init__(self):
+        self._redis = None
+
+    def describe(self) -> list:
+        return []
+
+    def _client(self):
+        if self._redis is None:
+            import redis
+            self._redis = redis.Redis.from_url(settings.CELERY_BROKER_URL, socket_timeout=0.5)
+        return self._redis
+
+    def collect(self) -> Iterator[GaugeMetricFamily]:
+        if not settings.CELERY_BROKER_URL.startswith(('redis://', 'rediss://')):
+            return
+        family = GaugeMetricFamily('celery_queue_depth', 'Tasks waiting in a Celery queue', labels=['queue'])
+        try:
+            client = self._client()
+            for queue in settings.METRICS_CELERY_QUEUES:
+                family.add_metric([queue], client.llen(queue))
+        except Exception as e:
+            logger.warning("Could not read Celery queue depth: %s", e)
+            return
+        yield family
+
+stats_collector = StatsCollector()
+celery_queue_collector = CeleryQueueCollector()
+
+def _multiprocess() -> bool:
+    return 'PROMETHEUS_MULTIPROC_DIR' in os.environ
+
+def metrics_registry() -> CollectorRegistry:
+    """Registry to expose: in multiprocess mode, one merging every process' samples"""
+    if not _multiprocess():
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(stats_collector)
+    registry.register(celery_queue_collector)
+    return registry
+
+def render_metrics() -> Tuple[bytes, str]:
+    """Body and content type of a scrape"""
+    return generate_latest(metrics_registry()), CONTENT_TYPE_LATEST
+
+def start_metrics_server(port: int) -> None:
+    """Serve this process' metrics, and its children's in multiprocess mode"""
+    start_http_server(port, registry=metrics_registry())
+
+def mark_process_dead(pid: int) -> None:
+    if _multiprocess():
+        multiprocess.mark_process_dead(pid)
+
+REGISTRY.register(stats_collector)
+REGISTRY.register(celery_queue_collector)
@@ -0,0 +1,218 @@
+import logging
+import threading
+from datetime import date, datetime, timedelta, timezone
+from typing import Callable, Iterable, List, Optional, Set
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.orm import Session
+
+from ..config.settings import settings
+from ..models.log_entry import LogEntry, POSTGRES_TEXT_INDEXES
+from .database import Base
+
+logger = logging.getLogger(__name__)
+
+TABLE = LogEntry.__tablename__
+PARTITION_PREFIX = f"{TABLE}_p"
+
+# Parent table for declarative range partitioning. PostgreSQL requires the
+# partition key in the primary key, hence (id, timestamp); ids still come
+# from a single identity sequence and stay unique across partitions.
+PARTITIONED_TABLE_DDL = f"""
+CREATE TABLE {TABLE} (
+    id BIGINT GENERATED BY DEFAULT AS IDENTITY,
+    upload_id INTEGER NOT NULL REFERENCES uploads (id),
+    timestamp TIMESTAMP WITH TIME ZONE NOT NULL,
+    log_level VARCHAR NOT NULL,
+    source VARCHAR NOT NULL,
+    message VARCHAR NOT NULL,
+    template_id VARCHAR(16),
+    additional_fields JSON,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp)
+"""
+
+# Partition starts known to exist, so ingestion skips the catalog round-trip
+_known_partitions: Set[date] = set()
+# Periods whose rows stay in the default partition: it already held some
+# when their partition was to be created, which PostgreSQL refuses
+_default_periods: Set[date] = set()
+_lock = threading.Lock()
+
+def partitioning_enabled(engine: Engine) -> bool:
+    return settings.LOG_PARTITIONING and engine.dialect.name == 'postgresql'
+
+def partition_start(day: date) -> date:
+    """First day of the partition containing `day`"""
+    if settings.LOG_PARTITION_INTERVAL == 'week':
+        return day - timedelta(days=day.weekday())
+    return day
+
+def partition_step() -> timedelta:
+    return timedelta(weeks=1) if settings.LOG_PARTITION_INTERVAL == 'week' else timedelta(days=1)
+
+def partition_name(start: date) -> str:
+    return f"{PARTITION_PREFIX}{start:%Y%m%d}"
+
+def _period_bound(day: date) -> datetime:
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+def _utc_day(value: datetime) -> date:
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+def create_tables(engine: Engine) -> None:
+    """Create all tables, making log_entries range-partitioned on PostgreSQL.
+
+    An existing non-partitioned log_entries table is left as it is.
+    """
+    if partitioning_enabled(engine) and not inspect(engine).has_table(TABLE):
+        Base.metadata.create_all(
+            bind=engine,
+            tables=[t for t in Base.metadata.sorted_tables if t.name != TABLE],
+        )
+        with engine.begin() as conn:
+            conn.execute(text(PARTITIONED_TABLE_DDL))
+            # Indexes on the parent cascade to every partition
+            for index in LogEntry.__table__.indexes:
+                index.create(bind=conn)
+            for statement in POSTGRES_TEXT_INDEXES:
+                conn.execute(text(statement))
+            conn.execute(text(f"CREATE TABLE {TABLE}_default PARTITION OF {TABLE} DEFAULT"))
+        ensure_future_partitions(engine)
+    Base.metadata.create_all(bind=engine)
+
+def ensure_partitions(engine: Engine, days: Iterable[date], limit: Optional[int] = None) -> List[str]:
+    """Create any missing partitions for the periods containing `days`.
+
+    At most `limit` creations are attempted; rows of periods left without a
+    partition go to the default one. Each partition is created in its own
+    short transaction. Returns the names of partitions this call created.
+    """
+    if not partitioning_enabled(engine):
+        return []
+    created = []
+    step = partition_step()
+    missing = sorted({partition_start(day) for day in days} - _known_partitions - _default_periods)
+    if limit is not None and len(missing) > limit:
+        logger.warning(
+            "Creating %d of %d missing partitions; rows from %s on go to the default partition",
+            limit, len(missing), missing[limit],
+        )
+        missing = missing[:limit]
+    for start in missing:
+        if _create_partition(engine, start, start + step):
+            created.append(partition_name(start))
+    return created
+
+def ensure_batch_partitions(engine: Engine, days: Iterable[date]) -> List[str]:
+    """Create partitions for the days an ingested batch covers.
+
+    Days older than `LOG_PARTITION_MAX_AGE_DAYS` or past the premade
+    partitions, typically bad timestamps or backfills, are left to the
+    default partition, as is anything past `LOG_PARTITION_MAX_NEW_PER_BATCH`
+    new partitions.
+    """
+    today = datetime.now(timezone.utc).date()
+    oldest = today - timedelta(days=settings.LOG_PARTITION_MAX_AGE_DAYS)
+    newest = today + partition_step() * settings.LOG_PARTITION_PREMAKE
+    return ensure_partitions(
+        engine,
+        [day for day in days if oldest <= day <= newest],
+        settings.LOG_PARTITION_MAX_NEW_PER_BATCH,
+    )
+
+def _create_partition(engine: Engine, start: date, end: date) -> bool:
+    name = partition_name(start)
+    default = f"{TABLE}_default"
+    with _lock:
+        if start in _known_partitions or start in _default_periods:
+            return False
+        try:
+            with engine.begin() as conn:
+                exists = conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar()
+                if not exists and conn.execute(text("SELECT to_regclass(:name)"), {"name": default}).scalar():
+                    occupied = conn.execute(
+                        text(f"SELECT 1 FROM {default} WHERE timestamp >= :start AND timestamp < :end LIMIT 1"),
+                        {"start": _period_bound(start), "end": _period_bound(end)},
+                    ).first()
+                    if occupied:
+                        logger.info("Rows from %s stay in the default partition, which already holds some", start)
+                        _default_periods.add(start)
+                        return False
+                if not exists:
+                    conn.execute(text(
+                        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {TABLE} "
+                        f"FOR VALUES FROM ('{start.isoformat()} 00:00:00+00') TO ('{end.isoformat()} 00:00:00+00')"
+                    ))
+        except DBAPIError:
+            # Another worker may have created it concurrently; anything else
+            # leaves the rows to the default partition
+            logger.warning("Could not create partition %s", name, exc_info=True)
+            return False
+        _known_partitions.add(start)
+        return not exists
+
+def forget_partition(start: date) -> None:
+    """Stop treating the partition starting at `start` as existing"""
+    with _lock:
+        _known_partitions.discard(start)
+
+def ensure_future_partitions(engine: Engine, ahead: Optional[int] = None) -> List[str]:
+    """Keep `LOG_PARTITION_PREMAKE` partitions ahead of the current time"""
+    ahead = settings.LOG_PARTITION_PREMAKE if ahead is None else ahead
+    today = datetime.now(timezone.utc).date()
+    step = partition_step()
+    return ensure_partitions(engine, [today + step * i for i in range(ahead + 1)])
+
+def list_partitions(engine: Engine) -> List[str]:
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "WHERE i.inhparent = to_regclass(:table) ORDER BY c.relname"
+        ), {"table": TABLE})
+        return [row[0] for row in rows]
+
+def drop_partitions_before(
+    db: Session,
+    cutoff: datetime,
+    before_drop: Optional[Callable[[Session, str], None]] = None,
+) -> List[str]:
+    """Drop whole partitions whose range ends at or before `cutoff`.
+
+    Replaces row-by-row deletes of old data: dropping a partition is a
+    catalog operation that takes the same time regardless of its size.
+    Each partition is passed to `before_drop` and dropped in one transaction
+    of its own. While `before_drop` runs, the partition is only locked
+    against writes, so searches go on; the exclusive lock the drop needs is
+    taken right before it.
+    """
+    engine = db.get_bind()
+    if not partitioning_enabled(engine):
+        return []
+    step = partition_step()
+    cutoff_day = _utc_day(cutoff)
+    dropped = []
+    for name in list_partitions(engine):
+        suffix = name[len(PARTITION_PREFIX):]
+        if not name.startswith(PARTITION_PREFIX) or not suffix.isdigit():
+            continue
+        start = datetime.strptime(suffix, '%Y%m%d').date()
+        if start + step > cutoff_day:
+            continue
+        try:
+            if before_drop is not None:
+                db.execute(text(f"LOCK TABLE {name} IN SHARE MODE"))
+                before_drop(db, name)
+            db.execute(text(f"DROP TABLE {name}"))
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        forget_partition(start)
+        dropped.append(name)
+    return dropped
@@ -0,0 +1,177 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from passlib.context import CryptContext
+from starlette.concurrency import run_in_threadpool
+
+from ..config.settings import settings
+
+# Hashes made with other parameters verify, and are flagged for rehashing
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.BCRYPT_ROUNDS)
+
+class HasherBusy(Exception):
+    """The hashing queue is full; the caller should retry later"""
+
+def _init_worker(niceness: int) -> None:
+    # Let request handling win the CPU from hashing when both want it
+    if niceness and hasattr(os, 'nice'):
+        os.nice(niceness)
+
+def _timed(fn: Callable[..., Any], *args: Any) -> Tuple[float, float, Any]:
+    """Start time, duration and result of `fn(*args)`, measured where it runs"""
+    started = time.time()
+    result = fn(*args)
+    return started, time.time() - started, result
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify_and_update(password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed)
+
+class PasswordHasher:
+    """bcrypt hashing and verification in a dedicated, bounded process pool.
+
+    bcrypt is deliberately CPU-heavy; run in API workers, a burst of logins
+    starves every other request. Here at most `workers` hashes run at once,
+    in low-priority processes, and at most `max_pending` may be running or
+    queued: beyond that calls raise `HasherBusy` instead of queueing without
+    bound. With `workers=0` hashing runs in the calling thread, or the
+    threadpool for the async methods.
+    """
+    def __init__(self, workers: Optional[int] = None, max_pending: Optional[int] = None,
+                 niceness: Optional[int] = None):
+        self.workers = settings.PASSWORD_HASH_WORKERS if workers is None else workers
+        self.max_pending = max_pending or settings.PASSWORD_HASH_MAX_PENDING
+        self.niceness = settings.PASSWORD_HASH_NICE if niceness is None else niceness
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.stats = {
+            "submitted": 0, "completed": 0, "rejected": 0, "peak_pending": 0,
+            "queue_wait_seconds": 0.0, "max_queue_wait_seconds": 0.0, "hash_seconds": 0.0,
+        }
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # Spawned, not forked: the API process runs threads and an event loop
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(self.niceness,),
+                )
+            return self._executor
+
+    def _discard(self, executor: ProcessPoolExecutor) -> None:
+        """Drop a broken executor, so the next call starts a fresh one"""
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    def _admit(self) -> float:
+        with self._lock:
+            if self.pending >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise HasherBusy(f"{self.pending} password hashes already pending")
+            self.pending += 1
+            self.stats["submitted"] += 1
+            self.stats["peak_pending"] = max(self.stats["peak_pending"], self.pending)
+        return time.time()
+
+    def _finish(self, submitted: float, outcome: Optional[Tuple[float, float, Any]]) -> None:
+        with self._lock:
+            self.pending -= 1
+            if outcome is None:
+                return
+            started, duration, _ = outcome
+            wait = max(started - submitted, 0.0)
+            self.stats["completed"] += 1
+            self.stats["queue_wait_seconds"] += wait
+            self.stats["max_queue_wait_seconds"] = max(self.stats["max_queue_wait_seconds"], wait)
+            self.stats["hash_seconds"] += duration
+
+    def _submit(self, fn: Callable[..., Any], *args: Any) -> Future:
+        submitted = self._admit()
+        try:
+            executor = self.executor
+            try:
+                future = executor.submit(_timed, fn, *args)
+            except BrokenProcessPool:
+                # A worker died (OOM killer, SIGKILL) since the last call
+                self._discard(executor)
+                executor = self.executor
+                future = executor.submit(_timed, fn, *args)
+        except BaseException:
+            self._finish(submitted, None)
+            raise
+
+        def done(f: Future) -> None:
+            if not f.cancelled() and isinstance(f.exception(), BrokenProcessPool):
+                self._discard(executor)
+            self._finish(submitted, None if f.cancelled() or f.exception() else f.result())
+
+        future.add_done_callback(done)
+        return future
+
+    def _run(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if not self.workers:
+            submitted = self._admit()
+            outcome = None
+            try:
+                outcome = _timed(fn, *args)
+            finally:
+                self._finish(submitted, outcome)
+            return outcome[2]
+        try:
+            return self._submit(fn, *args).result()[2]
+        except BrokenProcessPool:
+            # Calls in flight when a worker dies fail; the pool is rebuilt
+            raise HasherBusy("Password hashing pool restarted")
+
+    async def _run_async(self, fn: Callable[..., Any], *args: Any) -> Any:
+        if not self.workers:
+            return await run_in_threadpool(self._run, fn, *args)
+        try:
+            return (await asyncio.wrap_future(self._submit(fn, *args)))[2]
+        except BrokenProcessPool:
+            raise HasherBusy("Password hashing pool restarted")
+
+    def hash(self, password: str) -> str:
+        return self._run(_hash, password)
+
+    def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """Whether `password` matches, and a new hash when `hashed` uses outdated parameters"""
+        return self._run(_verify_and_update, password, hashed)
+
+    async def hash_async(self, password: str) -> str:
+        return await self._run_async(_hash, password)
+
+    async def verify_and_update_async(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        return await self._run_async(_verify_and_update, password, hashed)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self.stats, pending=self.pending)
+        completed = stats["completed"]
+        stats["mean_queue_wait_seconds"] = round(stats["queue_wait_seconds"] / completed, 4) if completed else 0.0
+        stats["mean_hash_seconds"] = round(stats["hash_seconds"] / completed, 4) if completed else 0.0
+        stats.update(workers=self.workers, max_pending=self.max_pending)
+        return stats
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True)
+
+password_hasher = PasswordHasher()
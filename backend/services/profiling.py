@@ -0,0 +1,151 @@
+import cProfile
+import functools
+import glob
+import hmac
+import io
+import logging
+import marshal
+import os
+import pstats
+import re
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional
+
+from ..config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Profile kinds, each a directory under PROFILING_DIR: one file per request,
+# one directory of task profiles per upload
+REQUESTS = 'requests'
+UPLOADS = 'uploads'
+PROFILE_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+# cProfile replaces the thread's profiling hook, so profiles cannot nest.
+# Requests sharing the event loop thread would; while one is profiled, the
+# others run unprofiled.
+_active = threading.Lock()
+
+def _kind_dir(kind: str) -> str:
+    return os.path.join(settings.PROFILING_DIR, kind)
+
+def _prune(kind: str) -> None:
+    """Drop the oldest profiles of `kind` beyond PROFILING_MAX_PROFILES"""
+    with os.scandir(_kind_dir(kind)) as entries:
+        entries = sorted(entries, key=lambda entry: entry.stat().st_mtime)
+    for entry in entries[:max(len(entries) - settings.PROFILING_MAX_PROFILES, 0)]:
+        if entry.is_dir():
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            os.remove(entry.path)
+
+@contextmanager
+def profiling(kind: str, key: str, name: Optional[str] = None) -> Iterator[Optional[cProfile.Profile]]:
+    """Profile the block with cProfile and store the result under `kind`/`key`.
+
+    Yields None, profiling nothing, while another profile runs in this process.
+    """
+    if not _active.acquire(blocking=False):
+        yield None
+        return
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+    finally:
+        _active.release()
+        path = os.path.join(_kind_dir(kind), key)
+        if name is not None:
+            path = os.path.join(path, name)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            profiler.dump_stats(path + '.prof')
+            _prune(kind)
+        except OSError:
+            logger.exception("Could not store profile %s", path)
+
+def profile_upload_task(fn: Callable[..., Any]) -> Callable[..., Any]:
+    """Profile a bound upload task, taking `upload_id` first, when asked to.
+
+    Runs given `profile=True`, or every run when PROFILING_ENABLED, store
+    one profile per run in the upload's directory. `profile` is passed on so
+    the task can hand it to the tasks it starts.
+    """
+    @functools.wraps(fn)
+    def wrapper(self, upload_id: int, *args: Any, profile: bool = False, **kwargs: Any) -> Any:
+        if not (profile or settings.PROFILING_ENABLED):
+            return fn(self, upload_id, *args, profile=profile, **kwargs)
+        name = f"{time.strftime('%Y%m%dT%H%M%S')}-{fn.__name__}-{os.getpid()}-{uuid.uuid4().hex[:8]}"
+        with profiling(UPLOADS, str(upload_id), name):
+            return fn(self, upload_id, *args, profile=True, **kwargs)
+    return wrapper
+
+def profile_files(kind: str, key: str) -> List[str]:
+    """Stored profiles of a request id or upload id, oldest first"""
+    if not PROFILE_ID.match(key):
+        return []
+    if kind == REQUESTS:
+        path = os.path.join(_kind_dir(kind), key + '.prof')
+        return [path] if os.path.exists(path) else []
+    return sorted(glob.glob(os.path.join(_kind_dir(kind), key, '*.prof')))
+
+def render_profile(paths: List[str], sort: str = 'cumulative', limit: int = 50) -> str:
+    """pstats report of the profiles in `paths`, merged"""
+    stream = io.StringIO()
+    stats = pstats.Stats(*paths, stream=stream)
+    stats.sort_stats(sort).print_stats(limit)
+    return stream.getvalue()
+
+def merge_profiles(paths: List[str]) -> bytes:
+    """The profiles in `paths` merged into one file, readable by pstats and snakeviz"""
+    return marshal.dumps(pstats.Stats(*paths).stats)
+
+class ProfilingMiddleware:
+    """ASGI middleware profiling requests to PROFILING_PATHS on demand.
+
+    A request is profiled when PROFILING_ENABLED is set, or when it carries
+    PROFILING_KEY in its `X-Profile` header. Its profile is stored under the
+    id returned in the `X-Profile-Id` response header, which is also kept
+    in `request.state.profile_id`. With neither set up, requests pass
+    straight through.
+
+    Everything the event loop runs while the request is in flight is in its
+    profile, other requests' work included; work handed to other threads,
+    like archive scans, is not.
+    """
+    def __init__(self, app):
+        self.app = app
+        self.paths = tuple(settings.PROFILING_PATHS)
+        self.key = settings.PROFILING_KEY.encode() if settings.PROFILING_KEY else None
+
+    def _requested(self, scope) -> bool:
+        if not scope['path'].startswith(self.paths):
+            return False
+        if settings.PROFILING_ENABLED:
+            return True
+        for name, value in scope['headers']:
+            if name == b'x-profile':
+                return hmac.compare_digest(value, self.key)
+        return False
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not (self.key or settings.PROFILING_ENABLED) or not self._requested(scope):
+            return await self.app(scope, receive, send)
+        profile_id = uuid.uuid4().hex
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start' and profiler is not None:
+                message['headers'] = [*message.get('headers', []), (b'x-profile-id', profile_id.encode())]
+            await send(message)
+
+        with profiling(REQUESTS, profile_id) as profiler:
+            if profiler is not None:
+                scope.setdefault('state', {})['profile_id'] = profile_id
+            await self.app(scope, receive, send_wrapper)
@@ -0,0 +1,338 @@
+import hashlib
+import json
+import logging
+import threading
+import time
+from datetime import date, datetime, timezone
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from ..config.settings import settings
+from .cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "results:"
+# Sorted sets of "start|cache key" members, indexing each entry's time
+# window by its end and its expiry, so invalidation reads only entries
+# ending after the invalidated range starts
+RANGES_KEY = "results:range_ends"
+EXPIRY_KEY = "results:expiry"
+# Bumped by every invalidation, so a result computed across one is not stored
+GENERATION_KEY = "results:generation"
+_MISSING = object()
+
+class InMemoryRedis:
+    """Process-local stand-in for the few Redis commands the cache uses"""
+    def __init__(self):
+        self._values: Dict[str, Tuple[Optional[float], bytes]] = {}
+        self._sorted_sets: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bytes(value: Any) -> bytes:
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            item = self._values.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._values[key]
+                return None
+            return value
+
+    def set(self, key: str, value: Any, ex: Optional[int] = None) -> None:
+        with self._lock:
+            expires_at = time.monotonic() + ex if ex else None
+            self._values[key] = (expires_at, self._bytes(value))
+
+    def delete(self, *keys: str) -> int:
+        with self._lock:
+            return sum(
+                1 for key in keys
+                if self._values.pop(key, None) is not None or self._sorted_sets.pop(key, None) is not None
+            )
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            expires_at, value = self._values.get(key, (None, b'0'))
+            value = int(value) + 1
+            self._values[key] = (expires_at, self._bytes(value))
+            return value
+
+    def zadd(self, name: str, mapping: Dict[str, float]) -> None:
+        with self._lock:
+            self._sorted_sets.setdefault(name, {}).update(mapping)
+
+    def zrem(self, name: str, *members: str) -> None:
+        with self._lock:
+            for member in members:
+                self._sorted_sets.get(name, {}).pop(member, None)
+
+    def zrangebyscore(self, name: str, min: Any, max: Any) -> List[bytes]:
+        low, high = float(min), float(max)
+        with self._lock:
+            members = self._sorted_sets.get(name, {}).items()
+            return [m.encode() for m, score in sorted(members, key=lambda item: item[1]) if low <= score <= high]
+
+def _epoch(value: Optional[datetime]) -> Optional[float]:
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Cannot cache value of type {type(value).__name__}")
+
+def _starts_before(member: str, end: Optional[float]) -> bool:
+    """Whether a "start|cache key" index member's window starts by `end`"""
+    entry_start = member.split('|', 1)[0]
+    return not entry_start or end is None or float(entry_start) <= end
+
+class ResultCache:
+    """Two-level cache for query results, invalidated by time range.
+
+    Each entry records the `[start_time, end_time]` window its query covered
+    (None meaning unbounded). `invalidate_range` drops exactly the entries
+    whose window overlaps newly written rows. Redis is the shared,
+    authoritative level; the in-process LRU in front of it keeps entries only
+    for `RESULT_CACHE_LOCAL_TTL` seconds, which bounds how long other
+    processes can serve a result after it was invalidated. Redis errors
+    degrade to local-only caching.
+
+    Every invalidation bumps a generation counter, locally and in Redis. A
+    result is only kept if the generation read before computing it is still
+    current after it was written, so a result computed from rows an
+    invalidation has since changed is never served.
+    """
+    def __init__(self, redis_url: Optional[str] = None, ttl: Optional[int] = None,
+                 local_ttl: Optional[int] = None, local_size: Optional[int] = None):
+        self.ttl = ttl or settings.RESULT_CACHE_TTL
+        if settings.READ_REPLICA_URL:
+            # Results come from the replica, which may not have replayed the
+            # writes behind the last invalidation yet
+            self.ttl = min(self.ttl, settings.RESULT_CACHE_REPLICA_TTL)
+        self.local = TTLCache(
+            maxsize=local_size or settings.RESULT_CACHE_LOCAL_SIZE,
+            ttl=settings.RESULT_CACHE_LOCAL_TTL if local_ttl is None else local_ttl,
+        )
+        self.redis = self._connect(settings.RESULT_CACHE_REDIS_URL if redis_url is None else redis_url)
+        self.stats = {"local_hits": 0, "redis_hits": 0, "misses": 0, "invalidations": 0, "discarded": 0, "errors": 0}
+        self._stats_lock = threading.Lock()
+        self._local_generation = 0
+
+    @staticmethod
+    def _connect(redis_url: str):
+        if not redis_url:
+            return None
+        if redis_url == "memory://":
+            return InMemoryRedis()
+        try:
+            import redis
+        except ImportError:
+            logger.warning("redis is not installed; result cache is process-local")
+            return None
+        return redis.Redis.from_url(redis_url)
+
+    def _count(self, stat: str) -> None:
+        with self._stats_lock:
+            self.stats[stat] += 1
+
+    @staticmethod
+    def make_key(namespace: str, params: Dict[str, Any]) -> str:
+        """Stable key for a namespace and its normalized parameters"""
+        normalized = {k: v for k, v in params.items() if v is not None}
+        digest = hashlib.sha1(json.dumps(normalized, sort_keys=True, default=_json_default).encode()).hexdigest()
+        return f"{KEY_PREFIX}{namespace}:{digest}"
+
+    def get_or_compute(
+        self,
+        namespace: str,
+        params: Dict[str, Any],
+        compute: Callable[[], Any],
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+    ) -> Any:
+        """Return the cached result for `params`, computing it on a miss.
+
+        Results must be JSON-serializable; they are returned as decoded JSON.
+        """
+        key = self.make_key(namespace, params)
+        value = self._lookup(key)
+        if value is _MISSING:
+            generation = self._generation()
+            value = self._store(key, compute(), start_time, end_time, generation)
+        return value
+
+    async def get_or_compute_async(
+        self,
+        namespace: str,
+        params: Dict[str, Any],
+        compute: Callable[[], Awaitable[Any]],
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+    ) -> Any:
+        """`get_or_compute` for a coroutine function.
+
+        Local hits are served on the event loop; the blocking Redis calls
+        run in the threadpool.
+        """
+        key = self.make_key(namespace, params)
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            self._count("local_hits")
+            return value
+        value = await run_in_threadpool(self._redis_lookup, key)
+        if value is _MISSING:
+            generation = await run_in_threadpool(self._generation)
+            value = await run_in_threadpool(self._store, key, await compute(), start_time, end_time, generation)
+        return value
+
+    def _lookup(self, key: str) -> Any:
+        """Cached value for `key` from either level, or `_MISSING`"""
+        value = self.local.get(key, _MISSING)
+        if value is not _MISSING:
+            self._count("local_hits")
+            return value
+        return self._redis_lookup(key)
+
+    def _redis_lookup(self, key: str) -> Any:
+        """Cached value for `key` from Redis, or `_MISSING`"""
+        if self.redis is not None:
+            try:
+                raw = self.redis.get(key)
+            except Exception:
+                self._count("errors")
+                raw = None
+            if raw is not None:
+                self._count("redis_hits")
+                value = json.loads(raw)
+                self.local.set(key, value)
+                return value
+
+        self._count("misses")
+        return _MISSING
+
+    def _generation(self) -> Tuple[int, Optional[bytes]]:
+        """The current invalidation generation, local and shared"""
+        shared = None
+        if self.redis is not None:
+            try:
+                shared = self.redis.get(GENERATION_KEY)
+            except Exception:
+                self._count("errors")
+        return self._local_generation, shared
+
+    def _store(
+        self,
+        key: str,
+        result: Any,
+        start_time: Optional[datetime],
+        end_time: Optional[datetime],
+        generation: Tuple[int, Optional[bytes]],
+    ) -> Any:
+        """Cache a computed result in both levels and return it as decoded JSON.
+
+        `generation` is the one read before computing `result`. If an
+        invalidation bumped it since, the result is returned uncached; if one
+        bumps it while the result is written, the entry is deleted again.
+        Invalidations bump the generation before deleting entries, so one
+        that runs after the final check deletes this entry itself.
+        """
+        value = json.loads(json.dumps(result, default=_json_default))
+        if self._generation() != generation:
+            self._count("discarded")
+            return value
+        self.local.set(key, value)
+        if self.redis is not None:
+            try:
+                start, end = _epoch(start_time), _epoch(end_time)
+                member = f"{'' if start is None else start}|{key}"
+                self.redis.zadd(RANGES_KEY, {member: float('inf') if end is None else end})
+                self.redis.zadd(EXPIRY_KEY, {member: time.time() + self.ttl})
+                self.redis.set(key, json.dumps(value), ex=self.ttl)
+            except Exception:
+                self._count("errors")
+        if self._generation() != generation:
+            self._count("discarded")
+            self.local.delete(key)
+            if self.redis is not None:
+                try:
+                    self.redis.delete(key)
+                except Exception:
+                    self._count("errors")
+        return value
+
+    def invalidate_range(self, start_time: Optional[datetime], end_time: Optional[datetime]) -> int:
+        """Drop every entry whose time window overlaps `[start_time, end_time]`"""
+        start, end = _epoch(start_time), _epoch(end_time)
+        with self._stats_lock:
+            self._local_generation += 1
+        self.local.clear()
+        if self.redis is None:
+            return 0
+        try:
+            self.redis.incr(GENERATION_KEY)
+            # Index members of entries Redis has already expired
+            expired = [m.decode() for m in self.redis.zrangebyscore(EXPIRY_KEY, '-inf', time.time())]
+            if expired:
+                self.redis.zrem(RANGES_KEY, *expired)
+                self.redis.zrem(EXPIRY_KEY, *expired)
+            candidates = self.redis.zrangebyscore(RANGES_KEY, '-inf' if start is None else start, '+inf')
+            members = [m.decode() for m in candidates if _starts_before(m.decode(), end)]
+            stale = [member.split('|', 1)[1] for member in members]
+            if stale:
+                self.redis.delete(*stale)
+                self.redis.zrem(RANGES_KEY, *members)
+                self.redis.zrem(EXPIRY_KEY, *members)
+        except Exception:
+            self._count("errors")
+            return 0
+        with self._stats_lock:
+            self.stats["invalidations"] += len(stale)
+        return len(stale)
+
+    def clear(self) -> int:
+        """Drop every entry"""
+        return self.invalidate_range(None, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self.stats)
+        lookups = stats["local_hits"] + stats["redis_hits"] + stats["misses"]
+        stats["hit_ratio"] = round((lookups - stats["misses"]) / lookups, 4) if lookups else 0.0
+        stats["local_entries"] = len(self.local)
+        return stats
+
+result_cache = ResultCache()
+
+def cached_result(
+    namespace: str,
+    params: Dict[str, Any],
+    compute: Callable[[], Any],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> Any:
+    """Serve `compute()` through the shared result cache when it is enabled"""
+    if not settings.RESULT_CACHE_ENABLED:
+        return compute()
+    return result_cache.get_or_compute(namespace, params, compute, start_time, end_time)
+
+async def cached_result_async(
+    namespace: str,
+    params: Dict[str, Any],
+    compute: Callable[[], Awaitable[Any]],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+) -> Any:
+    """`cached_result` for a coroutine function"""
+    if not settings.RESULT_CACHE_ENABLED:
+        return await compute()
+    return await result_cache.get_or_compute_async(namespace, params, compute, start_time, end_time)
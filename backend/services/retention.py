@@ -0,0 +1,118 @@
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, not_
+from sqlalchemy.orm import Session
+
+from ..config.settings import settings
+from ..crud.log_entry import delete_log_entries
+from ..crud.rollup import count_table_rows, remove_from_rollups
+from ..crud.template import prune_error_sketches
+from ..models.log_entry import LogEntry
+from .archive import expire_archive
+from .partitions import drop_partitions_before
+from .result_cache import result_cache
+
+logger = logging.getLogger(__name__)
+
+def retention_rules(
+    default_days: Optional[int] = None,
+    source_days: Optional[Dict[str, int]] = None,
+    level_days: Optional[Dict[str, int]] = None,
+) -> List[Tuple[str, int, Any]]:
+    """Expand the TTL settings into (name, days, scope condition) rules.
+
+    Scopes are disjoint: a level rule excludes sources that have their own
+    rule and the default excludes everything covered by a rule.
+    """
+    source_days = settings.RETENTION_SOURCE_DAYS if source_days is None else source_days
+    level_days = settings.RETENTION_LEVEL_DAYS if level_days is None else level_days
+    default_days = settings.RETENTION_DEFAULT_DAYS if default_days is None else default_days
+    levels = {level.upper(): days for level, days in level_days.items()}
+
+    rules = []
+    for source, days in source_days.items():
+        rules.append((f"source:{source}", days, LogEntry.source == source))
+    for level, days in levels.items():
+        scope = LogEntry.log_level == level
+        if source_days:
+            scope = and_(scope, not_(LogEntry.source.in_(list(source_days))))
+        rules.append((f"level:{level}", days, scope))
+    if default_days is not None:
+        excluded = []
+        if source_days:
+            excluded.append(LogEntry.source.in_(list(source_days)))
+        if levels:
+            excluded.append(LogEntry.log_level.in_(list(levels)))
+        scope = and_(*[not_(c) for c in excluded]) if excluded else None
+        rules.append(("default", default_days, scope))
+    return rules
+
+def apply_retention(db: Session, now: Optional[datetime] = None) -> Dict[str, Any]:
+    """Expire log entries according to the retention settings.
+
+    When a default TTL is set, partitions older than every TTL are dropped
+    whole; the remaining expired rows are deleted in bounded batches. The
+    same rules apply to the archive tier, whose files are deleted or
+    rewritten without their expired rows. Whatever goes is taken out of the
+    rollups too. Returns rows removed per rule, dropped partitions, archive
+    files removed and rewritten, and the time taken.
+    """
+    started = time.perf_counter()
+    now = now or datetime.now(timezone.utc)
+    rules = retention_rules()
+    report: Dict[str, Any] = {
+        "rows_deleted": 0, "rules": {}, "partitions_dropped": [],
+        "archives_removed": [], "archives_rewritten": [], "archive_rows_deleted": 0,
+    }
+
+    if settings.RETENTION_DEFAULT_DAYS is not None and rules:
+        # Nothing in a partition older than the longest TTL survives any rule
+        longest = max(days for _, days, _ in rules)
+        expired_before = now - timedelta(days=longest)
+        report["partitions_dropped"] = drop_partitions_before(
+            db, expired_before,
+            before_drop=lambda db, name: remove_from_rollups(db, count_table_rows(db, name)),
+        )
+        # Days with no surviving rows no longer need their top-errors sketch
+        prune_error_sketches(db, expired_before)
+        db.commit()
+
+    default_days = settings.RETENTION_DEFAULT_DAYS
+    try:
+        expired = expire_archive(
+            None if default_days is None else now - timedelta(days=default_days),
+            {source: now - timedelta(days=days) for source, days in settings.RETENTION_SOURCE_DAYS.items()},
+            {level.upper(): now - timedelta(days=days) for level, days in settings.RETENTION_LEVEL_DAYS.items()},
+            before_change=lambda counts: remove_from_rollups(db, counts),
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    report["archives_removed"] = expired["files_removed"]
+    report["archives_rewritten"] = expired["files_rewritten"]
+    report["archive_rows_deleted"] = expired["rows"]
+
+    for name, days, scope in rules:
+        condition = LogEntry.timestamp < now - timedelta(days=days)
+        if scope is not None:
+            condition = and_(condition, scope)
+        deleted = delete_log_entries(db, condition, settings.RETENTION_BATCH_SIZE)
+        report["rules"][name] = deleted
+        report["rows_deleted"] += deleted
+
+    if report["rows_deleted"] or report["partitions_dropped"] or report["archive_rows_deleted"]:
+        # Everything removed is older than the shortest TTL's cutoff
+        shortest = min(days for _, days, _ in rules)
+        result_cache.invalidate_range(None, now - timedelta(days=shortest))
+
+    report["duration_seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(
+        "Retention removed %d rows, %d partitions and %d archived rows in %.3fs",
+        report["rows_deleted"], len(report["partitions_dropped"]), report["archive_rows_deleted"],
+        report["duration_seconds"],
+    )
+    return report
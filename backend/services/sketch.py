@@ -0,0 +1,73 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+class SpaceSaving:
+    """Space-Saving heavy-hitter sketch (Metwally et al.) with weighted updates.
+
+    Tracks at most `capacity` items. An untracked item replaces the one with
+    the smallest count and inherits that count as its overestimation error,
+    so every reported count is within `error` above the true count, and any
+    item more frequent than total/capacity is guaranteed to be tracked.
+    """
+    def __init__(self, capacity: int, counters: Optional[Dict[str, List[int]]] = None):
+        self.capacity = capacity
+        # item -> [count, error]
+        self.counters: Dict[str, List[int]] = {k: list(v) for k, v in (counters or {}).items()}
+
+    def _min_count(self) -> int:
+        if len(self.counters) < self.capacity:
+            return 0
+        return min(count for count, _ in self.counters.values())
+
+    def offer(self, item: str, count: int = 1) -> None:
+        counter = self.counters.get(item)
+        if counter is not None:
+            counter[0] += count
+        elif len(self.counters) < self.capacity:
+            self.counters[item] = [count, 0]
+        else:
+            victim = min(self.counters, key=lambda k: self.counters[k][0])
+            floor = self.counters.pop(victim)[0]
+            self.counters[item] = [floor + count, floor]
+
+    def discount(self, item: str, count: int) -> None:
+        """Remove `count` occurrences of a deleted item.
+
+        Deletions are not part of the Space-Saving model, so this only lowers
+        the tracked count; it is exact for items that were never evicted.
+        """
+        counter = self.counters.get(item)
+        if counter is None:
+            return
+        counter[0] -= count
+        if counter[0] <= 0:
+            del self.counters[item]
+
+    def merge(self, other: "SpaceSaving") -> "SpaceSaving":
+        """Combine two sketches, keeping the `capacity` largest counters.
+
+        An item missing from a full sketch may have occurred up to that
+        sketch's smallest count, which is added to both count and error.
+        """
+        own_floor, other_floor = self._min_count(), other._min_count()
+        merged: Dict[str, List[int]] = {}
+        for item in set(self.counters) | set(other.counters):
+            own = self.counters.get(item, [own_floor, own_floor])
+            theirs = other.counters.get(item, [other_floor, other_floor])
+            merged[item] = [own[0] + theirs[0], own[1] + theirs[1]]
+        capacity = max(self.capacity, other.capacity)
+        top = sorted(merged.items(), key=lambda kv: kv[1][0], reverse=True)[:capacity]
+        return SpaceSaving(capacity, dict(top))
+
+    def top(self, n: int) -> List[Tuple[str, int, int]]:
+        """The `n` heaviest items as (item, count, error), largest first"""
+        ranked = sorted(self.counters.items(), key=lambda kv: kv[1][0], reverse=True)[:n]
+        return [(item, count, error) for item, (count, error) in ranked]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"capacity": self.capacity, "counters": self.counters}
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]], capacity: int) -> "SpaceSaving":
+        if not data:
+            return cls(capacity)
+        return cls(data.get("capacity", capacity), data.get("counters"))
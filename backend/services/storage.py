@@ -0,0 +1,94 @@
+import hashlib
+import os
+from typing import Optional, Tuple
+
+from fastapi import HTTPException, UploadFile, status
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
+
+from ..config.settings import settings
+
+# Room for the multipart boundaries and form fields around the file
+MULTIPART_OVERHEAD_BYTES = 64 * 1024
+
+class RequestSizeLimitMiddleware:
+    """ASGI middleware capping request bodies at `MAX_UPLOAD_BYTES` plus form overhead.
+
+    Starlette spools a multipart upload to a temporary file before the
+    endpoint runs, so the endpoint's own check comes after the whole body
+    was received. Here a declared Content-Length over the limit is answered
+    with 413 before any of the body is read, and a body that grows past it
+    is cut off with 413 as it streams in.
+    """
+    def __init__(self, app, max_bytes: Optional[int] = None):
+        self.app = app
+        self.max_bytes = (max_bytes or settings.MAX_UPLOAD_BYTES) + MULTIPART_OVERHEAD_BYTES
+
+    def _too_large(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Request body exceeds the maximum upload size of {self.max_bytes - MULTIPART_OVERHEAD_BYTES} bytes",
+        )
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+        for name, value in scope['headers']:
+            if name == b'content-length' and value.isdigit() and int(value) > self.max_bytes:
+                error = self._too_large()
+                response = JSONResponse({"detail": error.detail}, status_code=error.status_code)
+                return await response(scope, receive, send)
+        received = 0
+
+        async def receive_wrapper():
+            nonlocal received
+            message = await receive()
+            if message['type'] == 'http.request':
+                received += len(message.get('body', b''))
+                if received > self.max_bytes:
+                    # Raised inside body parsing, which lets HTTPException through
+                    raise self._too_large()
+            return message
+
+        await self.app(scope, receive_wrapper, send)
+
+async def save_upload_file(
+    file: UploadFile,
+    file_path: str,
+    max_bytes: Optional[int] = None,
+    chunk_bytes: Optional[int] = None,
+) -> Tuple[int, str]:
+    """Stream an uploaded file to disk in fixed-size chunks.
+
+    Disk writes run in the threadpool so the event loop is never blocked, and
+    only one chunk is held in memory. Returns the size in bytes and the
+    SHA-256 hex digest computed while streaming. Raises 413 and removes the
+    partial file once the upload exceeds `max_bytes`; `RequestSizeLimitMiddleware`
+    rejects oversized requests before they are spooled.
+    """
+    max_bytes = max_bytes or settings.MAX_UPLOAD_BYTES
+    chunk_bytes = chunk_bytes or settings.UPLOAD_CHUNK_BYTES
+    checksum = hashlib.sha256()
+    size = 0
+
+    buffer = await run_in_threadpool(open, file_path, "wb")
+    try:
+        while True:
+            chunk = await file.read(chunk_bytes)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail=f"File exceeds the maximum upload size of {max_bytes} bytes"
+                )
+            checksum.update(chunk)
+            await run_in_threadpool(buffer.write, chunk)
+    except BaseException:
+        await run_in_threadpool(buffer.close)
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
+    await run_in_threadpool(buffer.close)
+    return size, checksum.hexdigest()
@@ -0,0 +1,41 @@
+import hashlib
+import re
+from typing import Dict, Iterable, List, Tuple
+
+# Variable parts of a message, most specific first; one alternation keeps
+# templating to a single pass over the message
+VARIABLE_PATTERN = re.compile(
+    r'(?P<UUID>\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b)'
+    r'|(?P<IP>\b(?:\d{1,3}\.){3}\d{1,3}(?::\d+)?\b)'
+    r'|(?P<HEX>\b0x[0-9a-fA-F]+\b|\b(?=[0-9a-fA-F]*\d)(?=[0-9a-fA-F]*[a-fA-F])[0-9a-fA-F]{16,}\b)'
+    r'|(?P<NUM>(?<![\w.])\d+(?:\.\d+)*)'
+)
+
+def template_message(message: str) -> str:
+    """Mask UUIDs, IP addresses, hex ids and numbers in a log message.
+
+    Messages that only differ in those values share a template, e.g.
+    "Timeout after 30s from 10.0.0.7" -> "Timeout after <NUM>s from <IP>".
+    """
+    return VARIABLE_PATTERN.sub(lambda match: f'<{match.lastgroup}>', message)
+
+def template_id(template: str) -> str:
+    """Stable 16-character id of a template"""
+    return hashlib.blake2b(template.encode('utf-8', 'replace'), digest_size=8).hexdigest()
+
+def templatize(message: str) -> Tuple[str, str]:
+    """(template id, template) of a log message"""
+    template = template_message(message)
+    return template_id(template), template
+
+def templatize_all(messages: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """Template ids and templates of many messages, templating repeats once"""
+    seen: Dict[str, Tuple[str, str]] = {}
+    ids, templates = [], []
+    for message in messages:
+        result = seen.get(message)
+        if result is None:
+            result = seen[message] = templatize(message)
+        ids.append(result[0])
+        templates.append(result[1])
+    return ids, templates
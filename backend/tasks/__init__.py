@@ -1,62 +1,153 @@
-from celery import shared_task
+from celery import chord, shared_task
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 from datetime import datetime
+from typing import List
 import os
 
-from ..services.database import SessionLocal
+from ..config.settings import settings
+from ..services.database import IngestSessionLocal, SessionLocal, engine
+from ..services.partitions import ensure_future_partitions
+from ..services.retention import apply_retention
+from ..services.archive import archive_cold_data
+from ..services.result_cache import result_cache
 from ..models.upload import Upload
 from ..models.log_entry import LogEntry
-from ..services.log_parser import LogParserFactory
+from ..services.ingestion import detect_file_format, ingest_file, split_file
 from ..crud.upload import update_upload_status
-from ..crud.log_entry import bulk_create_log_entries
+from ..crud.rollup import backfill_rollups, rollup_upload
+from ..services.metrics import INGEST_STAGE_SECONDS
+from ..services.profiling import profile_upload_task
+
+def _set_upload_status(db: Session, upload_id: int, status: str, **kwargs):
+    """`update_upload_status`, timed as the ingestion status stage"""
+    with INGEST_STAGE_SECONDS.labels('status').time():
+        return update_upload_status(db, upload_id, status, **kwargs)
 
 @shared_task(bind=True, max_retries=3)
-def process_upload(self, upload_id: int, file_path: str):
-    """Process uploaded log file in the background"""
-    db = SessionLocal()
+@profile_upload_task
+def process_upload(self, upload_id: int, file_path: str, profile: bool = False):
+    """Process uploaded log file in the background.
+
+    Files larger than `INGEST_CHUNK_BYTES` are split into line-aligned byte
+    ranges parsed by parallel `process_upload_chunk` tasks; a chord callback
+    marks the upload completed once every chunk has committed. With
+    `profile`, this task and its chunk tasks store cProfile profiles for the
+    upload.
+    """
+    db = IngestSessionLocal()
     try:
         # Update status to processing
-        update_upload_status(db, upload_id, "processing")
+        _set_upload_status(db, upload_id, "processing")
         
-        # Read and parse the file
-        with open(file_path, 'r') as f:
-            lines = f.readlines()
-        
-        # Detect log format and get appropriate parser
-        log_format = LogParserFactory.detect_format(lines)
+        # Detect the format once so every chunk uses the same parser
+        log_format = detect_file_format(file_path)
         if not log_format:
             raise ValueError("Could not detect log format")
         
-        parser = LogParserFactory.get_parser(log_format)
-        
-        # Parse logs
-        parsed_logs = []
-        for line in lines:
-            log_entry = parser.parse_line(line.strip())
-            if log_entry:
-                log_entry['upload_id'] = upload_id
-                parsed_logs.append(log_entry)
+        ranges = split_file(file_path, settings.INGEST_CHUNK_BYTES)
+        if len(ranges) > 1:
+            chord(
+                process_upload_chunk.s(upload_id, file_path, log_format, start, end, profile=profile)
+                for start, end in ranges
+            )(finalize_upload.s(upload_id, file_path))
+            return {"status": "dispatched", "chunks": len(ranges)}
         
-        # Bulk insert logs
-        if parsed_logs:
-            bulk_create_log_entries(db, parsed_logs)
-        
-        # Update status to completed
-        update_upload_status(db, upload_id, "completed", completed=True)
-        
-        # Clean up the file
-        try:
-            os.remove(file_path)
-        except OSError:
-            pass
-            
-        return {"status": "success", "logs_processed": len(parsed_logs)}
+        # Stream, parse and insert the file batch by batch
+        logs_processed = ingest_file(db, upload_id, file_path, log_format=log_format)
+        return finalize_upload([logs_processed], upload_id, file_path)
         
     except Exception as e:
+        # Discard the uncommitted batch; committed batches stay checkpointed
+        db.rollback()
         # Update status to failed
-        update_upload_status(db, upload_id, f"failed: {str(e)}")
+        _set_upload_status(db, upload_id, f"failed: {str(e)}")
         # Re-raise for Celery to handle retries
         raise self.retry(exc=e, countdown=60 * 5)  # Retry after 5 minutes
         
     finally:
         db.close()
+
+@shared_task(bind=True, max_retries=3)
+@profile_upload_task
+def process_upload_chunk(self, upload_id: int, file_path: str, log_format: str, start: int, end: int,
+                         profile: bool = False):
+    """Parse and insert the lines of one `[start, end)` byte range of an upload.
+
+    Retries resume from the range's last checkpoint.
+    """
+    db = IngestSessionLocal()
+    try:
+        return ingest_file(db, upload_id, file_path, log_format=log_format, start=start, end=end)
+    except Exception as e:
+        db.rollback()
+        if self.request.retries >= self.max_retries:
+            _set_upload_status(db, upload_id, f"failed: chunk {start}-{end}: {str(e)}")
+        raise self.retry(exc=e, countdown=60 * 5)
+    finally:
+        db.close()
+
+@shared_task
+def finalize_upload(chunk_counts: List[int], upload_id: int, file_path: str):
+    """Mark an upload completed after all of its rows have committed"""
+    db = IngestSessionLocal()
+    try:
+        # Fold the new rows into the analytics rollups; results computed
+        # from the rollups before then no longer hold
+        if rollup_upload(db, upload_id):
+            first, last = db.query(func.min(LogEntry.timestamp), func.max(LogEntry.timestamp)).filter(
+                LogEntry.upload_id == upload_id
+            ).one()
+            if first is not None:
+                result_cache.invalidate_range(first, last)
+        # Update status to completed
+        _set_upload_status(db, upload_id, "completed", completed=True)
+    finally:
+        db.close()
+    
+    # Clean up the file
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
+    
+    return {"status": "success", "logs_processed": sum(chunk_counts)}
+
+@shared_task
+def maintain_log_partitions():
+    """Create upcoming log_entries partitions ahead of incoming data"""
+    created = ensure_future_partitions(engine)
+    return {"created": created}
+
+@shared_task
+def enforce_retention():
+    """Expire log entries past their retention period"""
+    db = SessionLocal()
+    try:
+        return apply_retention(db)
+    finally:
+        db.close()
+
+@shared_task
+def backfill_upload_rollups():
+    """Roll up completed uploads missing from the analytics rollups"""
+    db = SessionLocal()
+    try:
+        rolled_up = backfill_rollups(db, settings.ROLLUP_BACKFILL_BATCH)
+    finally:
+        db.close()
+    if rolled_up:
+        # Rollup-served results computed without these uploads are short
+        result_cache.clear()
+    return {"rolled_up": rolled_up}
+
+@shared_task
+def archive_cold_logs():
+    """Move log entries older than the hot window to Parquet archive files"""
+    if not settings.ARCHIVE_ENABLED:
+        return {"status": "disabled"}
+    db = SessionLocal()
+    try:
+        return archive_cold_data(db)
+    finally:
+        db.close()
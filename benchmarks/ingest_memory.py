@@ -0,0 +1,94 @@
+"""Peak RSS of upload ingestion against input file size.
+
+Each measurement runs in a fresh subprocess so ``ru_maxrss`` reflects only
+that run. ``streaming`` is the batched pipeline used by ``process_upload``;
+``eager`` reproduces the old readlines + single bulk insert behaviour.
+
+    python benchmarks/ingest_memory.py --lines 100000 500000 1000000
+"""
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APACHE_LINE = (
+    '192.168.1.{octet} - - [10/Oct/2023:13:{minute:02d}:{second:02d} +0000] '
+    '"GET /api/items/{n} HTTP/1.1" {status} {size} "-" "Mozilla/5.0"\n'
+)
+
+def write_log(path: str, lines: int) -> None:
+    with open(path, 'w') as f:
+        for n in range(lines):
+            f.write(APACHE_LINE.format(
+                octet=n % 255,
+                minute=(n // 60) % 60,
+                second=n % 60,
+                n=n,
+                status=500 if n % 17 == 0 else 200,
+                size=n % 5000,
+            ))
+
+def run_child(mode: str, log_path: str, db_path: str) -> None:
+    os.environ['DATABASE_URL'] = f'sqlite:///{db_path}'
+    sys.path.insert(0, ROOT)
+
+    from backend.services.database import Base, SessionLocal, engine
+    from backend.models import log_entry, upload, user  # noqa: F401  register tables
+    from backend.services.ingestion import ingest_file
+    from backend.services.log_parser import LogParserFactory
+    from backend.crud.log_entry import bulk_create_log_entries
+
+    Base.metadata.create_all(bind=engine)
+    db = SessionLocal()
+    start = time.perf_counter()
+    if mode == 'streaming':
+        rows = ingest_file(db, 1, log_path)
+    else:
+        with open(log_path, 'r') as f:
+            lines = f.readlines()
+        parser = LogParserFactory.get_parser(LogParserFactory.detect_format(lines))
+        parsed = []
+        for line in lines:
+            entry = parser.parse_line(line.strip())
+            if entry:
+                entry['upload_id'] = 1
+                parsed.append(entry)
+        bulk_create_log_entries(db, parsed)
+        rows = len(parsed)
+    elapsed = time.perf_counter() - start
+    db.close()
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(f'{rows} {elapsed:.3f} {peak_kb}')
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, nargs='+', default=[50_000, 200_000, 800_000])
+    parser.add_argument('--modes', nargs='+', default=['eager', 'streaming'])
+    parser.add_argument('--child', nargs=3, metavar=('MODE', 'LOG', 'DB'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    print(f"{'mode':<10} {'lines':>10} {'file MB':>8} {'rows':>10} {'secs':>8} {'peak RSS MB':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for lines in args.lines:
+            log_path = os.path.join(tmp, f'access_{lines}.log')
+            write_log(log_path, lines)
+            file_mb = os.path.getsize(log_path) / 2**20
+            for mode in args.modes:
+                db_path = os.path.join(tmp, f'{mode}_{lines}.db')
+                out = subprocess.run(
+                    [sys.executable, __file__, '--child', mode, log_path, db_path],
+                    check=True, capture_output=True, text=True,
+                ).stdout.split()
+                rows, secs, peak_kb = int(out[0]), float(out[1]), int(out[2])
+                print(f'{mode:<10} {lines:>10} {file_mb:>8.1f} {rows:>10} {secs:>8.2f} {peak_kb / 1024:>12.1f}')
+
+if __name__ == '__main__':
+    main()
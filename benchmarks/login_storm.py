@@ -0,0 +1,135 @@
+"""Search latency while a login storm runs: inline bcrypt vs the hashing pool.
+
+``--search-clients`` clients page through log entries on an async route
+while ``--login-clients`` clients log in without pause. ``inline`` is a sync
+login route verifying bcrypt in the request threadpool; ``pool`` is an async
+route verifying through ``PasswordHasher``, whose few low-priority processes
+cap the CPU logins can take and shed logins past ``--max-pending`` with
+HTTP 503. A run without logins gives the baseline.
+
+    python benchmarks/login_storm.py --seconds 10 --login-clients 64 --rounds 12
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+def build_app(database_url: str, hasher, password_hash: str):
+    from fastapi import Depends, FastAPI, HTTPException
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+    from backend.crud import log_entry as log_entry_crud
+    from backend.services.database import async_database_url
+    from backend.services.password_hasher import HasherBusy, pwd_context
+
+    engine = create_async_engine(async_database_url(database_url))
+    AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
+    app = FastAPI()
+
+    async def get_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    @app.get('/search')
+    async def search(db: AsyncSession = Depends(get_db)):
+        logs = await log_entry_crud.get_log_entries_async(db, limit=50, log_level='INFO')
+        return [{'id': log.id, 'message': log.message} for log in logs]
+
+    @app.post('/login/inline')
+    def login_inline():
+        if not pwd_context.verify('correct horse', password_hash):
+            raise HTTPException(status_code=401)
+        return {}
+
+    @app.post('/login/pool')
+    async def login_pool():
+        try:
+            valid, _ = await hasher.verify_and_update_async('correct horse', password_hash)
+        except HasherBusy:
+            raise HTTPException(status_code=503)
+        if not valid:
+            raise HTTPException(status_code=401)
+        return {}
+
+    return app
+
+async def storm(app, login_path, search_clients: int, login_clients: int, seconds: float):
+    """Search latencies and login outcome counts over `seconds` of load"""
+    import httpx
+
+    transport = httpx.ASGITransport(app=app)
+    latencies, logins = [], {'ok': 0, 'shed': 0}
+    deadline = time.perf_counter() + seconds
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        await client.get('/search')
+
+        async def searcher():
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                (await client.get('/search')).raise_for_status()
+                latencies.append(time.perf_counter() - start)
+
+        async def login_client():
+            while time.perf_counter() < deadline:
+                response = await client.post(login_path)
+                if response.status_code == 503:
+                    logins['shed'] += 1
+                    await asyncio.sleep(0.05)
+                else:
+                    response.raise_for_status()
+                    logins['ok'] += 1
+
+        tasks = [searcher() for _ in range(search_clients)]
+        if login_path:
+            tasks += [login_client() for _ in range(login_clients)]
+        await asyncio.gather(*tasks)
+    return np.array(latencies) * 1000, logins
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--search-clients', type=int, default=8)
+    parser.add_argument('--login-clients', type=int, default=64)
+    parser.add_argument('--rounds', type=int, default=12, help='bcrypt cost factor')
+    parser.add_argument('--workers', type=int, default=2, help='hashing processes')
+    parser.add_argument('--max-pending', type=int, default=16)
+    parser.add_argument('--threads', type=int, default=40,
+                        help='request threadpool workers, as in a default FastAPI worker')
+    parser.add_argument('--rows', type=int, default=10_000)
+    args = parser.parse_args()
+
+    url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'login_storm.db')}"
+    os.environ.setdefault('DATABASE_URL', url)
+    os.environ['BCRYPT_ROUNDS'] = str(args.rounds)
+    from sqlalchemy import create_engine
+    from read_latency import seed
+    from backend.services.password_hasher import PasswordHasher, pwd_context
+
+    seed(create_engine(url), args.rows)
+    password_hash = pwd_context.hash('correct horse')
+    hasher = PasswordHasher(workers=args.workers, max_pending=args.max_pending)
+    # Start the pool's processes before timing
+    asyncio.run(hasher.hash_async('warm up'))
+
+    async def run(login_path):
+        import anyio.to_thread
+        anyio.to_thread.current_default_thread_limiter().total_tokens = args.threads
+        return await storm(build_app(url, hasher, password_hash), login_path,
+                           args.search_clients, args.login_clients, args.seconds)
+
+    print(f"{args.search_clients} search clients, {args.login_clients} login clients, "
+          f"bcrypt rounds {args.rounds}, {os.cpu_count()} CPUs, {args.seconds:.0f}s per run")
+    print(f"{'logins':<9} {'searches':>9} {'p50 ms':>9} {'p99 ms':>9} {'logins/s':>9} {'shed':>6}")
+    for name, path in (('none', None), ('inline', '/login/inline'), ('pool', '/login/pool')):
+        latencies, logins = asyncio.run(run(path))
+        print(f"{name:<9} {len(latencies):>9} {np.percentile(latencies, 50):>9.1f} "
+              f"{np.percentile(latencies, 99):>9.1f} {logins['ok'] / args.seconds:>9.1f} {logins['shed']:>6}")
+    hasher.shutdown()
+
+if __name__ == '__main__':
+    main()
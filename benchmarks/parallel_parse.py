@@ -0,0 +1,63 @@
+"""Parse throughput of chunked ingestion vs worker count.
+
+Splits one file with ``split_file`` at ``INGEST_CHUNK_BYTES``, the ranges
+``process_upload`` fans out one task per range, and runs ``parse_batches``
+(column batches plus templatizing) over each range in a ProcessPoolExecutor
+worker, database inserts excluded. The speedup is bounded by the number of
+chunks, as it is for ingestion; pass ``--chunk-bytes`` to try other splits.
+
+    python benchmarks/parallel_parse.py --lines 2000000 --workers 1 2 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.config.settings import settings
+from backend.services.compression import open_log_file
+from backend.services.ingestion import LineReader, parse_batches, split_file
+from backend.services.log_parser import LogParserFactory
+
+from ingest_memory import write_log
+
+def parse_range(args):
+    file_path, log_format, start, end, batch_size = args
+    parser = LogParserFactory.get_parser(log_format)
+    parsed = 0
+    with open_log_file(file_path) as f:
+        for batch in parse_batches(parser, LineReader(f, start, end), 0, batch_size):
+            parsed += len(batch)
+    return parsed
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=1_000_000)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, os.cpu_count() or 1])
+    parser.add_argument('--chunk-bytes', type=int, default=settings.INGEST_CHUNK_BYTES)
+    parser.add_argument('--batch-size', type=int, default=settings.INGEST_BATCH_SIZE)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        log_path = os.path.join(tmp, 'access.log')
+        write_log(log_path, args.lines)
+        ranges = split_file(log_path, args.chunk_bytes)
+        tasks = [(log_path, 'apache', start, end, args.batch_size) for start, end in ranges]
+
+        print(f'{len(ranges)} chunks of up to {args.chunk_bytes:,} bytes')
+        print(f"{'workers':>8} {'secs':>8} {'lines/sec':>12} {'speedup':>8}")
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                parsed = sum(pool.map(parse_range, tasks))
+            elapsed = time.perf_counter() - start
+            rate = parsed / elapsed
+            baseline = baseline or rate
+            print(f'{workers:>8} {elapsed:>8.2f} {rate:>12,.0f} {rate / baseline:>7.2f}x')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,95 @@
+"""Lines/sec of the Apache parser: legacy (re.match + strptime) vs current.
+
+Also checks that both parsers produce identical output for every line.
+
+    python benchmarks/parse_apache.py --lines 200000
+    python benchmarks/parse_apache.py --file /var/log/apache2/access.log
+"""
+import argparse
+import os
+import re
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.log_parser import ApacheLogParser
+
+class LegacyApacheLogParser:
+    """The per-line implementation ApacheLogParser replaced"""
+    PATTERN = ApacheLogParser.PATTERN
+
+    @classmethod
+    def parse_line(cls, line):
+        match = re.match(cls.PATTERN, line)
+        if match:
+            ip, timestamp_str, request, status, size, referer, user_agent = match.groups()
+            try:
+                timestamp = datetime.strptime(timestamp_str, '%d/%b/%Y:%H:%M:%S %z')
+                log_level = 'INFO' if int(status) < 400 else 'ERROR'
+                return {
+                    'timestamp': timestamp,
+                    'log_level': log_level,
+                    'source': 'apache',
+                    'message': request,
+                    'additional_fields': {
+                        'ip': ip,
+                        'status': int(status),
+                        'size': int(size),
+                        'referer': referer,
+                        'user_agent': user_agent
+                    }
+                }
+            except (ValueError, TypeError):
+                return None
+        return None
+
+def generate_lines(count: int, lines_per_second: int):
+    start = datetime(2023, 10, 10, 13, 0, 0, tzinfo=timezone(timedelta(hours=-7)))
+    for n in range(count):
+        ts = (start + timedelta(seconds=n // lines_per_second)).strftime('%d/%b/%Y:%H:%M:%S %z')
+        status = 500 if n % 17 == 0 else 200
+        yield (
+            f'10.0.{n % 255}.{n % 7} - - [{ts}] "GET /api/items/{n} HTTP/1.1" '
+            f'{status} {n % 5000} "-" "Mozilla/5.0 (X11; Linux x86_64)"'
+        )
+
+def measure(parser, lines, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            parser.parse_line(line)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=100_000)
+    parser.add_argument('--lines-per-second', type=int, default=20,
+                        help='generated lines sharing one timestamp')
+    parser.add_argument('--file', help='parse this file instead of generated lines')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, 'r') as f:
+            lines = [line.strip() for line in f]
+    else:
+        lines = list(generate_lines(args.lines, args.lines_per_second))
+
+    mismatches = sum(
+        1 for line in lines
+        if LegacyApacheLogParser.parse_line(line) != ApacheLogParser.parse_line(line)
+    )
+    print(f'{len(lines)} lines, {mismatches} output mismatches')
+
+    legacy = measure(LegacyApacheLogParser, lines, args.repeat)
+    current = measure(ApacheLogParser, lines, args.repeat)
+    print(f"{'parser':<10} {'lines/sec':>12}")
+    print(f"{'legacy':<10} {legacy:>12,.0f}")
+    print(f"{'current':<10} {current:>12,.0f}  ({current / legacy:.2f}x)")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,88 @@
+"""Lines/sec from raw Apache lines to COPY text: per-line dicts vs column batches.
+
+``per-line`` is ``ApacheLogParser.parse_line`` into dicts encoded by
+``CopyStream``; ``batch`` is ``ApacheLogParser.parse_batch`` into column
+arrays encoded by ``encode_copy_columns``. Both stop short of the database,
+so only parsing and encoding are timed. Also checks that both paths yield
+the same entries.
+
+    python benchmarks/parse_batch.py --lines 200000 --batch-size 5000
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parse_apache import generate_lines
+from backend.crud.log_entry import CopyStream, encode_copy_columns
+from backend.services.ingestion import batched
+from backend.services.log_parser import ApacheLogParser
+from backend.services.templating import templatize_all
+
+def per_line(lines, batch_size: int, upload_id: int = 1) -> int:
+    size = 0
+    for block in batched(lines, batch_size):
+        rows = []
+        for line in block:
+            entry = ApacheLogParser.parse_line(line)
+            if entry:
+                entry['upload_id'] = upload_id
+                rows.append(entry)
+        ids, _ = templatize_all(row['message'] for row in rows)
+        for row, template_id in zip(rows, ids):
+            row['template_id'] = template_id
+        size += len(CopyStream(rows).read())
+    return size
+
+def columnar(lines, batch_size: int, upload_id: int = 1) -> int:
+    size = 0
+    for block in batched(lines, batch_size):
+        batch = ApacheLogParser.parse_batch(block)
+        batch.upload_id = upload_id
+        batch.template_ids, batch.templates = templatize_all(batch.messages)
+        size += len(encode_copy_columns(batch))
+    return size
+
+def mismatches(lines) -> int:
+    expected = [entry for entry in map(ApacheLogParser.parse_line, lines) if entry]
+    actual = ApacheLogParser.parse_batch(lines).to_dicts()
+    if len(expected) != len(actual):
+        return abs(len(expected) - len(actual))
+    keys = ('timestamp', 'log_level', 'source', 'message', 'additional_fields')
+    return sum(1 for old, new in zip(expected, actual) if any(old[key] != new[key] for key in keys))
+
+def measure(path, lines, batch_size: int, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        path(lines, batch_size)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=200_000)
+    parser.add_argument('--lines-per-second', type=int, default=20,
+                        help='generated lines sharing one timestamp')
+    parser.add_argument('--batch-size', type=int, default=5000)
+    parser.add_argument('--file', help='parse this file instead of generated lines')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.file:
+        with open(args.file, 'r') as f:
+            lines = [line.strip() for line in f]
+    else:
+        lines = list(generate_lines(args.lines, args.lines_per_second))
+
+    print(f'{len(lines)} lines, {mismatches(lines)} entry mismatches')
+    baseline = measure(per_line, lines, args.batch_size, args.repeat)
+    batch = measure(columnar, lines, args.batch_size, args.repeat)
+    print(f"{'path':<10} {'lines/sec':>12}")
+    print(f"{'per-line':<10} {baseline:>12,.0f}")
+    print(f"{'batch':<10} {batch:>12,.0f}  ({batch / baseline:.2f}x)")
+
+if __name__ == '__main__':
+    main()
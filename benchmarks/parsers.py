@@ -0,0 +1,91 @@
+"""Lines/sec for every registered log parser, plus format detection cost.
+
+Each format gets generated sample lines; parsers are timed on their own
+format and ``detect_format`` is timed on a sample of each.
+
+    python benchmarks/parsers.py --lines 100000
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backend.services.log_parser import PARSERS, LogParserFactory
+
+LEVELS = ('DEBUG', 'INFO', 'INFO', 'INFO', 'WARNING', 'ERROR')
+
+def _timestamps(count: int):
+    start = datetime(2025, 6, 5, 12, 0, 0, tzinfo=timezone.utc)
+    for n in range(count):
+        yield n, start + timedelta(milliseconds=50 * n)
+
+def apache_lines(count):
+    for n, ts in _timestamps(count):
+        yield (f'10.0.{n % 255}.{n % 7} - - [{ts:%d/%b/%Y:%H:%M:%S %z}] "GET /api/items/{n} HTTP/1.1" '
+               f'{500 if n % 17 == 0 else 200} {n % 5000} "-" "Mozilla/5.0"')
+
+def nginx_lines(count):
+    for n, ts in _timestamps(count):
+        yield (f'10.0.{n % 255}.{n % 7} - user{n % 3} [{ts:%d/%b/%Y:%H:%M:%S %z}] "GET /static/{n}.js HTTP/2.0" '
+               f'{404 if n % 23 == 0 else 200} {n % 9000} "https://example.com/" "curl/8.0"')
+
+def python_lines(count):
+    for n, ts in _timestamps(count):
+        yield f'{ts:%Y-%m-%d %H:%M:%S},{ts.microsecond // 1000:03d} - {LEVELS[n % len(LEVELS)]} - Processed request {n}'
+
+def json_lines(count):
+    for n, ts in _timestamps(count):
+        yield json.dumps({'timestamp': ts.isoformat(), 'level': LEVELS[n % len(LEVELS)].lower(),
+                          'message': f'Processed request {n}', 'request_id': n, 'service': 'api'})
+
+def syslog_lines(count):
+    for n, ts in _timestamps(count):
+        yield f'<{8 + n % 8}>{ts:%b %d %H:%M:%S} web01 app[{1000 + n % 50}]: Processed request {n}'
+
+GENERATORS = {
+    'apache': apache_lines,
+    'nginx': nginx_lines,
+    'python': python_lines,
+    'json': json_lines,
+    'syslog': syslog_lines,
+}
+
+def lines_per_second(func, lines, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for line in lines:
+            func(line)
+        best = min(best, time.perf_counter() - start)
+    return len(lines) / best
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=50_000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'format':<8} {'parsed':>8} {'lines/sec':>12} {'detected':>9} {'detect us':>10}")
+    for name, parser_cls in PARSERS.items():
+        generate = GENERATORS.get(name)
+        if generate is None:
+            print(f'{name:<8} (no sample generator)')
+            continue
+        lines = list(generate(args.lines))
+        parse = parser_cls.parse_line
+        parsed = sum(1 for line in lines if parse(line))
+        rate = lines_per_second(parse, lines, args.repeat)
+
+        sample = lines[:10]
+        start = time.perf_counter()
+        for _ in range(100):
+            detected = LogParserFactory.detect_format(sample)
+        detect_us = (time.perf_counter() - start) / 100 * 1e6
+        print(f'{name:<8} {parsed:>8} {rate:>12,.0f} {str(detected):>9} {detect_us:>10.1f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,179 @@
+"""p50/p99 latency of fast reads mixed with slow ones: sync vs async routes.
+
+Serves the same two routes from a sync app (``def`` routes on ``Session``,
+run in the threadpool) and an async app (``async def`` routes on
+``AsyncSession``). ``/fast`` lists a page of log entries through the CRUD
+read functions; ``/slow`` stands in for a heavy analytics query by sleeping
+inside the database for ``--slow-seconds``. ``--concurrency`` clients issue
+``--requests`` requests between them, ``--slow-ratio`` of them slow. Once
+slow requests hold every threadpool worker, fast ones queue behind them on
+the sync app; on the async app they do not.
+
+Connection pools are sized to the concurrency so that only the threadpool
+can become the bottleneck. On SQLite the sleep is a registered function; on
+PostgreSQL it is ``pg_sleep`` and the schema must already exist.
+
+    python benchmarks/read_latency.py --requests 2000 --concurrency 64 --slow-ratio 0.2
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+def register_sleep(engine) -> None:
+    """SQLite `sleep(seconds)`, blocking the connection like a slow query would"""
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'connect')
+    def connect(dbapi_connection, _):
+        dbapi_connection.create_function('sleep', 1, time.sleep)
+
+def seed(engine, rows: int) -> None:
+    from backend.models.log_entry import LogEntry
+    from backend.models.upload import Upload
+    from backend.models.user import User
+    from backend.services.database import Base
+    from sqlalchemy.orm import Session
+
+    Base.metadata.create_all(engine, tables=[User.__table__, Upload.__table__, LogEntry.__table__])
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    with Session(engine) as db:
+        db.execute(LogEntry.__table__.insert(), [
+            {'upload_id': 1, 'timestamp': start + timedelta(seconds=i), 'log_level': 'INFO',
+             'source': 'bench', 'message': f'request {i} served'}
+            for i in range(rows)
+        ])
+        db.commit()
+
+def sync_app(engine, sleep_sql: str, slow_seconds: float):
+    from fastapi import Depends, FastAPI
+    from sqlalchemy import text
+    from sqlalchemy.orm import Session, sessionmaker
+    from backend.crud import log_entry as log_entry_crud
+
+    SessionLocal = sessionmaker(autoflush=False, bind=engine)
+    app = FastAPI()
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @app.get('/fast')
+    def fast(db: Session = Depends(get_db)):
+        return len(log_entry_crud.get_log_entries(db, limit=20, log_level='INFO'))
+
+    @app.get('/slow')
+    def slow(db: Session = Depends(get_db)):
+        db.execute(text(sleep_sql), {'seconds': slow_seconds})
+        return log_entry_crud.count_logs(db)
+
+    return app
+
+def async_app(engine, sleep_sql: str, slow_seconds: float):
+    from fastapi import Depends, FastAPI
+    from sqlalchemy import text
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+    from backend.crud import log_entry as log_entry_crud
+
+    AsyncSessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
+    app = FastAPI()
+
+    async def get_db():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    @app.get('/fast')
+    async def fast(db: AsyncSession = Depends(get_db)):
+        return len(await log_entry_crud.get_log_entries_async(db, limit=20, log_level='INFO'))
+
+    @app.get('/slow')
+    async def slow(db: AsyncSession = Depends(get_db)):
+        await db.execute(text(sleep_sql), {'seconds': slow_seconds})
+        return await log_entry_crud.count_logs_async(db)
+
+    return app
+
+async def run_load(app, kinds, concurrency: int, threads: int):
+    """Latencies per request kind and wall time for one pass over `kinds`"""
+    import anyio.to_thread
+    import httpx
+
+    anyio.to_thread.current_default_thread_limiter().total_tokens = threads
+    latencies = {'fast': [], 'slow': []}
+    pending = iter(kinds)
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url='http://bench', timeout=None) as client:
+        async def client_loop():
+            for kind in pending:
+                start = time.perf_counter()
+                response = await client.get(f'/{kind}')
+                response.raise_for_status()
+                latencies[kind].append(time.perf_counter() - start)
+
+        # Open every pooled connection before timing
+        await asyncio.gather(*(client.get('/fast') for _ in range(concurrency)))
+        started = time.perf_counter()
+        await asyncio.gather(*(client_loop() for _ in range(concurrency)))
+    return latencies, time.perf_counter() - started
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', help='defaults to a temporary SQLite file')
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=64)
+    parser.add_argument('--slow-ratio', type=float, default=0.2)
+    parser.add_argument('--slow-seconds', type=float, default=0.5)
+    parser.add_argument('--threads', type=int, default=40,
+                        help='threadpool workers, as in a default FastAPI worker')
+    parser.add_argument('--rows', type=int, default=10_000, help='log entries seeded on SQLite')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'read_latency.db')}"
+    os.environ.setdefault('DATABASE_URL', url)
+    from sqlalchemy import create_engine
+    from sqlalchemy.ext.asyncio import create_async_engine
+    from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+    from backend.services.database import async_database_url
+
+    pool = {'pool_size': args.concurrency, 'max_overflow': 0}
+    engine = create_engine(url, poolclass=QueuePool, **pool)
+    aengine = create_async_engine(async_database_url(url), poolclass=AsyncAdaptedQueuePool, **pool)
+    if engine.dialect.name == 'sqlite':
+        register_sleep(engine)
+        register_sleep(aengine.sync_engine)
+        seed(engine, args.rows)
+        sleep_sql = 'SELECT sleep(:seconds)'
+    else:
+        sleep_sql = 'SELECT pg_sleep(:seconds)'
+
+    rng = random.Random(args.seed)
+    kinds = ['slow' if rng.random() < args.slow_ratio else 'fast' for _ in range(args.requests)]
+    print(f"{args.requests} requests, {kinds.count('slow')} slow ({args.slow_seconds}s), "
+          f"{args.concurrency} clients, {args.threads} threads")
+    print(f"{'app':<6} {'kind':<5} {'count':>6} {'p50 ms':>9} {'p99 ms':>9} {'req/s':>8}")
+    for name, build, bind in (('sync', sync_app, engine), ('async', async_app, aengine)):
+        latencies, elapsed = asyncio.run(run_load(
+            build(bind, sleep_sql, args.slow_seconds), kinds, args.concurrency, args.threads
+        ))
+        for kind in ('fast', 'slow'):
+            values = np.array(latencies[kind]) * 1000
+            if not len(values):
+                continue
+            print(f"{name:<6} {kind:<5} {len(values):>6} {np.percentile(values, 50):>9.1f} "
+                  f"{np.percentile(values, 99):>9.1f} {args.requests / elapsed:>8.1f}")
+    asyncio.run(aengine.dispose())
+
+if __name__ == '__main__':
+    main()
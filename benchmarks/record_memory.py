@@ -0,0 +1,68 @@
+"""Bytes per parsed row held between parsing and the bulk insert.
+
+Compares the representations a batch of parsed lines can take:
+``dicts`` (one dict plus a nested additional_fields dict per line, as
+``parse_line`` returns), ``namedtuples`` (the same values in a tuple row)
+and ``columns`` (the ``LogColumns`` batch that ``parse_batch`` returns,
+with interned strings and NumPy arrays). Memory is measured with
+tracemalloc while the batch is alive; the input lines are excluded.
+
+    python benchmarks/record_memory.py --lines 100000
+"""
+import argparse
+import gc
+import os
+import sys
+import tracemalloc
+from collections import namedtuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from parse_apache import generate_lines
+from backend.services.log_parser import ApacheLogParser, PythonLogParser
+
+Record = namedtuple('Record', 'timestamp log_level source message additional_fields')
+
+def python_lines(count: int):
+    for n in range(count):
+        level = 'ERROR' if n % 11 == 0 else 'INFO'
+        yield f'2024-01-01 10:{(n // 60) % 60:02d}:{n % 60:02d},{n % 1000:03d} - app.worker{n % 4} - {level} - Processed job {n}'
+
+def as_dicts(parser, lines):
+    return [entry for entry in map(parser.parse_line, lines) if entry]
+
+def as_namedtuples(parser, lines):
+    return [Record(**entry) for entry in map(parser.parse_line, lines) if entry]
+
+def as_columns(parser, lines):
+    return parser.parse_batch(lines)
+
+def bytes_per_row(build, parser, lines) -> float:
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    batch = build(parser, lines)
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return held / len(batch)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=100_000)
+    args = parser.parse_args()
+
+    inputs = {
+        'apache': (ApacheLogParser, list(generate_lines(args.lines, 20))),
+        'python': (PythonLogParser, list(python_lines(args.lines))),
+    }
+    builds = (('dicts', as_dicts), ('namedtuples', as_namedtuples), ('columns', as_columns))
+    print(f"{'format':<8} {'representation':<14} {'bytes/row':>10}")
+    for name, (log_parser, lines) in inputs.items():
+        baseline = None
+        for label, build in builds:
+            size = bytes_per_row(build, log_parser, lines)
+            baseline = baseline or size
+            print(f'{name:<8} {label:<14} {size:>10,.0f}  ({size / baseline:.2f}x)')
+
+if __name__ == '__main__':
+    main()